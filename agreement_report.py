@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Measure how much models' responses agree across a batch_compare.py results file."""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from dataclasses import asdict
+
+from utils.agreement import AgreementEngine, responses_by_prompt
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("results", help="JSONL output of batch_compare.py")
+    parser.add_argument("--top", type=int, default=20,
+                        help="Outliers and most divergent prompts to list (default: 20)")
+    parser.add_argument("--ngram-range", default="4,4",
+                        help="Smallest and largest character n-gram length, e.g. 3,5 (default: 4,4)")
+    parser.add_argument("--json", dest="json_path",
+                        help="Also write the heatmap, outliers and per-prompt matrices as JSON to this file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable debug logging")
+    return parser.parse_args(argv)
+
+
+def read_records(path):
+    """Read result records, skipping a partially written last line."""
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def format_report(report) -> str:
+    """Render the agreement heatmap, outliers and divergent prompts as plain text."""
+    fmt = lambda value: "    -" if value is None else f"{value:5.2f}"
+    lines = ["Mean pairwise similarity (columns follow the row numbers):", ""]
+    lines.append(f"{'':<36} " + " ".join(f"{i + 1:>5}" for i in range(len(report.models))))
+    for i, (model, row) in enumerate(zip(report.models, report.mean_matrix)):
+        lines.append(f"{i + 1:>2} {model:<33} " + " ".join(fmt(value) for value in row))
+
+    lines.append("")
+    lines.append("Mean agreement with the other models:")
+    ranked = sorted(report.model_agreement.items(), key=lambda item: item[1] if item[1] is not None else 2)
+    for model, agreement in ranked:
+        lines.append(f"  {model:<33} {fmt(agreement)}")
+
+    lines.append("")
+    lines.append("Outliers (response much less similar to the others than is typical for its prompt):")
+    if not report.outliers:
+        lines.append("  none")
+    for outlier in report.outliers:
+        lines.append(
+            f"  prompt {outlier.prompt_id}: {outlier.model} {outlier.agreement:.2f} "
+            f"vs median {outlier.prompt_median:.2f}"
+        )
+
+    lines.append("")
+    lines.append("Most divergent prompts (lowest mean pairwise similarity):")
+    for prompt_id, agreement in report.divergent_prompts:
+        lines.append(f"  prompt {prompt_id}: {agreement:.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+
+    prompt_ids, models, rows = responses_by_prompt(read_records(args.results))
+    if not rows:
+        raise SystemExit("No results to compare")
+    low, high = (int(n) for n in args.ngram_range.split(","))
+
+    start = time.perf_counter()
+    report = AgreementEngine(ngram_range=(low, high)).compare(
+        rows, models, prompt_ids=prompt_ids, outlier_limit=args.top
+    )
+    print(
+        f"{len(prompt_ids)} prompts × {len(models)} models compared in {time.perf_counter() - start:.1f}s",
+        file=sys.stderr
+    )
+    print(format_report(report))
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(asdict(report), f)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Headless HTTP API for running comparisons from other services.
+
+POST /compare streams Server-Sent Events as the configured models answer;
+GET /health reports readiness for load balancers, GET /models lists the
+enabled models and GET /metrics serves the Prometheus metrics. Each worker
+process runs at most API_MAX_CONCURRENT comparisons at once; further
+requests wait up to API_QUEUE_TIMEOUT seconds for a slot and then get 503.
+
+    python api_server.py --port 8000 --workers 4
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from config.settings import ConfigManager
+from models.cancellation import CancelScope
+from models.model_factory import ModelFactory
+from models.rate_limit import rate_limiter
+from utils.metrics import metrics_registry
+from utils.parallel_executor import ParallelExecutor, StreamEvent
+from utils.provider_scheduler import ProviderScheduler
+from utils.response_cache import ResponseCache
+from utils.run_history import RunHistory
+
+logger = logging.getLogger(__name__)
+
+MAX_PROMPT_CHARS = 50000
+# Seconds without events after which an SSE comment keeps proxies from closing the stream
+KEEPALIVE_SECONDS = 15.0
+
+
+class ConcurrencyLimit:
+    """Caps the comparisons one worker runs at once; extra requests wait up to queue_timeout."""
+
+    def __init__(self, limit: int, queue_timeout: float = 0.0):
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting at most queue_timeout; False if none freed up in time."""
+        self.waiting += 1
+        try:
+            if self.queue_timeout > 0:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            elif self._semaphore.locked():
+                raise asyncio.TimeoutError()
+            else:
+                await self._semaphore.acquire()
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+
+class SlotResponse(StreamingResponse):
+    """
+    Event stream that frees its concurrency slot however the response ends.
+
+    The body generator is closed here as well, so a client that disconnects,
+    even before the first event, cancels its comparison.
+    """
+
+    def __init__(self, content: AsyncIterator[str], release: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self._release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+            self._release()
+
+
+def sse(event: str, data: Any) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def relay(events: Iterator[StreamEvent]) -> AsyncIterator[Optional[StreamEvent]]:
+    """
+    Consume a blocking executor event stream on its own thread.
+
+    Yields None after KEEPALIVE_SECONDS without events. Closing this generator
+    leaves the thread to finish; cancel the comparison's scope to end it.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # Event loop already closed (server shutting down)
+            pass
+
+    def pump():
+        try:
+            for event in events:
+                put(event)
+        except Exception as e:
+            put(e)
+        finally:
+            put(done)
+
+    threading.Thread(target=pump, name="compare-relay", daemon=True).start()
+    while True:
+        try:
+            item = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+        except asyncio.TimeoutError:
+            yield None
+            continue
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+class CompareService:
+    """Runs comparisons over the same config, factory, scheduler and executor stack as the app."""
+
+    def __init__(self, config_manager: ConfigManager, max_concurrent: int = 16, queue_timeout: float = 5.0,
+                 max_deadline: float = 120.0, cache: Optional[ResponseCache] = None):
+        """
+        Initialize the service.
+
+        Args:
+            config_manager: Model and provider configuration
+            max_concurrent: Comparisons run at once by this worker
+            queue_timeout: Seconds a request waits for a free slot before getting 503
+            max_deadline: Longest deadline a request may ask for, and the default
+            cache: Optional ResponseCache used unless a request sets use_cache to false
+        """
+        self.config_manager = config_manager
+        self.scheduler = ProviderScheduler.from_config(config_manager)
+        rate_limiter.configure(config_manager)
+        config_manager.add_listener(rate_limiter.configure)
+        self.executor = ParallelExecutor(scheduler=self.scheduler)
+        self.cache = cache
+        self.max_deadline = max_deadline
+        self.limit = ConcurrencyLimit(max_concurrent, queue_timeout)
+        self.started_at = time.time()
+
+    def parse_request(self, body: Any) -> Dict[str, Any]:
+        """Validate a /compare body; raises ValueError with a message for the client."""
+        if not isinstance(body, dict):
+            raise ValueError("Body must be a JSON object")
+        prompt = body.get("prompt")
+        if not isinstance(prompt, str) or not prompt.strip():
+            raise ValueError("'prompt' must be a non-empty string")
+        if len(prompt) > MAX_PROMPT_CHARS:
+            raise ValueError(f"'prompt' is longer than {MAX_PROMPT_CHARS} characters")
+        system_prompt = body.get("system_prompt")
+        if system_prompt is not None and not isinstance(system_prompt, str):
+            raise ValueError("'system_prompt' must be a string")
+
+        self.config_manager.refresh()
+        model_ids = body.get("models")
+        if model_ids is None:
+            configs = self.config_manager.get_enabled_models()
+        elif isinstance(model_ids, list) and all(isinstance(m, str) for m in model_ids):
+            configs = []
+            for model_id in model_ids:
+                config = self.config_manager.get_model_by_id(model_id)
+                if config is None:
+                    raise ValueError(f"Unknown model ID: {model_id}")
+                configs.append(config)
+        else:
+            raise ValueError("'models' must be a list of model IDs")
+        if not configs:
+            raise ValueError("No models selected")
+
+        deadline = body.get("deadline", self.max_deadline)
+        # bool is an int subclass, so `true` would otherwise pass as one second
+        if isinstance(deadline, bool) or not isinstance(deadline, (int, float)) or deadline <= 0:
+            raise ValueError("'deadline' must be a positive number of seconds")
+        stream = body.get("stream", True)
+        use_cache = body.get("use_cache", True)
+        for name, value in (("stream", stream), ("use_cache", use_cache)):
+            if not isinstance(value, bool):
+                raise ValueError(f"'{name}' must be true or false")
+        return {
+            "prompt": prompt,
+            "system_prompt": system_prompt or None,
+            "configs": configs,
+            "stream": stream,
+            "use_cache": use_cache,
+            "deadline": min(float(deadline), self.max_deadline),
+        }
+
+    def create_models(self, configs: List[Any], system_prompt: Optional[str], use_cache: bool) -> List[Any]:
+        """Model instances for the selected configs, as the app creates them."""
+        return [
+            ModelFactory.create_model(
+                config.model_id,
+                config.provider,
+                max_tokens=config.max_tokens,
+                temperature=config.temperature,
+                cache=self.cache if use_cache and config.cache else None,
+                timeout=config.timeout,
+                input_price=config.input_price,
+                output_price=config.output_price,
+                cached_input_price=config.cached_input_price,
+                system_prompt=system_prompt
+            )
+            for config in configs
+        ]
+
+    async def compare_events(self, request: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Run one comparison and yield its SSE stream.
+
+        Events: "start" with the models, "chunk" per streamed text chunk,
+        "result" per finished model with the full response, and "done" with
+        totals. Ending the stream early cancels the comparison.
+        """
+        configs = request["configs"]
+        start = time.perf_counter()
+        scope = CancelScope(request["deadline"])
+        try:
+            models = self.create_models(configs, request["system_prompt"], request["use_cache"])
+        except Exception as e:
+            yield sse("error", {"error": f"Failed to initialize models: {e}"})
+            return
+
+        yield sse("start", {"models": [
+            {"index": i, "model_id": c.model_id, "display_name": c.display_name, "provider": c.provider}
+            for i, c in enumerate(configs)
+        ]})
+        if request["stream"]:
+            events = self.executor.execute_streaming(models, request["prompt"], scope=scope)
+        else:
+            events = (
+                StreamEvent(index, response=response)
+                for index, response in self.executor.iter_completed(models, request["prompt"], scope=scope)
+            )
+
+        failed = 0
+        finished = False
+        try:
+            async for event in relay(events):
+                if event is None:
+                    yield ": keep-alive\n\n"
+                elif event.response is None:
+                    yield sse("chunk", {"index": event.index, "model_id": configs[event.index].model_id,
+                                        "text": event.chunk})
+                else:
+                    failed += bool(event.response.error)
+                    yield sse("result", {"index": event.index, "model_id": configs[event.index].model_id,
+                                         **asdict(event.response)})
+            yield sse("done", {
+                "completed": len(configs) - failed,
+                "failed": failed,
+                "elapsed_time": time.perf_counter() - start,
+                "cancelled": scope.reason,
+            })
+            finished = True
+        finally:
+            # A client that went away stops every model still running
+            if not finished:
+                scope.cancel("Client disconnected")
+
+    def health(self) -> Dict[str, Any]:
+        """Readiness summary for load balancers."""
+        return {
+            "status": "ok",
+            "models": len(self.config_manager.get_enabled_models()),
+            "config_version": self.config_manager.version,
+            "in_flight": self.limit.in_flight,
+            "waiting": self.limit.waiting,
+            "max_concurrent": self.limit.limit,
+            "rejected": self.limit.rejected,
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+        }
+
+    def shutdown(self):
+        self.scheduler.shutdown(wait=False)
+
+
+def create_app() -> Starlette:
+    """
+    Build the ASGI app, configured from the environment.
+
+    Uvicorn calls this once per worker process. API_MAX_CONCURRENT (default 16),
+    API_QUEUE_TIMEOUT (default 5), API_MAX_DEADLINE (default 120), API_NO_CACHE
+    and API_NO_HISTORY tune it; CONFIG_FILE and PROVIDERS_CONFIG_FILE pick the
+    configuration.
+    """
+    config_manager = ConfigManager(
+        os.getenv("CONFIG_FILE", "models_config.json"),
+        providers_file=os.getenv("PROVIDERS_CONFIG_FILE", "providers_config.json")
+    )
+    service = CompareService(
+        config_manager,
+        max_concurrent=int(os.getenv("API_MAX_CONCURRENT", "16")),
+        queue_timeout=float(os.getenv("API_QUEUE_TIMEOUT", "5")),
+        max_deadline=float(os.getenv("API_MAX_DEADLINE", "120")),
+        cache=None if os.getenv("API_NO_CACHE") else ResponseCache()
+    )
+    if not os.getenv("API_NO_HISTORY"):
+        metrics_registry.add_sink(RunHistory().record)
+
+    async def compare(request: Request):
+        try:
+            parsed = service.parse_request(await request.json())
+        except json.JSONDecodeError:
+            return JSONResponse({"error": "Body must be valid JSON"}, status_code=400)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+
+        if not await service.limit.acquire():
+            return JSONResponse(
+                {"error": "Too many comparisons in progress"},
+                status_code=503,
+                headers={"Retry-After": "1"}
+            )
+        return SlotResponse(
+            service.compare_events(parsed),
+            service.limit.release,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    async def health(request: Request):
+        return JSONResponse(service.health())
+
+    async def models(request: Request):
+        service.config_manager.refresh()
+        return JSONResponse({"models": [
+            {"model_id": m.model_id, "display_name": m.display_name, "provider": m.provider}
+            for m in service.config_manager.get_enabled_models()
+        ]})
+
+    async def metrics(request: Request):
+        return PlainTextResponse(metrics_registry.to_prometheus(), media_type="text/plain; version=0.0.4")
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        service.shutdown()
+
+    app = Starlette(
+        routes=[
+            Route("/compare", compare, methods=["POST"]),
+            Route("/health", health, methods=["GET"]),
+            Route("/models", models, methods=["GET"]),
+            Route("/metrics", metrics, methods=["GET"]),
+        ],
+        lifespan=lifespan
+    )
+    app.state.service = service
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on (default: 8000)")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (default: 1)")
+    parser.add_argument("--max-concurrent", type=int,
+                        help="Comparisons each worker runs at once (default: API_MAX_CONCURRENT or 16)")
+    parser.add_argument("--queue-timeout", type=float,
+                        help="Seconds a request waits for a free slot before 503 (default: API_QUEUE_TIMEOUT or 5)")
+    parser.add_argument("--config", help="Model configuration file")
+    parser.add_argument("--providers-config", help="Provider settings file")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the API")
+    parser.add_argument("--no-history", action="store_true",
+                        help="Don't append results to the run history (.cache/history.sqlite3)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable debug logging")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    import uvicorn
+
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+
+    # Worker processes build their app from the environment
+    options = {
+        "API_MAX_CONCURRENT": args.max_concurrent,
+        "API_QUEUE_TIMEOUT": args.queue_timeout,
+        "CONFIG_FILE": args.config,
+        "PROVIDERS_CONFIG_FILE": args.providers_config,
+        "API_NO_CACHE": "1" if args.no_cache else None,
+        "API_NO_HISTORY": "1" if args.no_history else None,
+    }
+    os.environ.update({key: str(value) for key, value in options.items() if value is not None})
+
+    uvicorn.run(
+        "api_server:create_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level="debug" if args.verbose else "warning"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Run every prompt in a JSONL file against the configured models, headless."""
+
+import argparse
+import logging
+import sys
+
+from config.settings import ConfigManager
+from models.rate_limit import rate_limiter
+from utils.batch_api import BatchAPIRunner
+from utils.batch_runner import BatchRunner
+from utils.metrics import metrics_registry
+from utils.provider_scheduler import ProviderScheduler
+from utils.response_cache import ResponseCache
+from utils.run_history import RunHistory
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("input", help="JSONL file with one {\"id\": ..., \"prompt\": ...} object per line")
+    parser.add_argument("output", help="JSONL file results are appended to; existing results are skipped")
+    parser.add_argument("--models", help="Comma-separated model IDs (default: all enabled models)")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Maximum requests in flight across all providers (default: 16)")
+    parser.add_argument("--config", default="models_config.json", help="Model configuration file")
+    parser.add_argument("--providers-config", default="providers_config.json",
+                        help="Provider settings file")
+    parser.add_argument("--system-file",
+                        help="Text file with a system prompt sent ahead of every prompt")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the API")
+    parser.add_argument("--retry-errors", action="store_true",
+                        help="Re-run pairs whose previous result was an error")
+    parser.add_argument("--batch-api", action="store_true",
+                        help="Submit OpenAI and Claude requests through their batch APIs "
+                             "(other providers run synchronously)")
+    parser.add_argument("--poll-interval", type=float, default=60.0,
+                        help="Seconds between batch status checks with --batch-api (default: 60)")
+    parser.add_argument("--no-history", action="store_true",
+                        help="Don't append results to the run history (.cache/history.sqlite3)")
+    parser.add_argument("--metrics-file",
+                        help="Write per-model latency histograms in Prometheus text format when done")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable debug logging")
+    return parser.parse_args(argv)
+
+
+def select_models(config, model_ids):
+    """Resolve --models against the configuration."""
+    if not model_ids:
+        return config.get_enabled_models()
+
+    selected = []
+    for model_id in model_ids.split(","):
+        model = config.get_model_by_id(model_id.strip())
+        if model is None:
+            raise SystemExit(f"Unknown model ID: {model_id}")
+        selected.append(model)
+    return selected
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+
+    config = ConfigManager(args.config, providers_file=args.providers_config)
+    models = select_models(config, args.models)
+    if not models:
+        raise SystemExit("No models selected")
+
+    scheduler = ProviderScheduler.from_config(config)
+    rate_limiter.configure(config)
+    cache = None if args.no_cache else ResponseCache()
+    system_prompt = None
+    if args.system_file:
+        with open(args.system_file, 'r') as f:
+            system_prompt = f.read()
+    if not args.no_history:
+        metrics_registry.add_sink(RunHistory().record)
+    if args.batch_api:
+        runner = BatchAPIRunner(
+            models,
+            scheduler=scheduler,
+            max_in_flight=args.concurrency,
+            cache=cache,
+            poll_interval=args.poll_interval,
+            system_prompt=system_prompt
+        )
+    else:
+        runner = BatchRunner(
+            models,
+            scheduler=scheduler,
+            max_in_flight=args.concurrency,
+            cache=cache,
+            system_prompt=system_prompt
+        )
+
+    try:
+        summary = runner.run(args.input, args.output, retry_errors=args.retry_errors)
+    finally:
+        scheduler.shutdown(wait=False)
+        if args.metrics_file:
+            metrics_registry.export(args.metrics_file)
+
+    print(
+        f"{summary.completed} completed, {summary.failed} failed, "
+        f"{summary.skipped} skipped (already done) in {summary.elapsed_time:.1f}s, "
+        f"{summary.output_tokens} output tokens, ${summary.cost:.4f} estimated cost",
+        file=sys.stderr
+    )
+    return 1 if summary.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
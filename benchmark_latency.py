@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Repeat one prompt against the selected models and compare their latency distributions."""
+
+import argparse
+import json
+import logging
+import sys
+from dataclasses import asdict
+
+from batch_compare import select_models
+from config.settings import ConfigManager
+from models.model_factory import ModelFactory
+from models.rate_limit import rate_limiter
+from utils.latency_benchmark import LatencyBenchmark
+from utils.metrics import metrics_registry
+from utils.run_history import RunHistory
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    prompt = parser.add_mutually_exclusive_group(required=True)
+    prompt.add_argument("--prompt", help="Prompt to send on every repetition")
+    prompt.add_argument("--prompt-file", help="File whose contents are the prompt")
+    parser.add_argument("--models", help="Comma-separated model IDs (default: all enabled models)")
+    parser.add_argument("-n", "--repetitions", type=int, default=20,
+                        help="Measured requests per model (default: 20)")
+    parser.add_argument("--warmup", type=int, default=2,
+                        help="Requests per model run first and discarded (default: 2)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Maximum requests in flight across all models (default: 1)")
+    parser.add_argument("--no-stream", action="store_true",
+                        help="Use blocking calls (TTFT is not measured)")
+    parser.add_argument("--alpha", type=float, default=0.05,
+                        help="Significance level for pairwise comparisons (default: 0.05)")
+    parser.add_argument("--config", default="models_config.json", help="Model configuration file")
+    parser.add_argument("--json", dest="json_path", help="Also write samples and statistics as JSON to this file")
+    parser.add_argument("--no-history", action="store_true",
+                        help="Don't append results to the run history (.cache/history.sqlite3)")
+    parser.add_argument("--metrics-file",
+                        help="Write per-model latency histograms in Prometheus text format when done")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable debug logging")
+    return parser.parse_args(argv)
+
+
+def format_report(report) -> str:
+    """Render per-model statistics and significant differences as plain text."""
+    lines = [
+        f"{report.repetitions} repetitions per model after {report.warmup} warmup, "
+        f"concurrency {report.concurrency}, {report.elapsed_time:.1f}s total",
+        "",
+        f"{'model':<32} {'metric':<18} {'n':>4} {'mean':>9} {'95% CI':>21} {'stddev':>9} "
+        f"{'p50':>9} {'p95':>9} {'p99':>9}",
+    ]
+    for result in report.results:
+        for metric, stats in result.stats().items():
+            if stats is None:
+                continue
+            ci = f"[{stats.ci_low:.3f}, {stats.ci_high:.3f}]"
+            lines.append(
+                f"{result.model_name:<32} {metric:<18} {stats.n:>4} {stats.mean:>9.3f} {ci:>21} "
+                f"{stats.stddev:>9.3f} {stats.p50:>9.3f} {stats.p95:>9.3f} {stats.p99:>9.3f}"
+            )
+        if result.errors:
+            lines.append(f"{result.model_name:<32} {result.errors} failed request(s)")
+
+    significant = [c for c in report.comparisons if c.significant]
+    lines.append("")
+    lines.append(f"Significant differences (Mann-Whitney U, Holm-adjusted, alpha={report.alpha}):")
+    if not significant:
+        lines.append("  none")
+    for c in significant:
+        lines.append(
+            f"  {c.metric}: {c.better} is better ({c.model_a} {c.mean_a:.3f} vs "
+            f"{c.model_b} {c.mean_b:.3f}, p={c.p_value:.4f})"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+
+    if args.prompt_file:
+        with open(args.prompt_file) as f:
+            prompt = f.read()
+    else:
+        prompt = args.prompt
+
+    config = ConfigManager(args.config)
+    model_configs = select_models(config, args.models)
+    if not model_configs:
+        raise SystemExit("No models selected")
+    rate_limiter.configure(config)
+    if not args.no_history:
+        metrics_registry.add_sink(RunHistory().record)
+
+    # No response cache: cached replies are not latency samples
+    models = [
+        ModelFactory.create_model(
+            m.model_id, m.provider, max_tokens=m.max_tokens, temperature=m.temperature, timeout=m.timeout
+        )
+        for m in model_configs
+    ]
+    benchmark = LatencyBenchmark(
+        repetitions=args.repetitions,
+        warmup=args.warmup,
+        concurrency=args.concurrency,
+        stream=not args.no_stream,
+        alpha=args.alpha
+    )
+    report = benchmark.run(
+        models,
+        prompt,
+        on_sample=lambda done, total: print(f"\r{done}/{total} requests", end="", file=sys.stderr)
+    )
+    print(file=sys.stderr)
+
+    if args.metrics_file:
+        metrics_registry.export(args.metrics_file)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({
+                "prompt": prompt,
+                "repetitions": report.repetitions,
+                "warmup": report.warmup,
+                "concurrency": report.concurrency,
+                "alpha": report.alpha,
+                "models": [
+                    {
+                        "model": result.model_name,
+                        "errors": result.errors,
+                        "samples": result.samples,
+                        "stats": {
+                            metric: asdict(stats) if stats else None
+                            for metric, stats in result.stats().items()
+                        },
+                    }
+                    for result in report.results
+                ],
+                "comparisons": [asdict(c) for c in report.comparisons],
+            }, f, indent=2)
+
+    print(format_report(report))
+    return 1 if any(result.errors == report.repetitions for result in report.results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
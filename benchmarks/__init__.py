@@ -0,0 +1 @@
+# Overhead benchmarks against the local mock provider servers
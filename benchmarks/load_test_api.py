@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Load-test the HTTP API (api_server.py) against the local mock providers.
+
+Starts the mock provider server and the API server as child processes,
+then keeps --clients concurrent POST /compare streams open until
+--requests comparisons have finished. Reports time to the first streamed
+chunk, time to the "done" event, throughput and how many requests were
+turned away with 503.
+
+Run from the repository root:
+
+    python -m benchmarks.load_test_api --workers 2 --clients 32 --requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, asdict, field
+from typing import List, Optional
+
+import httpx
+
+from benchmarks.run_benchmarks import point_sdks_at, start_mock_server
+from mock_providers.server import LatencyProfile
+from utils.metrics import percentile
+
+@dataclass
+class LoadTestResult:
+    """Latency and throughput of one load test."""
+    requests: int
+    completed: int
+    rejected: int
+    failed: int
+    model_errors: int
+    throughput: float
+    first_chunk_p50_ms: Optional[float]
+    first_chunk_p95_ms: Optional[float]
+    done_p50_ms: Optional[float]
+    done_p95_ms: Optional[float]
+    done_p99_ms: Optional[float]
+    errors: List[str] = field(default_factory=list)
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_api_server(port: int, workers: int, max_concurrent: int, queue_timeout: float,
+                     providers_config: Optional[str] = None) -> subprocess.Popen:
+    """Run api_server.py in a child process with the mock provider environment."""
+    command = [
+        sys.executable, "api_server.py", "--port", str(port), "--workers", str(workers),
+        "--max-concurrent", str(max_concurrent), "--queue-timeout", str(queue_timeout),
+        "--no-cache", "--no-history",
+    ]
+    if providers_config:
+        command += ["--providers-config", providers_config]
+    return subprocess.Popen(command, env=os.environ.copy())
+
+async def wait_healthy(url: str, timeout: float = 30.0):
+    """Poll /health until the server answers."""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(f"{url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise SystemExit("API server did not become healthy")
+            await asyncio.sleep(0.2)
+
+async def compare_once(client: httpx.AsyncClient, url: str, body: dict) -> dict:
+    """Run one streamed comparison; returns its status and timings."""
+    start = time.perf_counter()
+    first_chunk = None
+    model_errors = 0
+    event = None
+    async with client.stream("POST", f"{url}/compare", json=body) as response:
+        if response.status_code != 200:
+            await response.aread()
+            return {"status": response.status_code}
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                if event == "chunk" and first_chunk is None:
+                    first_chunk = time.perf_counter() - start
+                elif event == "result":
+                    model_errors += bool(json.loads(line[6:]).get("error"))
+                elif event == "done":
+                    return {"status": 200, "first_chunk": first_chunk, "done": time.perf_counter() - start,
+                            "model_errors": model_errors}
+    return {"status": 200, "incomplete": True, "model_errors": model_errors}
+
+async def run_load(url: str, clients: int, requests: int, body: dict) -> LoadTestResult:
+    """Keep `clients` comparisons in flight until `requests` have been sent."""
+    results = []
+    remaining = requests
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(300.0), limits=limits) as client:
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                try:
+                    results.append(await compare_once(client, url, body))
+                except httpx.HTTPError as e:
+                    results.append({"status": None, "error": str(e)})
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        wall = time.perf_counter() - start
+
+    done = [r for r in results if r.get("done") is not None]
+    first = [r["first_chunk"] for r in done if r.get("first_chunk") is not None]
+    to_ms = lambda values, q: percentile(values, q) * 1000 if values else None
+    return LoadTestResult(
+        requests=len(results),
+        completed=len(done),
+        rejected=sum(1 for r in results if r["status"] == 503),
+        failed=sum(1 for r in results if r.get("done") is None and r["status"] != 503),
+        model_errors=sum(r.get("model_errors", 0) for r in results),
+        throughput=len(done) / wall if wall > 0 else 0.0,
+        first_chunk_p50_ms=to_ms(first, 0.5),
+        first_chunk_p95_ms=to_ms(first, 0.95),
+        done_p50_ms=to_ms([r["done"] for r in done], 0.5),
+        done_p95_ms=to_ms([r["done"] for r in done], 0.95),
+        done_p99_ms=to_ms([r["done"] for r in done], 0.99),
+        errors=sorted({r["error"] for r in results if r.get("error")})[:5],
+    )
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2, help="API server worker processes (default: 2)")
+    parser.add_argument("--max-concurrent", type=int, default=16,
+                        help="Comparisons each worker runs at once (default: 16)")
+    parser.add_argument("--queue-timeout", type=float, default=5.0,
+                        help="Seconds a request waits for a slot before 503 (default: 5)")
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent client streams (default: 32)")
+    parser.add_argument("--requests", type=int, default=200, help="Comparisons to run in total (default: 200)")
+    parser.add_argument("--models", help="Comma-separated model IDs (default: all enabled models)")
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Mock provider time to first token in seconds (default: 0.2)")
+    parser.add_argument("--reply-tokens", type=int, default=40,
+                        help="Extra tokens in each mock reply (default: 40)")
+    parser.add_argument("--tokens-per-second", type=float, default=200,
+                        help="Mock streaming rate; 0 sends each reply at once (default: 200)")
+    parser.add_argument("--providers-config",
+                        help="Provider settings file for the API server; its max_concurrency bulkheads "
+                             "usually bound throughput (default: providers_config.json)")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    mock, mock_url = start_mock_server(LatencyProfile(
+        latency=args.latency, tokens_per_second=args.tokens_per_second, reply_tokens=args.reply_tokens
+    ))
+    point_sdks_at(mock_url)
+    port = free_port()
+    server = start_api_server(port, args.workers, args.max_concurrent, args.queue_timeout, args.providers_config)
+    url = f"http://127.0.0.1:{port}"
+    body = {"prompt": "Summarize the benefits of load testing.", "use_cache": False}
+    if args.models:
+        body["models"] = [m.strip() for m in args.models.split(",")]
+
+    try:
+        asyncio.run(wait_healthy(url))
+        result = asyncio.run(run_load(url, args.clients, args.requests, body))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        mock.terminate()
+
+    if args.json:
+        print(json.dumps(asdict(result), indent=2))
+        return 0
+    fmt = lambda value: "-" if value is None else f"{value:.0f}"
+    print(
+        f"{result.completed}/{result.requests} comparisons completed, {result.rejected} rejected (503), "
+        f"{result.failed} failed, {result.model_errors} model errors\n"
+        f"throughput: {result.throughput:.1f} comparisons/s with {args.clients} clients, "
+        f"{args.workers} worker(s) × {args.max_concurrent} slots\n"
+        f"first chunk p50/p95: {fmt(result.first_chunk_p50_ms)}/{fmt(result.first_chunk_p95_ms)} ms\n"
+        f"done p50/p95/p99: {fmt(result.done_p50_ms)}/{fmt(result.done_p95_ms)}/{fmt(result.done_p99_ms)} ms"
+    )
+    for error in result.errors:
+        print(f"  error: {error}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Measure the app's own overhead on top of provider latency.
+
+Starts the local mock provider server, points every SDK at it and drives the
+real model classes through ModelFactory and each execution path at
+increasing fan-out. Because the mock's latency is deterministic per
+(model, prompt), the server-side time of every request is known, and
+whatever remains is overhead from the model classes, SDKs and executors.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --fan-out 1,4,16,64 --latency 0.2
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional
+
+from mock_providers.server import LatencyProfile, MockProviderServer
+from models.model_factory import ModelFactory
+from utils.async_executor import AsyncExecutor
+from utils.metrics import percentile
+from utils.parallel_executor import ParallelExecutor
+
+PROVIDERS = ["openai", "claude", "gemini", "grok"]
+PATHS = ["sync", "stream", "async"]
+
+@dataclass
+class BenchmarkResult:
+    """Overhead and throughput for one execution path at one fan-out."""
+    path: str
+    fan_out: int
+    requests: int
+    errors: int
+    throughput: float
+    # Per request: ModelResponse.elapsed_time minus the mock server's time
+    overhead_p50_ms: Optional[float]
+    overhead_p99_ms: Optional[float]
+    # Per round: wall time minus the slowest request's server time
+    wall_overhead_p50_ms: Optional[float]
+    wall_overhead_p99_ms: Optional[float]
+
+def _serve(profile: LatencyProfile, urls):
+    server = MockProviderServer(profile=profile)
+    urls.put(server.url)
+    server.httpd.serve_forever()
+
+def start_mock_server(profile: LatencyProfile):
+    """
+    Run the mock server in a child process.
+
+    Keeping it out of this process stops its threads from competing for the
+    GIL with the code being measured.
+
+    Returns:
+        (process, base URL)
+    """
+    urls = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(profile, urls), daemon=True)
+    process.start()
+    return process, urls.get(timeout=30)
+
+def point_sdks_at(url: str):
+    """Route every provider SDK in this process to the mock server."""
+    os.environ.update({
+        "OPENAI_BASE_URL": f"{url}/v1",
+        "XAI_BASE_URL": f"{url}/v1",
+        "ANTHROPIC_BASE_URL": url,
+        "GOOGLE_GEMINI_BASE_URL": url,
+    })
+    for key in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY", "GOOGLE_API_KEY", "XAI_API_KEY"):
+        os.environ[key] = "mock"
+
+def create_models(fan_out: int, providers: List[str]) -> List:
+    """Create fan_out model instances, round-robin over providers, with distinct names."""
+    return [
+        ModelFactory.create_model(f"mock-{providers[i % len(providers)]}-{i}", providers[i % len(providers)])
+        for i in range(fan_out)
+    ]
+
+def time_factory(providers: List[str], count: int = 1000) -> float:
+    """Mean microseconds per ModelFactory.create_model call."""
+    start = time.perf_counter()
+    create_models(count, providers)
+    return (time.perf_counter() - start) / count * 1e6
+
+def _run_sync(models: List, prompt: str) -> List:
+    return ParallelExecutor(max_workers=len(models)).execute_parallel(models, prompt)
+
+def _run_stream(models: List, prompt: str) -> List:
+    results = [None] * len(models)
+    for event in ParallelExecutor(max_workers=len(models)).execute_streaming(models, prompt):
+        if event.response is not None:
+            results[event.index] = event.response
+    return results
+
+def _run_async(models: List, prompt: str) -> List:
+    return AsyncExecutor(max_concurrency=len(models)).execute_parallel(models, prompt)
+
+RUNNERS: Dict[str, Callable[[List, str], List]] = {
+    "sync": _run_sync,
+    "stream": _run_stream,
+    "async": _run_async,
+}
+
+def benchmark_path(path: str, fan_out: int, providers: List[str], profile: LatencyProfile,
+                   rounds: int, warmup_rounds: int) -> BenchmarkResult:
+    """
+    Run rounds of fan_out concurrent requests on one execution path.
+
+    Each round uses a fresh prompt so the mock draws new latencies; warmup
+    rounds open pooled connections and are discarded.
+    """
+    runner = RUNNERS[path]
+    models = create_models(fan_out, providers)
+    overheads, wall_overheads = [], []
+    requests = errors = 0
+    measured_time = 0.0
+
+    for round_index in range(warmup_rounds + rounds):
+        prompt = f"benchmark {path} {fan_out} round {round_index}"
+        start = time.perf_counter()
+        responses = runner(models, prompt)
+        wall = time.perf_counter() - start
+        if round_index < warmup_rounds:
+            continue
+
+        server_times = [profile.server_time(prompt, model.model_name) for model in models]
+        requests += len(responses)
+        measured_time += wall
+        wall_overheads.append(wall - max(server_times))
+        for response, server_time in zip(responses, server_times):
+            if response.error:
+                errors += 1
+            else:
+                overheads.append(response.elapsed_time - server_time)
+
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return BenchmarkResult(
+        path=path,
+        fan_out=fan_out,
+        requests=requests,
+        errors=errors,
+        throughput=round(requests / measured_time, 1) if measured_time else 0.0,
+        overhead_p50_ms=to_ms(percentile(overheads, 0.5)),
+        overhead_p99_ms=to_ms(percentile(overheads, 0.99)),
+        wall_overhead_p50_ms=to_ms(percentile(wall_overheads, 0.5)),
+        wall_overhead_p99_ms=to_ms(percentile(wall_overheads, 0.99))
+    )
+
+def format_table(results: List[BenchmarkResult]) -> str:
+    header = ["path", "fan-out", "req/s", "errors", "p50 ms", "p99 ms", "wall p50 ms", "wall p99 ms"]
+    rows = [
+        [r.path, r.fan_out, r.throughput, r.errors, r.overhead_p50_ms, r.overhead_p99_ms,
+         r.wall_overhead_p50_ms, r.wall_overhead_p99_ms]
+        for r in results
+    ]
+    cells = [header] + [["-" if value is None else str(value) for value in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(header))]
+    return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in cells)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--providers", default=",".join(PROVIDERS),
+                        help="Comma-separated providers to spread requests over (default: all)")
+    parser.add_argument("--paths", default=",".join(PATHS),
+                        help="Comma-separated execution paths: sync, stream, async (default: all)")
+    parser.add_argument("--fan-out", default="1,4,16,64",
+                        help="Comma-separated concurrent request counts (default: 1,4,16,64)")
+    parser.add_argument("--rounds", type=int, default=5, help="Measured rounds per fan-out (default: 5)")
+    parser.add_argument("--warmup-rounds", type=int, default=1, help="Discarded rounds per fan-out (default: 1)")
+    parser.add_argument("--latency", type=float, default=0.1,
+                        help="Median mock seconds to first token (default: 0.1)")
+    parser.add_argument("--distribution", choices=["fixed", "lognormal"], default="lognormal",
+                        help="Mock time-to-first-token distribution (default: lognormal)")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Lognormal shape parameter (default: 0.5)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0,
+                        help="Mock streaming rate; 0 sends replies at once (default: 200)")
+    parser.add_argument("--reply-tokens", type=int, default=50, help="Filler tokens per reply (default: 50)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail (default: 0)")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected errors")
+    parser.add_argument("--json", dest="json_path", help="Also write results as JSON to this file")
+    parser.add_argument("--fail-above-ms", type=float,
+                        help="Exit with status 1 if any p99 per-request overhead exceeds this")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    providers = [p.strip() for p in args.providers.split(",") if p.strip()]
+    paths = [p.strip() for p in args.paths.split(",") if p.strip()]
+    fan_outs = [int(n) for n in args.fan_out.split(",")]
+    for provider in providers:
+        if provider not in ModelFactory.get_supported_providers():
+            raise SystemExit(f"Unknown provider: {provider}")
+    for path in paths:
+        if path not in RUNNERS:
+            raise SystemExit(f"Unknown path: {path}")
+
+    profile = LatencyProfile(
+        latency=args.latency,
+        distribution=args.distribution,
+        sigma=args.sigma,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status
+    )
+
+    results = []
+    server, url = start_mock_server(profile)
+    try:
+        point_sdks_at(url)
+        factory_us = time_factory(providers)
+        print(f"ModelFactory.create_model: {factory_us:.1f} µs per model", file=sys.stderr)
+        for path in paths:
+            for fan_out in fan_outs:
+                result = benchmark_path(path, fan_out, providers, profile, args.rounds, args.warmup_rounds)
+                print(f"  {path} x{fan_out}: {result.throughput} req/s", file=sys.stderr)
+                results.append(result)
+    finally:
+        server.terminate()
+
+    print(format_table(results))
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({
+                "profile": asdict(profile),
+                "providers": providers,
+                "factory_us_per_model": round(factory_us, 3),
+                "results": [asdict(result) for result in results],
+            }, f, indent=2)
+
+    if args.fail_above_ms is not None:
+        slow = [r for r in results if r.overhead_p99_ms is not None and r.overhead_p99_ms > args.fail_above_ms]
+        for r in slow:
+            print(f"{r.path} x{r.fan_out}: p99 overhead {r.overhead_p99_ms} ms > {args.fail_above_ms} ms",
+                  file=sys.stderr)
+        return 1 if slow else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
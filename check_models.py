@@ -1,63 +1,26 @@
 #!/usr/bin/env python3
 """Check which configured models are valid and discover new available models."""
 
+import argparse
 import os
 import re
 import sys
 from collections import defaultdict
 from config.settings import ConfigManager
+from utils.model_catalog import DEFAULT_CATALOG_TTL, PROVIDER_ENV_VARS, ModelCatalog, format_age
 
 
-PROVIDER_ENV_VARS = {
-    "openai": "OPENAI_API_KEY",
-    "claude": "ANTHROPIC_API_KEY",
-    "gemini": "GOOGLE_API_KEY",
-    "grok": "XAI_API_KEY",
-}
-
-
-def fetch_openai_models():
-    from openai import OpenAI
-    client = OpenAI()
-    return [m.id for m in client.models.list().data]
-
-
-def fetch_claude_models():
-    import httpx
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    resp = httpx.get(
-        "https://api.anthropic.com/v1/models",
-        headers={
-            "x-api-key": api_key,
-            "anthropic-version": "2023-06-01",
-        },
-        timeout=15,
-    )
-    resp.raise_for_status()
-    return [m["id"] for m in resp.json()["data"]]
-
-
-def fetch_gemini_models():
-    from google import genai
-    client = genai.Client()
-    return [m.name.removeprefix("models/") for m in client.models.list()]
-
-
-def fetch_grok_models():
-    from openai import OpenAI
-    client = OpenAI(
-        api_key=os.getenv("XAI_API_KEY"),
-        base_url="https://api.x.ai/v1",
-    )
-    return [m.id for m in client.models.list().data]
-
-
-FETCHERS = {
-    "openai": fetch_openai_models,
-    "claude": fetch_claude_models,
-    "gemini": fetch_gemini_models,
-    "grok": fetch_grok_models,
-}
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--refresh", action="store_true",
+                        help="Fetch every provider's model list, even if the cached one is still fresh")
+    parser.add_argument("--offline", action="store_true",
+                        help="Only use the cached model lists; make no network calls")
+    parser.add_argument("--ttl", type=float, default=DEFAULT_CATALOG_TTL / 3600,
+                        help="Hours a cached model list stays fresh (default: 24)")
+    parser.add_argument("--timeout", type=float, default=15.0,
+                        help="Seconds allowed for fetching the model lists (default: 15)")
+    return parser.parse_args(argv)
 
 
 def is_chat_model(provider, model_id):
@@ -93,33 +56,55 @@ def check_provider(provider, configured_ids, available_ids):
         print(f"  \033[33m+\033[0m {mid} (available, not in config)")
 
 
-def main():
+def describe(result):
+    """Where a provider's list came from, e.g. "fetched in 0.4s" or "cached 3h ago"."""
+    if result.source == "fetched":
+        return f"fetched in {result.elapsed_time:.1f}s"
+    if result.source == "not_modified":
+        return f"unchanged, revalidated in {result.elapsed_time:.1f}s"
+    return f"cached {format_age(result.entry.age())} ago"
+
+
+def main(argv=None):
+    args = parse_args(argv)
     config = ConfigManager()
     models_by_provider = defaultdict(list)
     for m in config.models:
         models_by_provider[m.provider].append(m.model_id)
 
     providers = list(PROVIDER_ENV_VARS.keys())
+    with_keys = [p for p in providers if os.getenv(PROVIDER_ENV_VARS[p])]
+
+    catalog = ModelCatalog(ttl_seconds=args.ttl * 3600)
+    if args.offline:
+        results = {}
+    else:
+        # All stale providers are fetched at once; results come back in provider order
+        results = catalog.refresh(with_keys, force=args.refresh, timeout=args.timeout)
 
     for provider in providers:
         print(f"\n=== {provider.capitalize()} ===")
 
-        env_var = PROVIDER_ENV_VARS[provider]
-        if not os.getenv(env_var):
-            print(f"  (skipped - {env_var} not set)")
-            continue
-
-        try:
-            available = FETCHERS[provider]()
-        except Exception as e:
-            print(f"  (error fetching models: {e})")
+        result = results.get(provider)
+        if result is not None and result.error:
+            print(f"  (error fetching models: {result.error})")
+        entry = result.entry if result is not None else catalog.get(provider)
+        if entry is None:
+            if provider not in with_keys and not args.offline:
+                print(f"  (skipped - {PROVIDER_ENV_VARS[provider]} not set)")
+            elif args.offline:
+                print("  (no cached model list - run without --offline)")
             continue
 
+        if result is None or result.error:
+            print(f"  (using model list cached {format_age(entry.age())} ago)")
+        else:
+            print(f"  ({describe(result)})")
         configured = models_by_provider.get(provider, [])
-        check_provider(provider, configured, available)
+        check_provider(provider, configured, entry.model_ids)
 
     print()
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,8 +1,18 @@
+import hashlib
 import json
+import logging
 import os
-from typing import List, Dict, Optional
+import threading
+import time
+from collections import Counter
+from typing import Callable, List, Dict, Optional, Tuple
 from dataclasses import dataclass
 
+logger = logging.getLogger(__name__)
+
+# (mtime_ns, size, sha256) of a config file, or None when it does not exist
+FileSignature = Optional[Tuple[int, int, str]]
+
 @dataclass
 class ModelConfig:
     """Configuration for a single model."""
@@ -12,25 +22,85 @@ class ModelConfig:
     enabled: bool = True
     max_tokens: int = 1000
     temperature: float = 1.0
+    cache: bool = True
+    # Per-request timeout in seconds; None uses the provider SDK's default
+    timeout: Optional[float] = None
+    # Requests and tokens per minute for this model; None until learned from rate-limit headers
+    rpm: Optional[int] = None
+    tpm: Optional[int] = None
+    # USD per million input and output tokens; both are needed for cost estimates
+    input_price: Optional[float] = None
+    output_price: Optional[float] = None
+    # USD per million input tokens read from the provider's prompt cache; None prices them as input_price
+    cached_input_price: Optional[float] = None
+    # Minimum prompt similarity (0-1) for reusing a cached response when similar-prompt matching is on
+    similarity_threshold: Optional[float] = None
     
     def __post_init__(self):
         # Ensure display_name is set, fallback to model_id if not provided
         if not self.display_name:
             self.display_name = self.model_id
 
+@dataclass
+class ProviderConfig:
+    """Configuration shared by all models of one provider."""
+    provider: str
+    max_concurrency: int = 4
+    # Maximum hedge (duplicate) requests in flight when request hedging is on
+    max_hedges: int = 2
+    # Requests and tokens per minute across all of the provider's models; None is unlimited
+    rpm: Optional[int] = None
+    tpm: Optional[int] = None
+
 class ConfigManager:
-    """Manages application configuration."""
+    """
+    Manages application configuration.
+    
+    Files are parsed once and models are indexed by model_id and provider.
+    refresh() checks (at most once per check_interval seconds) whether either
+    file's mtime or size changed; a changed file is hashed and re-parsed only
+    if its content differs, so touching a file costs one stat and one hash.
+    Each reload bumps version and notifies listeners.
+    """
     
-    def __init__(self, config_file: str = "models_config.json"):
+    def __init__(self, config_file: str = "models_config.json", providers_file: str = "providers_config.json",
+                 check_interval: float = 1.0):
         self.config_file = config_file
+        self.providers_file = providers_file
+        self.check_interval = check_interval
+        # Incremented whenever the parsed configuration changes
+        self.version = 0
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[["ConfigManager"], None]] = []
+        self._last_check = 0.0
+        self._signatures: Dict[str, FileSignature] = {}
+        self._clear()
+    
+    def _clear(self):
         self._models = None
+        self._providers = None
+        self._by_id: Dict[str, ModelConfig] = {}
+        self._by_provider: Dict[str, List[ModelConfig]] = {}
+        self._enabled: List[ModelConfig] = []
+        self._issues: Optional[List[str]] = None
     
     @property
     def models(self) -> List[ModelConfig]:
         """Get all models from configuration."""
-        if self._models is None:
-            self._models = self._load_models()
-        return self._models
+        with self._lock:
+            if self._models is None:
+                self._index_models(self._load_models())
+            return self._models
+    
+    def _index_models(self, models: List[ModelConfig]):
+        """Store models with their lookup indexes; the first entry wins for duplicate IDs."""
+        self._models = models
+        self._by_id = {}
+        self._by_provider = {}
+        for model in models:
+            self._by_id.setdefault(model.model_id, model)
+            self._by_provider.setdefault(model.provider, []).append(model)
+        self._enabled = [m for m in models if m.enabled]
     
     def _load_models(self) -> List[ModelConfig]:
         """Load models from configuration file."""
@@ -38,8 +108,10 @@ class ConfigManager:
             if not os.path.exists(self.config_file):
                 raise FileNotFoundError(f"Configuration file '{self.config_file}' not found")
             
-            with open(self.config_file, 'r') as f:
-                data = json.load(f)
+            with open(self.config_file, 'rb') as f:
+                content = f.read()
+            self._signatures[self.config_file] = self._signature(self.config_file, content)
+            data = json.loads(content)
             
             if not isinstance(data, list):
                 raise ValueError("Configuration must be a list of model objects")
@@ -68,35 +140,162 @@ class ConfigManager:
         except Exception as e:
             raise ValueError(f"Error loading configuration: {e}")
     
+    @property
+    def providers(self) -> Dict[str, ProviderConfig]:
+        """Get per-provider settings, keyed by provider name."""
+        with self._lock:
+            if self._providers is None:
+                self._providers = self._load_providers()
+            return self._providers
+    
+    def _load_providers(self) -> Dict[str, ProviderConfig]:
+        """Load provider settings; the providers file is optional."""
+        if not os.path.exists(self.providers_file):
+            self._signatures[self.providers_file] = None
+            return {}
+        
+        try:
+            with open(self.providers_file, 'rb') as f:
+                content = f.read()
+            self._signatures[self.providers_file] = self._signature(self.providers_file, content)
+            data = json.loads(content)
+            
+            if not isinstance(data, dict):
+                raise ValueError("Provider configuration must be an object keyed by provider")
+            
+            providers = {}
+            for provider, settings in data.items():
+                if not isinstance(settings, dict):
+                    raise ValueError(f"Settings for provider '{provider}' must be an object")
+                providers[provider] = ProviderConfig(provider=provider, **settings)
+            
+            return providers
+            
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON in provider configuration file: {e}")
+        except Exception as e:
+            raise ValueError(f"Error loading provider configuration: {e}")
+    
+    @staticmethod
+    def _signature(path: str, content: Optional[bytes] = None) -> FileSignature:
+        """Identify a file's current state; content is hashed only when given."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        digest = hashlib.sha256(content).hexdigest() if content is not None else ""
+        return stat.st_mtime_ns, stat.st_size, digest
+    
+    def _file_changed(self, path: str) -> bool:
+        """Whether a loaded file's content differs from what was parsed."""
+        if path not in self._signatures:
+            return False
+        known = self._signatures[path]
+        current = self._signature(path)
+        if known is None or current is None:
+            return known != current
+        if current[:2] == known[:2]:
+            return False
+        
+        # mtime or size changed: only a different hash means new content
+        with open(path, 'rb') as f:
+            content = f.read()
+        current = self._signature(path, content)
+        if current[2] == known[2]:
+            self._signatures[path] = current
+            return False
+        return True
+    
+    def _check_for_changes(self, force: bool = False) -> bool:
+        """Drop parsed configuration if a file changed; checks are rate-limited to check_interval."""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+        
+        try:
+            changed = self._file_changed(self.config_file) or self._file_changed(self.providers_file)
+        except OSError as e:
+            logger.warning(f"Could not check configuration files: {e}")
+            return False
+        if changed:
+            logger.info("Configuration files changed; reloading")
+            self._signatures = {}
+            self._clear()
+            self.version += 1
+        return changed
+    
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reload the configuration if its files changed.
+        
+        Args:
+            force: Check now even if the last check was within check_interval
+        
+        Returns:
+            True if the configuration changed; listeners have been notified
+        """
+        with self._lock:
+            changed = self._check_for_changes(force)
+            listeners = list(self._listeners) if changed else []
+        for listener in listeners:
+            try:
+                listener(self)
+            except Exception as e:
+                logger.warning(f"Configuration listener failed: {e}")
+        return changed
+    
+    def add_listener(self, listener: Callable[["ConfigManager"], None]):
+        """Call listener(config_manager) after refresh() finds changed configuration."""
+        with self._lock:
+            self._listeners.append(listener)
+    
+    def get_provider_config(self, provider: str) -> ProviderConfig:
+        """Get settings for a provider, falling back to defaults."""
+        return self.providers.get(provider) or ProviderConfig(provider=provider)
+    
     def get_enabled_models(self) -> List[ModelConfig]:
         """Get only enabled models."""
-        return [m for m in self.models if m.enabled]
+        with self._lock:
+            self.models
+            return list(self._enabled)
     
     def get_models_by_provider(self, provider: str) -> List[ModelConfig]:
         """Get models for a specific provider."""
-        return [m for m in self.models if m.provider == provider]
+        with self._lock:
+            self.models
+            return list(self._by_provider.get(provider, []))
     
     def get_model_by_id(self, model_id: str) -> Optional[ModelConfig]:
         """Get a specific model by model_id."""
-        for model in self.models:
-            if model.model_id == model_id:
-                return model
-        return None
+        with self._lock:
+            self.models
+            return self._by_id.get(model_id)
     
     def reload_config(self):
         """Reload configuration from file."""
-        self._models = None
+        with self._lock:
+            self._signatures = {}
+            self._clear()
+            self.version += 1
     
     def validate_config(self) -> List[str]:
-        """Validate configuration and return list of issues."""
+        """Validate configuration and return list of issues (cached until the configuration changes)."""
+        with self._lock:
+            self.models
+            if self._issues is None:
+                self._issues = self._validate()
+            return list(self._issues)
+    
+    def _validate(self) -> List[str]:
         issues = []
         
         try:
             models = self.models
             
             # Check for duplicate model IDs
-            model_ids = [m.model_id for m in models]
-            duplicates = set([model_id for model_id in model_ids if model_ids.count(model_id) > 1])
+            counts = Counter(m.model_id for m in models)
+            duplicates = {model_id for model_id, count in counts.items() if count > 1}
             if duplicates:
                 issues.append(f"Duplicate model IDs found: {duplicates}")
             
@@ -108,7 +307,58 @@ class ConfigManager:
                 if model.provider not in supported_providers:
                     issues.append(f"Unsupported provider '{model.provider}' for model '{model.model_id}'")
             
+            for provider, settings in self.providers.items():
+                if settings.max_concurrency < 1:
+                    issues.append(f"max_concurrency for provider '{provider}' must be at least 1")
+                if settings.max_hedges < 0:
+                    issues.append(f"max_hedges for provider '{provider}' must not be negative")
+                for field in ("rpm", "tpm"):
+                    value = getattr(settings, field)
+                    if value is not None and value <= 0:
+                        issues.append(f"{field} for provider '{provider}' must be positive")
+            
+            for model in models:
+                for field in ("rpm", "tpm"):
+                    value = getattr(model, field)
+                    if value is not None and value <= 0:
+                        issues.append(f"{field} for model '{model.model_id}' must be positive")
+                for field in ("input_price", "output_price", "cached_input_price"):
+                    value = getattr(model, field)
+                    if value is not None and value < 0:
+                        issues.append(f"{field} for model '{model.model_id}' must not be negative")
+                threshold = model.similarity_threshold
+                if threshold is not None and not 0 < threshold <= 1:
+                    issues.append(f"similarity_threshold for model '{model.model_id}' must be between 0 and 1")
+            
         except Exception as e:
             issues.append(f"Configuration validation error: {e}")
         
-        return issues 
\ No newline at end of file
+        return issues
+
+class ConfigWatcher:
+    """
+    Background thread that polls a ConfigManager's files and reloads on change.
+    
+    Listeners registered on the manager run on the watcher thread.
+    """
+    
+    def __init__(self, config_manager: ConfigManager, interval: float = 2.0):
+        self.config_manager = config_manager
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> "ConfigWatcher":
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.config_manager.refresh(force=True)
+            except Exception as e:
+                logger.warning(f"Configuration watcher error: {e}")
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Run a large prompt × model matrix across worker processes on one or more hosts.
+
+    init     split a prompts file into shards in a run directory
+    worker   claim and run shards until none are left (start as many as you like)
+    status   show shard progress and live workers
+    merge    combine the workers' results into one JSONL file
+    retry-failed  queue shards that failed on every attempt again
+    run      init, start --workers local workers, restart any that crash, then merge
+
+Shards whose worker dies are retried once their lease runs out. For workers
+on several hosts, put the run directory on shared storage with working file
+locks (e.g. NFSv4) and keep host clocks within a small fraction of --lease.
+"""
+
+import argparse
+import logging
+import subprocess
+import sys
+import time
+
+from config.settings import ConfigManager
+from models.rate_limit import rate_limiter
+from utils.distributed_run import DistributedRun
+from utils.metrics import metrics_registry
+from utils.provider_scheduler import ProviderScheduler
+from utils.response_cache import ResponseCache
+from utils.run_history import RunHistory
+from utils.work_queue import DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS
+
+
+def add_queue_args(parser):
+    parser.add_argument("run_dir", help="Run directory holding the shard queue and results")
+    parser.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help=f"Seconds before a silent worker's shard is retried (default: {DEFAULT_LEASE_SECONDS:g})")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help=f"Attempts per shard before it is marked failed (default: {DEFAULT_MAX_ATTEMPTS})")
+
+
+def add_init_args(parser):
+    parser.add_argument("input", help="JSONL file with one {\"id\": ..., \"prompt\": ...} object per line")
+    parser.add_argument("--models", help="Comma-separated model IDs (default: all enabled models)")
+    parser.add_argument("--shard-size", type=int, default=50, help="Prompts per shard (default: 50)")
+    parser.add_argument("--system-file",
+                        help="Text file with a system prompt sent ahead of every prompt")
+
+
+def add_worker_args(parser):
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Maximum requests in flight in each worker (default: 16)")
+    parser.add_argument("--poll-interval", type=float, default=5.0,
+                        help="Seconds between claims while other workers hold the remaining shards (default: 5)")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the API")
+    parser.add_argument("--retry-errors", action="store_true",
+                        help="Re-run pairs whose result in an earlier attempt of the shard was an error")
+    parser.add_argument("--no-history", action="store_true",
+                        help="Don't append results to the run history (.cache/history.sqlite3)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="models_config.json", help="Model configuration file")
+    parser.add_argument("--providers-config", default="providers_config.json",
+                        help="Provider settings file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable debug logging")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    init = commands.add_parser("init", help="Create a run directory")
+    add_queue_args(init)
+    add_init_args(init)
+
+    worker = commands.add_parser("worker", help="Run shards from a run directory")
+    add_queue_args(worker)
+    add_worker_args(worker)
+    worker.add_argument("--worker-id", help="Name shown in status output (default: host:pid)")
+
+    status = commands.add_parser("status", help="Show shard progress")
+    add_queue_args(status)
+
+    merge = commands.add_parser("merge", help="Write one result per prompt × model pair")
+    add_queue_args(merge)
+    merge.add_argument("output", help="JSONL file to write (overwritten)")
+
+    retry = commands.add_parser("retry-failed", help="Queue failed shards again")
+    add_queue_args(retry)
+
+    run = commands.add_parser("run", help="Init, run local workers and merge")
+    add_queue_args(run)
+    add_init_args(run)
+    add_worker_args(run)
+    run.add_argument("output", help="JSONL file the merged results are written to")
+    run.add_argument("--workers", type=int, default=4, help="Local worker processes (default: 4)")
+    return parser.parse_args(argv)
+
+
+def select_model_ids(config, model_ids):
+    """Resolve --models against the configuration."""
+    if not model_ids:
+        return [model.model_id for model in config.get_enabled_models()]
+
+    selected = []
+    for model_id in model_ids.split(","):
+        model = config.get_model_by_id(model_id.strip())
+        if model is None:
+            raise SystemExit(f"Unknown model ID: {model_id}")
+        selected.append(model.model_id)
+    return selected
+
+
+def open_run(args) -> DistributedRun:
+    try:
+        return DistributedRun(args.run_dir, lease_seconds=args.lease, max_attempts=args.max_attempts)
+    except FileNotFoundError as e:
+        raise SystemExit(f"{e} (create it with 'init')")
+
+
+def init_run(args, config) -> DistributedRun:
+    model_ids = select_model_ids(config, args.models)
+    if not model_ids:
+        raise SystemExit("No models selected")
+    system_prompt = None
+    if args.system_file:
+        with open(args.system_file, 'r') as f:
+            system_prompt = f.read()
+    try:
+        run = DistributedRun.create(
+            args.run_dir, args.input, model_ids, shard_size=args.shard_size, system_prompt=system_prompt,
+            lease_seconds=args.lease, max_attempts=args.max_attempts
+        )
+    except (FileExistsError, ValueError) as e:
+        raise SystemExit(str(e))
+    print(f"{run.queue.status().total} shards of up to {args.shard_size} prompts × {len(model_ids)} models "
+          f"in {args.run_dir}", file=sys.stderr)
+    return run
+
+
+def run_worker(args, config) -> int:
+    run = open_run(args)
+    scheduler = ProviderScheduler.from_config(config)
+    rate_limiter.configure(config)
+    if not args.no_history:
+        metrics_registry.add_sink(RunHistory().record)
+    try:
+        summary = run.work(
+            config,
+            worker_id=args.worker_id,
+            max_in_flight=args.concurrency,
+            cache=None if args.no_cache else ResponseCache(),
+            scheduler=scheduler,
+            poll_interval=args.poll_interval,
+            retry_errors=args.retry_errors
+        )
+    except ValueError as e:
+        raise SystemExit(str(e))
+    finally:
+        scheduler.shutdown(wait=False)
+
+    print(
+        f"worker done: {summary.completed} completed, {summary.failed} failed, "
+        f"{summary.skipped} skipped (already done) in {summary.elapsed_time:.1f}s, "
+        f"${summary.cost:.4f} estimated cost",
+        file=sys.stderr
+    )
+    return 0
+
+
+def print_status(run: DistributedRun):
+    status = run.queue.status()
+    print(f"{status.done}/{status.total} shards done, {status.pending} pending, {status.leased} leased "
+          f"({status.expired} expired), {status.failed} failed")
+    for worker in status.workers:
+        print(f"  worker: {worker}")
+    for shard_id, state, error in run.queue.errors():
+        print(f"  shard {shard_id} ({state}): {error}")
+
+
+def merge_run(run: DistributedRun, output: str) -> int:
+    summary = run.merge(output)
+    print(f"{summary.records} results written to {output} ({summary.failed} errors, "
+          f"{summary.duplicates} duplicates from retried shards dropped)", file=sys.stderr)
+    if summary.unfinished_shards:
+        print(f"warning: {summary.unfinished_shards} shards are not done; their results are partial",
+              file=sys.stderr)
+        return 1
+    return 1 if summary.failed else 0
+
+
+def worker_command(args, worker_number: int):
+    """Command line for a local worker process with the same settings as `run`."""
+    command = [
+        sys.executable, __file__, "--config", args.config, "--providers-config", args.providers_config,
+        "worker", args.run_dir, "--lease", str(args.lease), "--max-attempts", str(args.max_attempts),
+        "--concurrency", str(args.concurrency), "--poll-interval", str(args.poll_interval),
+        "--worker-id", f"local-{worker_number}",
+    ]
+    for flag in ("no_cache", "retry_errors", "no_history", "verbose"):
+        if getattr(args, flag):
+            command.append("--" + flag.replace("_", "-"))
+    return command
+
+
+def run_local(args, config) -> int:
+    """Create the run, keep --workers worker processes going until it finishes, then merge."""
+    run = init_run(args, config)
+    workers = {n: subprocess.Popen(worker_command(args, n)) for n in range(args.workers)}
+    restarts_left = args.workers * args.max_attempts
+    try:
+        while workers:
+            time.sleep(1.0)
+            for n, process in list(workers.items()):
+                code = process.poll()
+                if code is None:
+                    continue
+                del workers[n]
+                if code != 0 and restarts_left and not run.queue.status().finished:
+                    # Its shard is retried when the lease runs out; keep the worker count up meanwhile
+                    print(f"worker local-{n} exited with {code}; restarting it", file=sys.stderr)
+                    restarts_left -= 1
+                    workers[n] = subprocess.Popen(worker_command(args, n))
+    except KeyboardInterrupt:
+        for process in workers.values():
+            process.terminate()
+        raise
+
+    print_status(run)
+    return merge_run(run, args.output)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    config = ConfigManager(args.config, providers_file=args.providers_config)
+
+    if args.command == "init":
+        init_run(args, config)
+        return 0
+    if args.command == "worker":
+        return run_worker(args, config)
+    if args.command == "run":
+        return run_local(args, config)
+
+    run = open_run(args)
+    if args.command == "status":
+        print_status(run)
+    elif args.command == "merge":
+        return merge_run(run, args.output)
+    elif args.command == "retry-failed":
+        print(f"{run.queue.retry_failed()} failed shards queued again", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,19 +4,33 @@ import logging
 import os
 from typing import List
 
-def configure_logging():
-    """Configure logging suppressions based on enabled models."""
+from config.settings import ConfigManager, ConfigWatcher
+from models.model_factory import ModelFactory
+from models.cancellation import CancelScope
+from models.client_pool import client_pool
+from models.rate_limit import rate_limiter
+from utils.parallel_executor import ParallelExecutor, StreamEvent
+from utils.provider_scheduler import ProviderScheduler
+from utils.response_cache import ResponseCache
+from utils.run_history import RunHistory
+from utils.agreement import AgreementEngine
+from utils.model_catalog import ModelCatalog
+from utils.similar_prompts import DEFAULT_SIMILARITY_THRESHOLD
+from utils.metrics import metrics_registry, start_metrics_server
+from utils.latency_benchmark import LatencyBenchmark
+from utils.hedging import HedgePolicy
+from ui.components import ModelSelector, LiveResponseDisplay, PromptInput, CustomCSS, HistoryDashboard, AgreementDisplay, ClientPoolPanel, StartupPanel, BulkheadPanel, RateLimitPanel, MetricsPanel, BenchmarkDisplay
+
+def configure_logging(config_manager: ConfigManager):
+    """
+    Configure logging suppressions based on enabled models.
+    
+    Provider SDKs are imported only when their first model is created, so
+    this runs before any of them can log.
+    """
     try:
-        # Check if Gemini is enabled in config
-        import json
-        with open("models_config.json", "r") as f:
-            config = json.load(f)
-        
         # Check if any Gemini models are enabled
-        has_gemini = any(
-            model.get("provider") == "gemini" and model.get("enabled", True) 
-            for model in config
-        )
+        has_gemini = any(model.provider == "gemini" for model in config_manager.get_enabled_models())
         
         if has_gemini:
             # Only suppress Google/gRPC warnings if Gemini is enabled
@@ -37,23 +51,84 @@ def configure_logging():
         os.environ['GRPC_PYTHON_LOG_LEVEL'] = 'error'
         warnings.filterwarnings('ignore', category=DeprecationWarning)
 
-# Configure logging before imports that might generate warnings
-configure_logging()
+@st.cache_resource(show_spinner=False)
+def get_config_manager() -> ConfigManager:
+    """
+    Process-wide configuration, parsed once and shared by every component.
+    
+    Reruns call refresh(), which reloads only when a config file changed.
+    With CONFIG_WATCH_INTERVAL set, a background watcher polls the files too,
+    so open sessions pick up edits without any user interaction.
+    """
+    config_manager = ConfigManager()
+    configure_logging(config_manager)
+    # New rpm/tpm limits apply on reload; pool sizes still need a restart
+    config_manager.add_listener(rate_limiter.configure)
+    if os.getenv("CONFIG_WATCH_INTERVAL"):
+        ConfigWatcher(config_manager, float(os.getenv("CONFIG_WATCH_INTERVAL"))).start()
+    return config_manager
 
-# Import modular components
-from config.settings import ConfigManager
-from models.model_factory import ModelFactory
-from utils.parallel_executor import ParallelExecutor
-from ui.components import ModelSelector, ResponseDisplay, PromptInput, CustomCSS
+# Configure logging before any provider SDK is loaded
+get_config_manager()
+
+@st.cache_resource(show_spinner=False)
+def warm_up_clients(_models: tuple, model_ids: tuple) -> dict:
+    """Pre-open provider connections once per process; cached across reruns and sessions."""
+    return client_pool.warmup(list(_models))
+
+@st.cache_resource(show_spinner=False)
+def get_scheduler() -> ProviderScheduler:
+    """Process-wide per-provider scheduler, kept alive across reruns and sessions."""
+    return ProviderScheduler.from_config(get_config_manager())
+
+@st.cache_resource(show_spinner=False)
+def configure_rate_limits():
+    """Seed the process-wide rate limiter from the configured rpm/tpm once per process."""
+    rate_limiter.configure(get_config_manager())
+    return rate_limiter
+
+@st.cache_resource(show_spinner=False)
+def get_hedge_policy() -> HedgePolicy:
+    """Process-wide hedge policy, so per-provider hedge caps hold across sessions."""
+    return HedgePolicy.from_config(get_config_manager())
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache() -> ResponseCache:
+    """Process-wide on-disk response cache."""
+    return ResponseCache()
+
+@st.cache_resource(show_spinner=False)
+def get_run_history() -> RunHistory:
+    """Process-wide run history, fed every response the metrics registry records."""
+    history = RunHistory()
+    metrics_registry.add_sink(history.record)
+    return history
+
+@st.cache_resource(show_spinner=False)
+def get_model_catalog() -> ModelCatalog:
+    """Model lists cached on disk by check_models.py; read only, so startup makes no network calls."""
+    return ModelCatalog()
+
+@st.cache_resource(show_spinner=False)
+def get_metrics_server(port: int):
+    """Serve Prometheus metrics on METRICS_PORT once per process."""
+    return start_metrics_server(metrics_registry, port)
 
 class LLMComparisonApp:
     """Main application class for LLM comparison tool."""
     
     def __init__(self):
         """Initialize the application with required components."""
-        self.config_manager = ConfigManager()
+        self.config_manager = get_config_manager()
         self.model_factory = ModelFactory()
-        self.executor = ParallelExecutor()
+        self.scheduler = get_scheduler()
+        configure_rate_limits()
+        self.history = get_run_history()
+        self.catalog = get_model_catalog()
+        self.metrics_file = os.getenv("METRICS_FILE")
+        if os.getenv("METRICS_PORT"):
+            get_metrics_server(int(os.getenv("METRICS_PORT")))
+        self.executor = ParallelExecutor(scheduler=self.scheduler)
         
         # Configure Streamlit
         st.set_page_config(
@@ -64,9 +139,20 @@ class LLMComparisonApp:
     
     def run(self):
         """Run the main application."""
+        # A rerun abandons the previous comparison; stop its requests too
+        previous = st.session_state.pop("comparison_scope", None)
+        if previous is not None:
+            previous.cancel("Cancelled by a newer run")
+        
+        self._check_config_version()
+        
         # Render custom CSS
         CustomCSS.render()
         
+        if st.sidebar.radio("View", ["Compare", "History"], horizontal=True) == "History":
+            HistoryDashboard.render(self.history)
+            return
+        
         # App header
         st.title("🤖 LLM Model Comparison")
         st.markdown("Compare responses from multiple Large Language Models side by side.")
@@ -78,8 +164,10 @@ class LLMComparisonApp:
                 st.error("No enabled models found in configuration.")
                 return
                 
-            # Validate configuration
+            # Validate configuration, and model IDs against the cached provider model lists
             issues = self.config_manager.validate_config()
+            self.catalog.reload()
+            issues = issues + self.catalog.validate(models)
             if issues:
                 with st.expander("⚠️ Configuration Issues", expanded=False):
                     for issue in issues:
@@ -90,7 +178,12 @@ class LLMComparisonApp:
             st.info("Please check your models_config.json file.")
             return
         
+        self._render_connection_panel(models)
+        if os.getenv("CONFIG_WATCH_INTERVAL"):
+            self._watch_config()
+        
         # Prompt input
+        system_prompt = PromptInput.render_system_prompt()
         prompt = PromptInput.render()
         
         # Model selection
@@ -103,11 +196,142 @@ class LLMComparisonApp:
             st.warning("⚠️ Please select at least one model.")
             return
         
+        stream = st.toggle("Stream responses as they are generated", value=True)
+        conversation = st.toggle(
+            "Conversation mode",
+            value=False,
+            help="Send each model the earlier prompts and its own answers, so follow-up prompts continue the chat."
+        )
+        if conversation:
+            conversations = st.session_state.setdefault("conversations", {})
+            turns = max((len(history) // 2 for history in conversations.values()), default=0)
+            if PromptInput.render_conversation(turns):
+                conversations.clear()
+                st.rerun()
+        use_cache = st.toggle(
+            "Reuse cached responses",
+            value=True,
+            help="Serve repeated prompts from the local response cache. Turn off to always call the API."
+        )
+        match_similar = st.toggle(
+            "Match similar prompts",
+            value=False,
+            disabled=not use_cache,
+            help="Also reuse cached responses to near-identical prompts (differing in case, whitespace, "
+                 "punctuation or a few words). Each answer is labelled with the prompt it was generated for."
+        )
+        hedge = st.toggle(
+            "Hedge slow requests",
+            value=False,
+            help="If a model is slower than 95% of its recorded requests, send a duplicate request "
+                 "and use whichever answers first. Costs extra tokens for the duplicates."
+        )
+        self.executor.hedge_policy = get_hedge_policy() if hedge else None
+        deadline = st.number_input(
+            "Comparison deadline (seconds)",
+            min_value=0,
+            max_value=600,
+            value=120,
+            help="Stop waiting for slow models after this long and show what has arrived. 0 waits indefinitely."
+        )
+        benchmark = st.toggle(
+            "Latency benchmark mode",
+            value=False,
+            help="Send the prompt repeatedly to each model and compare latency distributions instead of responses."
+        )
+        
+        if benchmark:
+            col1, col2, col3 = st.columns(3)
+            repetitions = col1.number_input("Repetitions per model", min_value=2, max_value=200, value=10)
+            warmup = col2.number_input("Warmup runs (discarded)", min_value=0, max_value=20, value=1)
+            concurrency = col3.number_input("Concurrent requests", min_value=1, max_value=32, value=1)
+            if st.button("⏱️ Run Benchmark", type="primary"):
+                self._handle_benchmark(
+                    prompt, selected_models, int(repetitions), int(warmup), int(concurrency), stream=stream
+                )
+            return
+        
+        # A model was asked to answer this prompt itself instead of reusing a similar prompt's answer
+        fresh_calls = st.session_state.pop("fresh_call_models", None)
+        if fresh_calls:
+            if conversation:
+                self._drop_last_turn(fresh_calls, prompt)
+            self._handle_generation(
+                prompt, [m for m in selected_models if m.model_id in fresh_calls],
+                stream=stream, use_cache=False, deadline=float(deadline),
+                system_prompt=system_prompt, conversation=conversation
+            )
+            return
+        
         # Generate responses button
         if st.button("🚀 Generate Responses", type="primary"):
-            self._handle_generation(prompt, selected_models)
+            self._handle_generation(
+                prompt, selected_models, stream=stream, use_cache=use_cache, deadline=float(deadline),
+                match_similar=use_cache and match_similar, system_prompt=system_prompt,
+                conversation=conversation
+            )
+    
+    def _check_config_version(self):
+        """Reload changed config files and tell the session when its configuration changed."""
+        self.config_manager.refresh()
+        seen = st.session_state.get("config_version")
+        st.session_state["config_version"] = self.config_manager.version
+        if seen is not None and seen != self.config_manager.version:
+            st.toast("🔄 Model configuration reloaded")
+    
+    def _watch_config(self):
+        """
+        Show a notice in this session when the background watcher reloads the configuration.
+        
+        Only the fragment reruns on its timer, so results on screen are kept
+        until the user chooses to apply the new configuration. Streamlit
+        before 1.37 has no fragments; the notice then appears at the next
+        page interaction instead.
+        """
+        interval = float(os.getenv("CONFIG_WATCH_INTERVAL"))
+        
+        def poll():
+            if st.session_state.get("config_version") != self.config_manager.version:
+                st.info("🔄 The model configuration changed on disk.")
+                if st.button("Apply new configuration"):
+                    st.rerun()
+        
+        if hasattr(st, "fragment"):
+            poll = st.fragment(run_every=interval)(poll)
+        poll()
+    
+    def _render_connection_panel(self, models: List):
+        """Render client pool stats and trigger connection warmup when requested."""
+        auto_warmup = os.getenv("WARMUP_CLIENTS", "").lower() in ("1", "true", "yes")
+        
+        with st.sidebar:
+            BulkheadPanel.render(self.scheduler.metrics())
+            RateLimitPanel.render(rate_limiter.snapshot())
+            MetricsPanel.render(metrics_registry.summaries(), metrics_registry.to_prometheus())
+            warm_clicked = ClientPoolPanel.render(client_pool.stats())
+            StartupPanel.render(ModelFactory.load_report(), client_pool.stats())
+            if not (warm_clicked or auto_warmup):
+                return
+            
+            instances = []
+            for model_config in models:
+                try:
+                    instances.append(self.model_factory.create_model(
+                        model_config.model_id, model_config.provider
+                    ))
+                except Exception:
+                    continue
+            
+            if warm_clicked:
+                errors = client_pool.warmup(instances)
+            else:
+                errors = warm_up_clients(tuple(instances), tuple(m.model_id for m in models))
+            for provider, error in errors.items():
+                st.caption(f"⚠️ Warmup failed for {provider}: {error}")
     
-    def _handle_generation(self, prompt: str, selected_models: List):
+    def _handle_generation(self, prompt: str, selected_models: List, stream: bool = True,
+                           use_cache: bool = True, deadline: float = 0, match_similar: bool = False,
+                           system_prompt: str = "", conversation: bool = False):
         """Handle the response generation process."""
         if not prompt.strip():
             st.warning("⚠️ Please enter a prompt before generating responses.")
@@ -122,9 +346,9 @@ class LLMComparisonApp:
         try:
             # Update status
             status_text.text("🔄 Initializing models...")
-            progress_bar.progress(0.2)
             
             # Create model instances
+            conversations = st.session_state.get("conversations", {}) if conversation else {}
             model_instances = []
             for model_config in selected_models:
                 try:
@@ -132,44 +356,164 @@ class LLMComparisonApp:
                         model_config.model_id,  # Use model_id for LLM calls
                         model_config.provider,
                         max_tokens=model_config.max_tokens,
-                        temperature=model_config.temperature
+                        temperature=model_config.temperature,
+                        cache=get_response_cache() if use_cache and model_config.cache else None,
+                        timeout=model_config.timeout,
+                        input_price=model_config.input_price,
+                        output_price=model_config.output_price,
+                        cached_input_price=model_config.cached_input_price,
+                        similarity_threshold=(
+                            model_config.similarity_threshold or DEFAULT_SIMILARITY_THRESHOLD
+                        ) if match_similar else None,
+                        system_prompt=system_prompt.strip() or None,
+                        history=conversations.get(model_config.model_id)
                     )
                     model_instances.append(model)
                 except Exception as e:
                     st.error(f"Failed to initialize {model_config.display_name}: {e}")
                     return
             
-            # Update status
             status_text.text("⚡ Generating responses in parallel...")
-            progress_bar.progress(0.4)
+            progress_bar.progress(0.0)
             
-            # Generate responses in parallel
-            responses = self.executor.execute_parallel(model_instances, prompt)
+            # Fill in each column the moment its model finishes
+            display = LiveResponseDisplay(
+                [m.display_name for m in selected_models],
+                waiting_message="⏳ Waiting for first token..." if stream else "⏳ Waiting for response...",
+                on_fresh_call=lambda index: st.session_state.setdefault("fresh_call_models", set()).add(
+                    selected_models[index].model_id
+                )
+            )
+            responses = [None] * len(model_instances)
             
-            # Update response model names to use display names for UI
-            for i, response in enumerate(responses):
-                if i < len(selected_models):
-                    response.model_name = selected_models[i].display_name
+            # Shared deadline for this comparison; the next rerun cancels it
+            scope = CancelScope(deadline or None)
+            st.session_state["comparison_scope"] = scope
             
-            # Update status
-            progress_bar.progress(1.0)
-            status_text.text("✅ Generation complete!")
+            if stream:
+                events = self.executor.execute_streaming(model_instances, prompt, scope=scope)
+            else:
+                events = (
+                    StreamEvent(index, response=response)
+                    for index, response in self.executor.iter_completed(model_instances, prompt, scope=scope)
+                )
+            
+            done = 0
+            for event in events:
+                if event.response is None:
+                    display.append(event.index, event.chunk)
+                    continue
+                
+                # Use display names for UI
+                event.response.model_name = selected_models[event.index].display_name
+                responses[event.index] = event.response
+                display.finalize(event.index, event.response)
+                
+                done += 1
+                progress_bar.progress(done / len(responses))
+                status_text.text(
+                    f"⚡ {done}/{len(responses)} done, latest: "
+                    f"{event.response.model_name} ({event.response.elapsed_time:.2f}s)"
+                )
             
             # Clear progress indicators
             progress_bar.empty()
             status_text.empty()
             
-            # Display results
-            ResponseDisplay.render(responses)
+            if scope.reason:
+                finished = sum(1 for r in responses if r.error != scope.reason)
+                st.warning(f"⏰ {scope.reason}: {finished} of {len(responses)} models finished")
+            
+            if self.metrics_file:
+                metrics_registry.export(self.metrics_file)
+            
+            if conversation:
+                self._record_turn(prompt, selected_models, responses)
             
             # Show summary statistics
             self._show_summary(responses)
+            self._show_agreement(responses)
             
         except Exception as e:
             st.error(f"Error during generation: {e}")
             progress_bar.empty()
             status_text.empty()
     
+    def _handle_benchmark(self, prompt: str, selected_models: List, repetitions: int, warmup: int,
+                          concurrency: int, stream: bool = True):
+        """Run repeated sampling for the selected models and show latency distributions."""
+        if not prompt.strip():
+            st.warning("⚠️ Please enter a prompt before running a benchmark.")
+            return
+        
+        st.subheader(f"⏱️ Benchmarking {len(selected_models)} models:")
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+        
+        try:
+            # No response cache: cached replies are not latency samples
+            model_instances = [
+                self.model_factory.create_model(
+                    m.model_id, m.provider, max_tokens=m.max_tokens, temperature=m.temperature,
+                    timeout=m.timeout
+                )
+                for m in selected_models
+            ]
+            status_text.text(f"🔥 Running {warmup} warmup request(s) per model...")
+            
+            def on_sample(done: int, total: int):
+                progress_bar.progress(done / total)
+                status_text.text(f"⏱️ {done}/{total} measured requests")
+            
+            report = LatencyBenchmark(
+                repetitions=repetitions, warmup=warmup, concurrency=concurrency, stream=stream
+            ).run(
+                model_instances, prompt, labels=[m.display_name for m in selected_models], on_sample=on_sample
+            )
+            
+            progress_bar.empty()
+            status_text.empty()
+            if not stream:
+                st.caption("Streaming is off, so time to first token was not measured.")
+            if self.metrics_file:
+                metrics_registry.export(self.metrics_file)
+            BenchmarkDisplay.render(report)
+            
+        except Exception as e:
+            st.error(f"Error during benchmark: {e}")
+            progress_bar.empty()
+            status_text.empty()
+    
+    def _record_turn(self, prompt: str, selected_models: List, responses: List):
+        """Append the prompt and each model's own answer to that model's conversation history."""
+        conversations = st.session_state.setdefault("conversations", {})
+        for model_config, response in zip(selected_models, responses):
+            if response is None or response.error or not response.text:
+                continue
+            conversations.setdefault(model_config.model_id, []).extend([
+                {"role": "user", "content": prompt},
+                {"role": "assistant", "content": response.text}
+            ])
+    
+    def _drop_last_turn(self, model_ids, prompt: str):
+        """Forget the reused answers to this prompt before the models are asked it again."""
+        conversations = st.session_state.get("conversations", {})
+        for model_id in model_ids:
+            history = conversations.get(model_id, [])
+            if len(history) >= 2 and history[-2]["content"] == prompt:
+                del history[-2:]
+    
+    def _show_agreement(self, responses: List):
+        """Show how similar the successful responses are to each other."""
+        answered = [r for r in responses if r is not None and not r.error and r.text]
+        if len(answered) < 2:
+            return
+        
+        report = AgreementEngine().compare(
+            [[r.text for r in answered]], [r.model_name for r in answered], outlier_limit=1
+        )
+        AgreementDisplay.render(report)
+    
     def _show_summary(self, responses: List):
         """Show summary statistics of the responses."""
         if not responses:
@@ -183,9 +527,11 @@ class LLMComparisonApp:
             failed_responses = [r for r in responses if r.error]
             
             if successful_responses:
-                avg_time = sum(r.elapsed_time for r in successful_responses) / len(successful_responses)
-                fastest = min(successful_responses, key=lambda r: r.elapsed_time)
-                slowest = max(successful_responses, key=lambda r: r.elapsed_time)
+                # Cache hits report the provider latency recorded when they were generated
+                latency = lambda r: r.original_elapsed_time if r.cache_hit else r.elapsed_time
+                avg_time = sum(latency(r) for r in successful_responses) / len(successful_responses)
+                fastest = min(successful_responses, key=latency)
+                slowest = max(successful_responses, key=latency)
                 
                 with col1:
                     st.metric("✅ Successful", len(successful_responses))
@@ -194,11 +540,41 @@ class LLMComparisonApp:
                     st.metric("⚡ Average Time", f"{avg_time:.2f}s")
                 
                 with col3:
-                    st.metric("🏃 Fastest", f"{fastest.model_name} ({fastest.elapsed_time:.2f}s)")
+                    st.metric("🏃 Fastest", f"{fastest.model_name} ({latency(fastest):.2f}s)")
                 
                 with col4:
-                    st.metric("🐌 Slowest", f"{slowest.model_name} ({slowest.elapsed_time:.2f}s)")
-            
+                    st.metric("🐌 Slowest", f"{slowest.model_name} ({latency(slowest):.2f}s)")
+
+                cached = [r for r in successful_responses if r.cache_hit]
+                if cached:
+                    st.caption(
+                        f"♻️ {len(cached)} response(s) served from cache; "
+                        f"timings above use their original provider latency"
+                    )
+                
+                ttfts = [r.time_to_first_token for r in successful_responses if r.time_to_first_token is not None]
+                if ttfts:
+                    first = min(
+                        (r for r in successful_responses if r.time_to_first_token is not None),
+                        key=lambda r: r.time_to_first_token
+                    )
+                    st.caption(
+                        f"⚡ Average time to first token: {sum(ttfts) / len(ttfts):.2f}s "
+                        f"(first: {first.model_name}, {first.time_to_first_token:.2f}s)"
+                    )
+                
+                throughput = [r for r in successful_responses if r.tokens_per_second is not None and not r.cache_hit]
+                if throughput:
+                    best = max(throughput, key=lambda r: r.tokens_per_second)
+                    st.caption(f"🚀 Highest output throughput: {best.model_name} ({best.tokens_per_second:.1f} tok/s)")
+                
+                priced = [r for r in successful_responses if r.cost is not None and not r.cache_hit]
+                if priced:
+                    st.caption(
+                        f"💵 Estimated cost: ${sum(r.cost for r in priced):.4f} "
+                        f"across {len(priced)} priced model(s)"
+                    )
+
             if failed_responses:
                 st.error(f"❌ {len(failed_responses)} model(s) failed to generate responses")
 
@@ -0,0 +1 @@
+# Local stand-in servers mimicking provider APIs
\ No newline at end of file
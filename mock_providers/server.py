@@ -0,0 +1,676 @@
+#!/usr/bin/env python3
+"""
+Local stand-in server that mimics provider HTTP APIs.
+
+Point the SDKs at it with OPENAI_BASE_URL / XAI_BASE_URL=http://127.0.0.1:<port>/v1,
+ANTHROPIC_BASE_URL=http://127.0.0.1:<port> and GOOGLE_GEMINI_BASE_URL=http://127.0.0.1:<port>.
+Responses echo the prompt, so results can be checked without network access
+or API keys. A LatencyProfile adds simulated provider latency, a streaming
+rate and injected errors for benchmarking.
+"""
+
+import argparse
+import email.parser
+import email.policy
+import json
+import math
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+def mock_reply(prompt: str, extra_tokens: int = 0) -> str:
+    """Deterministic reply text for a prompt, padded with extra_tokens filler words."""
+    return f"Mock response to: {prompt}" + " lorem" * extra_tokens
+
+
+def count_tokens(text: str) -> int:
+    """Rough whitespace token count used for mock usage numbers."""
+    return max(1, len(text.split()))
+
+
+def last_user_text(messages: List[Dict[str, Any]]) -> str:
+    """Extract the text of the last user message in OpenAI or Anthropic format."""
+    for message in reversed(messages or []):
+        if message.get("role") != "user":
+            continue
+        content = message.get("content")
+        if isinstance(content, str):
+            return content
+        return "".join(part.get("text", "") for part in content or [] if isinstance(part, dict))
+    return ""
+
+
+def gemini_prompt(body: Dict[str, Any]) -> str:
+    """Extract the text of the last user turn from a Gemini generateContent body."""
+    for content in reversed(body.get("contents") or []):
+        if content.get("role", "user") == "user":
+            return "".join(part.get("text", "") for part in content.get("parts") or [])
+    return ""
+
+
+def iso_now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+@dataclass
+class LatencyProfile:
+    """
+    Simulated provider timing and failures for chat requests.
+
+    Time to first token is drawn per (model, prompt) pair from a fixed or
+    lognormal distribution seeded by the pair, so a caller knows the exact
+    server-side time of each request in advance (see server_time). Reply
+    tokens are then emitted at tokens_per_second; 0 sends them at once.
+    """
+    latency: float = 0.0
+    distribution: str = "fixed"
+    sigma: float = 0.5
+    tokens_per_second: float = 0.0
+    reply_tokens: int = 0
+    error_rate: float = 0.0
+    error_status: int = 500
+    seed: int = 0
+
+    def _rng(self, prompt: str, model: str) -> random.Random:
+        return random.Random(zlib.crc32(f"{model}\0{prompt}".encode("utf-8")) ^ self.seed)
+
+    def first_token_delay(self, prompt: str, model: str = "") -> float:
+        """Seconds before the response headers and first token are sent."""
+        if self.latency <= 0:
+            return 0.0
+        if self.distribution == "lognormal":
+            # Median stays at `latency`; sigma widens the tail
+            return self._rng(prompt, model).lognormvariate(math.log(self.latency), self.sigma)
+        return self.latency
+
+    def token_interval(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def server_time(self, prompt: str, model: str = "") -> float:
+        """Total simulated time the server spends on a successful request."""
+        chunks = reply_chunks(mock_reply(prompt, self.reply_tokens))
+        return self.first_token_delay(prompt, model) + (len(chunks) - 1) * self.token_interval()
+
+    def fails(self, prompt: str, model: str = "") -> bool:
+        """Whether the request gets an injected error."""
+        if self.error_rate <= 0:
+            return False
+        rng = self._rng(prompt, model)
+        rng.random()  # keep failures independent of the latency draw
+        return rng.random() < self.error_rate
+
+
+class MockState:
+    """In-memory files and batches shared by all request handlers."""
+
+    def __init__(self, batch_seconds: float = 1.0, profile: Optional[LatencyProfile] = None):
+        self.batch_seconds = batch_seconds
+        self.profile = profile or LatencyProfile()
+        self.lock = threading.Lock()
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.openai_batches: Dict[str, Dict[str, Any]] = {}
+        self.claude_batches: Dict[str, Dict[str, Any]] = {}
+
+    def new_file(self, content: bytes, filename: str, purpose: str) -> Dict[str, Any]:
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        meta = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self.lock:
+            self.files[file_id] = {"meta": meta, "content": content}
+        return meta
+
+
+def openai_completion(body: Dict[str, Any], extra_tokens: int = 0) -> Dict[str, Any]:
+    """Build a chat.completion object for a request body."""
+    prompt = last_user_text(body.get("messages"))
+    text = mock_reply(prompt, extra_tokens)
+    prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(text)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def claude_message(params: Dict[str, Any], extra_tokens: int = 0) -> Dict[str, Any]:
+    """Build an Anthropic message object for request params."""
+    prompt = last_user_text(params.get("messages"))
+    text = mock_reply(prompt, extra_tokens)
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": params.get("model", "mock"),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": count_tokens(prompt), "output_tokens": count_tokens(text)},
+    }
+
+
+def gemini_response(body: Dict[str, Any], model: str, extra_tokens: int = 0) -> Dict[str, Any]:
+    """Build a GenerateContentResponse for a request body."""
+    prompt = gemini_prompt(body)
+    text = mock_reply(prompt, extra_tokens)
+    prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(text)
+    return {
+        "candidates": [{
+            "content": {"role": "model", "parts": [{"text": text}]},
+            "finishReason": "STOP",
+            "index": 0,
+        }],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": completion_tokens,
+            "totalTokenCount": prompt_tokens + completion_tokens,
+        },
+        "modelVersion": model,
+    }
+
+
+def reply_chunks(text: str) -> List[str]:
+    """Split reply text into one streaming chunk per whitespace token."""
+    words = text.split(" ")
+    return [words[0]] + [" " + word for word in words[1:]]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Routes requests to handler methods by method and path pattern."""
+
+    protocol_version = "HTTP/1.1"
+    state: MockState = None
+    routes: List[Tuple[str, "re.Pattern", str]] = []
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this Nagle's
+        # algorithm adds ~40 ms to every keep-alive response
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str):
+        path = self.path.split("?", 1)[0]
+        for route_method, pattern, name in self.routes:
+            match = pattern.fullmatch(path)
+            if route_method == method and match:
+                try:
+                    getattr(self, name)(*match.groups())
+                except ConnectionError:
+                    # Client went away mid-response (e.g. an abandoned stream)
+                    self.close_connection = True
+                except Exception as e:
+                    self._send_json(500, {"error": {"message": str(e), "type": "server_error"}})
+                return
+        self._send_json(404, {"error": {"message": f"No route for {method} {path}", "type": "not_found"}})
+
+    # Helpers
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _read_json(self) -> Dict[str, Any]:
+        body = self._read_body()
+        return json.loads(body) if body else {}
+
+    def _send_bytes(self, status: int, body: bytes, content_type: str, headers: Dict[str, str] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: Any, headers: Dict[str, str] = None):
+        self._send_bytes(status, json.dumps(payload).encode("utf-8"), "application/json", headers)
+
+    def _send_listing(self, payload: Any):
+        """Send a model listing with an ETag, answering a matching If-None-Match with 304."""
+        body = json.dumps(payload).encode("utf-8")
+        etag = f'"{zlib.crc32(body):08x}"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send_bytes(304, b"", "application/json", {"ETag": etag})
+            return
+        self._send_bytes(200, body, "application/json", {"ETag": etag})
+
+    def _base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_event(self, payload: Any, event: Optional[str] = None):
+        data = payload if isinstance(payload, str) else json.dumps(payload)
+        text = (f"event: {event}\n" if event else "") + f"data: {data}\n\n"
+        body = text.encode("utf-8")
+        self.wfile.write(f"{len(body):x}\r\n".encode("ascii") + body + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    # Simulated chat latency
+
+    def _wait_first_token(self, prompt: str, model: str, error_body: Callable[[int, str], Any]) -> bool:
+        """
+        Sleep until the first token is due, or send an injected error.
+
+        Returns:
+            False if an error response was sent instead
+        """
+        profile = self.state.profile
+        time.sleep(profile.first_token_delay(prompt, model))
+        if profile.fails(prompt, model):
+            self._send_json(profile.error_status, error_body(profile.error_status, "Injected mock error"))
+            return False
+        return True
+
+    def _paced(self, chunks: List[str]) -> Iterator[Tuple[int, str]]:
+        """Yield (index, chunk) on the profile's streaming schedule, without cumulative drift."""
+        interval = self.state.profile.token_interval()
+        start = time.perf_counter()
+        for index, chunk in enumerate(chunks):
+            delay = start + index * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            yield index, chunk
+
+    def _wait_full_reply(self, text: str):
+        """Sleep for the time a streamed reply would take after its first token."""
+        time.sleep((len(reply_chunks(text)) - 1) * self.state.profile.token_interval())
+
+    # Chat endpoints (OpenAI and xAI share the chat completions format)
+
+    def list_models(self):
+        # Shared by the OpenAI and Anthropic SDKs; the payload satisfies both
+        model = {
+            "id": "mock", "object": "model", "created": 0, "owned_by": "mock",
+            "type": "model", "display_name": "Mock", "created_at": "2025-01-01T00:00:00Z",
+        }
+        self._send_listing({"object": "list", "data": [model], "has_more": False,
+                            "first_id": "mock", "last_id": "mock"})
+
+    def openai_chat(self):
+        body = self._read_json()
+        completion = openai_completion(body, self.state.profile.reply_tokens)
+        error_type = lambda status: "rate_limit_exceeded" if status == 429 else "server_error"
+        if not self._wait_first_token(
+            last_user_text(body.get("messages")),
+            body.get("model", ""),
+            lambda status, message: {"error": {"message": message, "type": error_type(status), "code": None}}
+        ):
+            return
+
+        text = completion["choices"][0]["message"]["content"]
+        if not body.get("stream"):
+            self._wait_full_reply(text)
+            self._send_json(200, completion)
+            return
+
+        base = {key: completion[key] for key in ("id", "created", "model")}
+        base["object"] = "chat.completion.chunk"
+        self._start_stream()
+        for index, chunk in self._paced(reply_chunks(text)):
+            delta = {"role": "assistant", "content": chunk} if index == 0 else {"content": chunk}
+            self._write_event({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        self._write_event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._write_event({**base, "choices": [], "usage": completion["usage"]})
+        self._write_event("[DONE]")
+        self._end_stream()
+
+    def claude_messages(self):
+        params = self._read_json()
+        message = claude_message(params, self.state.profile.reply_tokens)
+        error_type = lambda status: "rate_limit_error" if status == 429 else "api_error"
+        if not self._wait_first_token(
+            last_user_text(params.get("messages")),
+            params.get("model", ""),
+            lambda status, text: {"type": "error", "error": {"type": error_type(status), "message": text}}
+        ):
+            return
+
+        text = message["content"][0]["text"]
+        if not params.get("stream"):
+            self._wait_full_reply(text)
+            self._send_json(200, message)
+            return
+
+        usage = message["usage"]
+        start = dict(message, content=[], stop_reason=None, usage=dict(usage, output_tokens=1))
+        self._start_stream()
+        self._write_event({"type": "message_start", "message": start}, "message_start")
+        self._write_event({"type": "content_block_start", "index": 0,
+                           "content_block": {"type": "text", "text": ""}}, "content_block_start")
+        for _, chunk in self._paced(reply_chunks(text)):
+            self._write_event({"type": "content_block_delta", "index": 0,
+                               "delta": {"type": "text_delta", "text": chunk}}, "content_block_delta")
+        self._write_event({"type": "content_block_stop", "index": 0}, "content_block_stop")
+        self._write_event({"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                           "usage": {"output_tokens": usage["output_tokens"]}}, "message_delta")
+        self._write_event({"type": "message_stop"}, "message_stop")
+        self._end_stream()
+
+    # Gemini
+
+    def gemini_list_models(self):
+        self._send_listing({"models": [{"name": "models/mock", "displayName": "Mock"}]})
+
+    def _gemini_reply(self, model: str) -> Optional[Dict[str, Any]]:
+        body = self._read_json()
+        status_name = lambda status: "RESOURCE_EXHAUSTED" if status == 429 else "INTERNAL"
+        if not self._wait_first_token(
+            gemini_prompt(body),
+            model,
+            lambda status, message: {"error": {"code": status, "message": message, "status": status_name(status)}}
+        ):
+            return None
+        return gemini_response(body, model, self.state.profile.reply_tokens)
+
+    def gemini_generate(self, model: str):
+        response = self._gemini_reply(model)
+        if response is None:
+            return
+        self._wait_full_reply(response["candidates"][0]["content"]["parts"][0]["text"])
+        self._send_json(200, response)
+
+    def gemini_stream(self, model: str):
+        response = self._gemini_reply(model)
+        if response is None:
+            return
+        chunks = reply_chunks(response["candidates"][0]["content"]["parts"][0]["text"])
+        self._start_stream()
+        for index, chunk in self._paced(chunks):
+            candidate = {"content": {"role": "model", "parts": [{"text": chunk}]}, "index": 0}
+            event = {"candidates": [candidate], "modelVersion": model}
+            if index == len(chunks) - 1:
+                candidate["finishReason"] = "STOP"
+                event["usageMetadata"] = response["usageMetadata"]
+            self._write_event(event)
+        self._end_stream()
+
+    # OpenAI files and batches
+
+    def openai_upload_file(self):
+        body = self._read_body()
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8") + body
+        )
+        content, filename, purpose = b"", "upload.jsonl", "batch"
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name == "file":
+                content = part.get_payload(decode=True) or b""
+                filename = part.get_filename() or filename
+            elif name == "purpose":
+                purpose = part.get_content().strip()
+        self._send_json(200, self.state.new_file(content, filename, purpose))
+
+    def openai_file_content(self, file_id: str):
+        entry = self.state.files.get(file_id)
+        if entry is None:
+            self._send_json(404, {"error": {"message": f"No such file: {file_id}", "type": "invalid_request_error"}})
+            return
+        self._send_bytes(200, entry["content"], "application/octet-stream")
+
+    def openai_create_batch(self):
+        request = self._read_json()
+        batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+        batch = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": request.get("endpoint", "/v1/chat/completions"),
+            "errors": None,
+            "input_file_id": request["input_file_id"],
+            "completion_window": request.get("completion_window", "24h"),
+            "status": "in_progress",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "metadata": request.get("metadata"),
+        }
+        with self.state.lock:
+            self.state.openai_batches[batch_id] = batch
+        self._send_json(200, batch)
+
+    def openai_retrieve_batch(self, batch_id: str):
+        with self.state.lock:
+            batch = self.state.openai_batches.get(batch_id)
+        if batch is None:
+            self._send_json(404, {"error": {"message": f"No such batch: {batch_id}", "type": "invalid_request_error"}})
+            return
+        if batch["status"] == "in_progress" and time.time() - batch["created_at"] >= self.state.batch_seconds:
+            self._finish_openai_batch(batch)
+        self._send_json(200, batch)
+
+    def _finish_openai_batch(self, batch: Dict[str, Any]):
+        lines = self.state.files[batch["input_file_id"]]["content"].decode("utf-8").splitlines()
+        output = []
+        for line in lines:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            output.append(json.dumps({
+                "id": f"batch_req_{uuid.uuid4().hex[:24]}",
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": openai_completion(request["body"])},
+                "error": None,
+            }))
+        meta = self.state.new_file(("\n".join(output) + "\n").encode("utf-8"), "batch_output.jsonl", "batch_output")
+        with self.state.lock:
+            batch.update(
+                status="completed",
+                output_file_id=meta["id"],
+                completed_at=int(time.time()),
+                request_counts={"total": len(output), "completed": len(output), "failed": 0},
+            )
+
+    # Anthropic message batches
+
+    def claude_create_batch(self):
+        request = self._read_json()
+        batch_id = f"msgbatch_{uuid.uuid4().hex[:24]}"
+        batch = {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "in_progress",
+            "request_counts": {
+                "processing": len(request.get("requests", [])),
+                "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0,
+            },
+            "created_at": iso_now(),
+            "expires_at": iso_now(),
+            "ended_at": None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": None,
+        }
+        with self.state.lock:
+            self.state.claude_batches[batch_id] = {
+                "batch": batch, "requests": request.get("requests", []), "created": time.time(),
+            }
+        self._send_json(200, batch)
+
+    def claude_retrieve_batch(self, batch_id: str):
+        with self.state.lock:
+            entry = self.state.claude_batches.get(batch_id)
+        if entry is None:
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": batch_id}})
+            return
+        batch = entry["batch"]
+        if batch["processing_status"] == "in_progress" and time.time() - entry["created"] >= self.state.batch_seconds:
+            with self.state.lock:
+                count = len(entry["requests"])
+                batch.update(
+                    processing_status="ended",
+                    ended_at=iso_now(),
+                    results_url=f"{self._base_url()}/v1/messages/batches/{batch_id}/results",
+                    request_counts={"processing": 0, "succeeded": count, "errored": 0, "canceled": 0, "expired": 0},
+                )
+        self._send_json(200, batch)
+
+    def claude_batch_results(self, batch_id: str):
+        entry = self.state.claude_batches.get(batch_id)
+        if entry is None or entry["batch"]["processing_status"] != "ended":
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": batch_id}})
+            return
+        lines = [
+            json.dumps({
+                "custom_id": request["custom_id"],
+                "result": {"type": "succeeded", "message": claude_message(request["params"])},
+            })
+            for request in entry["requests"]
+        ]
+        self._send_bytes(200, ("\n".join(lines) + "\n").encode("utf-8"), "application/binary")
+
+
+MockHandler.routes = [
+    ("POST", re.compile(r"/v1/chat/completions"), "openai_chat"),
+    ("GET", re.compile(r"/v1/models"), "list_models"),
+    ("POST", re.compile(r"/v1/messages"), "claude_messages"),
+    ("GET", re.compile(r"/v1beta/models"), "gemini_list_models"),
+    ("POST", re.compile(r"/v1beta/models/([^/:]+):generateContent"), "gemini_generate"),
+    ("POST", re.compile(r"/v1beta/models/([^/:]+):streamGenerateContent"), "gemini_stream"),
+    ("POST", re.compile(r"/v1/files"), "openai_upload_file"),
+    ("GET", re.compile(r"/v1/files/([^/]+)/content"), "openai_file_content"),
+    ("POST", re.compile(r"/v1/batches"), "openai_create_batch"),
+    ("GET", re.compile(r"/v1/batches/([^/]+)"), "openai_retrieve_batch"),
+    ("POST", re.compile(r"/v1/messages/batches"), "claude_create_batch"),
+    ("GET", re.compile(r"/v1/messages/batches/([^/]+)/results"), "claude_batch_results"),
+    ("GET", re.compile(r"/v1/messages/batches/([^/]+)"), "claude_retrieve_batch"),
+]
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Listen backlog with room for high fan-out benchmarks
+    request_queue_size = 1024
+
+
+class MockProviderServer:
+    """Runs the mock provider API on a background thread."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, batch_seconds: float = 1.0,
+                 profile: Optional[LatencyProfile] = None):
+        """
+        Initialize the server.
+
+        Args:
+            host: Interface to bind
+            port: Port to bind; 0 picks a free port
+            batch_seconds: Time before a submitted batch reports as finished
+            profile: Simulated latency, streaming rate and errors for chat requests
+        """
+        self.profile = profile or LatencyProfile()
+        state = MockState(batch_seconds=batch_seconds, profile=self.profile)
+        handler = type("BoundMockHandler", (MockHandler,), {"state": state})
+        self.httpd = _MockHTTPServer((host, port), handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockProviderServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "MockProviderServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the provider APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--batch-seconds", type=float, default=1.0,
+                        help="Seconds before a submitted batch reports as finished")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Median seconds to first token for chat requests (default: 0)")
+    parser.add_argument("--distribution", choices=["fixed", "lognormal"], default="fixed",
+                        help="Time-to-first-token distribution (default: fixed)")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Lognormal shape parameter (default: 0.5)")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0,
+                        help="Reply streaming rate; 0 sends the reply at once (default: 0)")
+    parser.add_argument("--reply-tokens", type=int, default=0, help="Filler tokens appended to each reply")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of prompts that fail (default: 0)")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected errors (default: 500)")
+    args = parser.parse_args()
+
+    profile = LatencyProfile(
+        latency=args.latency,
+        distribution=args.distribution,
+        sigma=args.sigma,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status
+    )
+    server = MockProviderServer(args.host, args.port, batch_seconds=args.batch_seconds, profile=profile)
+    print(f"Mock provider API listening on {server.url}")
+    print(f"  export OPENAI_BASE_URL={server.url}/v1")
+    print(f"  export XAI_BASE_URL={server.url}/v1")
+    print(f"  export ANTHROPIC_BASE_URL={server.url}")
+    print(f"  export GOOGLE_GEMINI_BASE_URL={server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,71 +1,546 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Tuple, Any, Union
-from dataclasses import dataclass
+from typing import Dict, List, Tuple, Any, Union, Iterator, Generator, Callable, Optional
+from dataclasses import dataclass, asdict, fields
+import asyncio
+import hashlib
+import json
+import logging
+import os
 import time
+from .cancellation import abort_on_cancel, cancellable_sleep, check_cancelled, effective_timeout
+from .client_pool import client_pool
+from .rate_limit import observe_response, rate_limiter
+from .timing import PhaseTimer, instrument_client, mark_current
+from .tokenizer import count_tokens
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+# One conversation turn: {"role": "user" | "assistant", "content": text}
+Message = Dict[str, str]
+
+@dataclass(slots=True)
 class TokenInfo:
-    input_tokens: Union[int, str]
-    output_tokens: Union[int, str]
-    total_tokens: Union[int, str]
+    """Token usage of one request; counts are None when unknown."""
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+    # Hidden reasoning/thinking tokens, already included in output_tokens
+    reasoning_tokens: Optional[int] = None
+    # Input tokens served from the provider's prompt cache, already included in input_tokens
+    cached_input_tokens: Optional[int] = None
+    # Counts were estimated with the local tokenizer because the provider reported none
+    estimated: bool = False
+
+    def __post_init__(self):
+        if self.total_tokens is None and self.input_tokens is not None and self.output_tokens is not None:
+            self.total_tokens = self.input_tokens + self.output_tokens
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TokenInfo":
+        """Build from stored fields, treating non-numeric counts from older versions as unknown."""
+        counts = {
+            f.name: data.get(f.name) if isinstance(data.get(f.name), int) else None
+            for f in fields(cls) if f.name != "estimated"
+        }
+        return cls(**counts, estimated=bool(data.get("estimated", False)))
 
-@dataclass
+@dataclass(slots=True)
 class ModelResponse:
+    """
+    One model's answer, timings and usage.
+
+    Slotted, like TokenInfo, so large fan-outs and batch runs don't pay for
+    a per-instance __dict__.
+    """
     model_name: str
     text: str = None
     token_info: TokenInfo = None
     elapsed_time: float = 0.0
     error: str = None
+    time_to_first_token: Optional[float] = None
+    tokens_per_second: Optional[float] = None
+    cache_hit: bool = False
+    original_elapsed_time: Optional[float] = None
+    # Seconds per request phase (rate_limit_wait, client_acquire, request_send, first_byte, body_parse)
+    phase_timings: Optional[Dict[str, float]] = None
+    # A duplicate request was sent because this one was slow, and whether it answered first
+    hedged: bool = False
+    hedge_won: bool = False
+    # Estimated cost in USD from the model's configured prices, None when unpriced
+    cost: Optional[float] = None
+    # Cached response to a near-duplicate prompt: that prompt and its Jaccard similarity
+    similar_prompt: Optional[str] = None
+    similarity: Optional[float] = None
 
 class BaseModel(ABC):
     """Base class for all LLM models."""
-    
-    def __init__(self, model_name: str, max_tokens: int = 1000, temperature: float = 1.0):
+
+    # Provider name, API key and base URL variables used to key the shared client pool
+    provider: str = ""
+    api_key_env: Optional[str] = None
+    base_url_env: Optional[str] = None
+
+    def __init__(self, model_name: str, max_tokens: int = 1000, temperature: float = 1.0, cache=None,
+                 timeout: Optional[float] = None, input_price: Optional[float] = None,
+                 output_price: Optional[float] = None, similarity_threshold: Optional[float] = None,
+                 system_prompt: Optional[str] = None, history: Optional[List[Message]] = None,
+                 cached_input_price: Optional[float] = None):
         self.model_name = model_name
         self.max_tokens = max_tokens
         self.temperature = temperature
+        # Per-request timeout in seconds; None keeps the SDK default
+        self.timeout = timeout
+        # USD per million input and output tokens, used for ModelResponse.cost
+        self.input_price = input_price
+        self.output_price = output_price
+        # USD per million input tokens read from the provider's prompt cache; None bills them at input_price
+        self.cached_input_price = cached_input_price
+        # Instructions sent ahead of every prompt, and earlier turns of the conversation
+        self.system_prompt = system_prompt or None
+        self.history = list(history or [])
+        # Optional ResponseCache consulted before calling the provider
+        self.cache = cache
+        # Serve cached responses to prompts at least this similar; None matches exact prompts only
+        self.similarity_threshold = similarity_threshold
         self._client = None
-    
+
     @property
     def client(self):
-        """Lazy loading of client to avoid unnecessary connections."""
+        """Shared client from the process-wide pool, created lazily on first use."""
         if self._client is None:
-            self._client = self._create_client()
+            self._client = client_pool.get(
+                self.provider or type(self).__name__,
+                self._credentials_key(),
+                lambda: instrument_client(self._create_client(), response_hooks=(observe_response, abort_on_cancel))
+            )
+        mark_current("client_acquired")
         return self._client
-    
+
+    @property
+    def async_client(self):
+        """
+        Shared async client for the running event loop.
+
+        Async SDK clients hold connections bound to the loop that opened them,
+        so the pool keeps one per loop as well as per credentials, and drops
+        them once their loop is closed.
+        """
+        client = client_pool.get_for_loop(
+            f"{self.provider or type(self).__name__}:async",
+            self._credentials_key(),
+            asyncio.get_running_loop(),
+            lambda: instrument_client(self._create_async_client(), response_hooks=(observe_response, abort_on_cancel))
+        )
+        mark_current("client_acquired")
+        return client
+
+    def _credentials_key(self) -> str:
+        """Identify the credentials this model's client is built from."""
+        api_key = os.getenv(self.api_key_env) if self.api_key_env else None
+        base_url = os.getenv(self.base_url_env) if self.base_url_env else None
+        return client_pool.credentials_key(api_key, base_url)
+
+    def warm_up(self):
+        """Acquire the pooled client and open a connection ahead of the first request."""
+        self._warmup_request(self.client)
+
+    def _warmup_request(self, client):
+        """Issue a cheap request on the client. Subclasses override; default only builds the client."""
+        pass
+
     @abstractmethod
     def _create_client(self):
         """Create and return the API client for this model."""
         pass
-    
+
     @abstractmethod
     def _generate_response(self, prompt: str) -> Tuple[str, TokenInfo]:
         """Generate response from the model. Must be implemented by subclasses."""
         pass
-    
-    def generate(self, prompt: str) -> ModelResponse:
-        """Generate response with timing and error handling."""
-        start_time = time.time()
-        
-        try:
-            text, token_info = self._generate_response(prompt)
-            elapsed = time.time() - start_time
-            return ModelResponse(
-                model_name=self.model_name,
-                text=text,
-                token_info=token_info,
-                elapsed_time=elapsed
+
+    def _request_timeout(self) -> Optional[float]:
+        """Timeout for the next provider call: the model's timeout, capped by the active deadline."""
+        return effective_timeout(self.timeout)
+
+    def _request_options(self) -> Dict[str, Any]:
+        """Per-call SDK options (currently the timeout) for OpenAI-style create() calls."""
+        timeout = self._request_timeout()
+        return {"timeout": timeout} if timeout is not None else {}
+
+    def _messages(self, prompt: str) -> List[Message]:
+        """
+        Conversation history followed by the prompt as the new user turn.
+
+        History is sent verbatim and always ahead of the prompt, so repeated
+        calls share a byte-identical prefix that providers can cache.
+        """
+        return [*self.history, {"role": "user", "content": prompt}]
+
+    def _input_text(self, prompt: str) -> str:
+        """All text sent as input (system prompt, history and prompt), for local token estimates."""
+        parts = [self.system_prompt] if self.system_prompt else []
+        parts.extend(message["content"] for message in self.history)
+        parts.append(prompt)
+        return "\n\n".join(parts)
+
+    def _acquire_rate_limit(self, prompt: str):
+        """Wait for capacity in the provider's and this model's rate limits."""
+        ticket = rate_limiter.acquire(
+            self.provider or type(self).__name__,
+            self.model_name,
+            rate_limiter.estimate_tokens(self._input_text(prompt), self.max_tokens)
+        )
+        mark_current("rate_limit_acquired")
+        return ticket
+
+    def _call_rate_limited(self, prompt: str) -> Tuple[str, TokenInfo]:
+        """Call the provider within its rate limits, retrying rate-limit (429) and transient errors."""
+        attempt = 0
+        while True:
+            ticket = self._acquire_rate_limit(prompt)
+            try:
+                with rate_limiter.track(ticket):
+                    text, token_info = self._generate_response(prompt)
+            except Exception as e:
+                delay = rate_limiter.backoff(ticket, e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                logger.info(f"Request to {self.model_name} failed ({e}), retry {attempt} after {delay:.2f}s")
+                cancellable_sleep(delay)
+                continue
+            rate_limiter.settle(ticket, token_info)
+            return text, token_info
+
+    async def _acall_rate_limited(self, prompt: str) -> Tuple[str, TokenInfo]:
+        """Async version of _call_rate_limited()."""
+        attempt = 0
+        while True:
+            ticket = await rate_limiter.aacquire(
+                self.provider or type(self).__name__,
+                self.model_name,
+                rate_limiter.estimate_tokens(self._input_text(prompt), self.max_tokens)
             )
+            mark_current("rate_limit_acquired")
+            try:
+                with rate_limiter.track(ticket):
+                    text, token_info = await self._agenerate_response(prompt)
+            except Exception as e:
+                delay = rate_limiter.backoff(ticket, e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                logger.info(f"Request to {self.model_name} failed ({e}), retry {attempt} after {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            rate_limiter.settle(ticket, token_info)
+            return text, token_info
+
+    def _create_async_client(self):
+        """Create and return the async API client. Subclasses without one use a worker thread."""
+        raise NotImplementedError(f"{type(self).__name__} has no async client")
+
+    async def _agenerate_response(self, prompt: str) -> Tuple[str, TokenInfo]:
+        """Generate response asynchronously. Defaults to running the sync call in a thread."""
+        return await asyncio.to_thread(self._generate_response, prompt)
+
+    def _stream_response(self, prompt: str) -> Iterator[Union[str, TokenInfo]]:
+        """
+        Stream response from the model.
+
+        Yields text chunks as they arrive, followed by a TokenInfo once usage
+        is known. Subclasses override this with their provider's streaming API;
+        the default falls back to a single blocking call.
+        """
+        text, token_info = self._generate_response(prompt)
+        yield text
+        yield token_info
+
+    def generate(self, prompt: str, on_chunk: Optional[Callable[[str], None]] = None) -> ModelResponse:
+        """
+        Generate response with timing and error handling.
+
+        Args:
+            prompt: The prompt to send to the model
+            on_chunk: Optional callback receiving text chunks as they stream in.
+                When given, the provider's streaming API is used.
+        """
+        if on_chunk is not None:
+            stream = self.generate_stream(prompt)
+            while True:
+                try:
+                    on_chunk(next(stream))
+                except StopIteration as done:
+                    return done.value
+
+        cached = self._cached_response(prompt)
+        if cached is not None:
+            return cached
+
+        with PhaseTimer() as timer:
+            try:
+                check_cancelled()
+                text, token_info = self._call_rate_limited(prompt)
+                end_time = time.perf_counter()
+                elapsed = end_time - timer.start
+                token_info = self._complete_token_info(prompt, text, token_info)
+                response = ModelResponse(
+                    model_name=self.model_name,
+                    text=text,
+                    token_info=token_info,
+                    elapsed_time=elapsed,
+                    tokens_per_second=self._tokens_per_second(token_info, elapsed),
+                    phase_timings=timer.phases(end_time),
+                    cost=self._cost(token_info)
+                )
+                self._store_response(prompt, response)
+                return response
+            except Exception as e:
+                end_time = time.perf_counter()
+                return self._error_response(str(e), end_time - timer.start, timer.phases(end_time))
+
+    async def agenerate(self, prompt: str) -> ModelResponse:
+        """Generate response asynchronously with timing and error handling."""
+        cached = self._cached_response(prompt)
+        if cached is not None:
+            return cached
+
+        with PhaseTimer() as timer:
+            try:
+                check_cancelled()
+                text, token_info = await self._acall_rate_limited(prompt)
+                end_time = time.perf_counter()
+                elapsed = end_time - timer.start
+                token_info = self._complete_token_info(prompt, text, token_info)
+                response = ModelResponse(
+                    model_name=self.model_name,
+                    text=text,
+                    token_info=token_info,
+                    elapsed_time=elapsed,
+                    tokens_per_second=self._tokens_per_second(token_info, elapsed),
+                    phase_timings=timer.phases(end_time),
+                    cost=self._cost(token_info)
+                )
+                self._store_response(prompt, response)
+                return response
+            except Exception as e:
+                end_time = time.perf_counter()
+                return self._error_response(str(e), end_time - timer.start, timer.phases(end_time))
+
+    def generate_stream(self, prompt: str) -> Generator[str, None, ModelResponse]:
+        """
+        Stream response text chunks with timing and error handling.
+
+        Yields text chunks as they arrive. The completed ModelResponse, including
+        time-to-first-token and output tokens/sec, is the generator's return
+        value (``response = yield from model.generate_stream(prompt)``).
+        """
+        cached = self._cached_response(prompt)
+        if cached is not None:
+            if cached.text:
+                yield cached.text
+            return cached
+
+        first_token_time = None
+        token_info = None
+        parts = []
+
+        with PhaseTimer() as timer:
+            try:
+                check_cancelled()
+                attempt = 0
+                while True:
+                    ticket = self._acquire_rate_limit(prompt)
+                    stream = self._stream_response(prompt)
+                    try:
+                        with rate_limiter.track(ticket):
+                            for item in stream:
+                                # Stop between chunks once the comparison is cancelled or past its deadline
+                                check_cancelled()
+                                if isinstance(item, TokenInfo):
+                                    token_info = item
+                                    continue
+                                if not item:
+                                    continue
+                                if first_token_time is None:
+                                    first_token_time = time.perf_counter() - timer.start
+                                parts.append(item)
+                                yield item
+                    except Exception as e:
+                        # Only retry a failure that arrived before any text was shown
+                        delay = None if parts else rate_limiter.backoff(ticket, e, attempt)
+                        if delay is None:
+                            raise
+                        attempt += 1
+                        logger.info(f"Request to {self.model_name} failed ({e}), retry {attempt} after {delay:.2f}s")
+                        cancellable_sleep(delay)
+                        continue
+                    finally:
+                        # Release the HTTP connection even when abandoned mid-stream
+                        stream.close()
+                    rate_limiter.settle(ticket, token_info)
+                    break
+
+                end_time = time.perf_counter()
+                elapsed = end_time - timer.start
+                text = "".join(parts)
+                token_info = self._complete_token_info(prompt, text, token_info)
+                response = ModelResponse(
+                    model_name=self.model_name,
+                    text=text,
+                    token_info=token_info,
+                    elapsed_time=elapsed,
+                    time_to_first_token=first_token_time,
+                    tokens_per_second=self._tokens_per_second(token_info, elapsed, first_token_time),
+                    phase_timings=timer.phases(end_time),
+                    cost=self._cost(token_info)
+                )
+                self._store_response(prompt, response)
+                return response
+            except Exception as e:
+                end_time = time.perf_counter()
+                response = self._error_response(str(e), end_time - timer.start, timer.phases(end_time))
+                response.time_to_first_token = first_token_time
+                return response
+
+    def _cache_key(self, prompt: str) -> str:
+        """Key identifying a request by provider, model, prompt, context and sampling parameters."""
+        key_data = {
+            **self._context_data(),
+            "prompt_sha256": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+        }
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _cache_scope(self) -> str:
+        """Everything in the cache key except the prompt; near-duplicate matches must agree on it."""
+        return hashlib.sha256(json.dumps(self._context_data(), sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _context_data(self) -> Dict[str, Any]:
+        """
+        Request identity apart from the prompt.
+
+        The system prompt and history are only included when set, so keys of
+        plain single-turn requests match those cached by earlier versions.
+        """
+        data = {
+            "provider": self.provider or type(self).__name__,
+            "model_id": self.model_name,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+        }
+        if self.system_prompt:
+            data["system_sha256"] = hashlib.sha256(self.system_prompt.encode("utf-8")).hexdigest()
+        if self.history:
+            history = json.dumps(self.history, sort_keys=True).encode("utf-8")
+            data["history_sha256"] = hashlib.sha256(history).hexdigest()
+        return data
+
+    def _cached_response(self, prompt: str) -> Optional[ModelResponse]:
+        """
+        Look up a cached response for the prompt.
+
+        On a hit, elapsed_time is the lookup time and original_elapsed_time is
+        the provider latency recorded when the response was generated. With a
+        similarity_threshold, an exact miss falls back to the most similar
+        cached prompt, reported in similar_prompt and similarity.
+        """
+        if self.cache is None:
+            return None
+
+        start_time = time.perf_counter()
+        match = None
+        try:
+            payload = self.cache.get(self._cache_key(prompt))
+            if payload is None and self.similarity_threshold is not None:
+                match = self.cache.find_similar(prompt, self._cache_scope(), self.similarity_threshold)
+                payload = self.cache.get(match.key) if match is not None else None
         except Exception as e:
-            elapsed = time.time() - start_time
-            error_token_info = TokenInfo(
-                input_tokens='Error',
-                output_tokens='Error',
-                total_tokens='Error'
+            logger.warning(f"Response cache lookup failed for {self.model_name}: {e}")
+            return None
+        if payload is None:
+            return None
+
+        # Ignore fields written by other versions of ModelResponse
+        known = {f.name for f in fields(ModelResponse)}
+        token_info = payload.pop("token_info", None)
+        response = ModelResponse(**{k: v for k, v in payload.items() if k in known})
+        response.token_info = TokenInfo.from_dict(token_info) if token_info else None
+        response.model_name = self.model_name
+        response.original_elapsed_time = response.elapsed_time
+        response.elapsed_time = time.perf_counter() - start_time
+        response.cache_hit = True
+        if match is not None:
+            response.similar_prompt = match.prompt
+            response.similarity = match.similarity
+        return response
+
+    def _store_response(self, prompt: str, response: ModelResponse):
+        """Store a successful response in the cache, indexing its prompt only when similar prompts are matched."""
+        if self.cache is None or response.error:
+            return
+
+        try:
+            self.cache.put(
+                self._cache_key(prompt),
+                asdict(response),
+                provider=self.provider,
+                model_id=self.model_name,
+                prompt=prompt if self.similarity_threshold is not None else None,
+                scope=self._cache_scope()
             )
-            return ModelResponse(
-                model_name=self.model_name,
-                token_info=error_token_info,
-                elapsed_time=elapsed,
-                error=str(e)
-            ) 
\ No newline at end of file
+        except Exception as e:
+            logger.warning(f"Response cache store failed for {self.model_name}: {e}")
+
+    def _error_response(self, error: str, elapsed: float,
+                        phase_timings: Optional[Dict[str, float]] = None) -> ModelResponse:
+        """Build a ModelResponse describing a failed request."""
+        return ModelResponse(
+            model_name=self.model_name,
+            token_info=TokenInfo(),
+            elapsed_time=elapsed,
+            error=error,
+            phase_timings=phase_timings
+        )
+
+    def _complete_token_info(self, prompt: str, text: Optional[str],
+                             token_info: Optional[TokenInfo]) -> TokenInfo:
+        """Fill in counts the provider didn't report with local tokenizer estimates."""
+        token_info = token_info or TokenInfo()
+        if token_info.input_tokens is not None and token_info.output_tokens is not None:
+            return token_info
+        input_tokens = token_info.input_tokens
+        if input_tokens is None:
+            input_tokens = count_tokens(self._input_text(prompt), self.model_name)
+        output_tokens = token_info.output_tokens
+        if output_tokens is None:
+            output_tokens = count_tokens(text, self.model_name)
+        return TokenInfo(
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            reasoning_tokens=token_info.reasoning_tokens,
+            cached_input_tokens=token_info.cached_input_tokens,
+            estimated=True
+        )
+
+    def _cost(self, token_info: TokenInfo) -> Optional[float]:
+        """Cost in USD at the model's configured per-million-token prices, with cache reads at cached_input_price."""
+        if self.input_price is None or self.output_price is None:
+            return None
+        if token_info.input_tokens is None or token_info.output_tokens is None:
+            return None
+        cached = min(token_info.cached_input_tokens or 0, token_info.input_tokens)
+        cached_price = self.cached_input_price if self.cached_input_price is not None else self.input_price
+        return ((token_info.input_tokens - cached) * self.input_price
+                + cached * cached_price
+                + token_info.output_tokens * self.output_price) / 1_000_000
+
+    @staticmethod
+    def _tokens_per_second(token_info: Optional[TokenInfo], elapsed: float,
+                           first_token_time: Optional[float] = None) -> Optional[float]:
+        """Output tokens/sec, measured over the generation phase when TTFT is known."""
+        if token_info is None or token_info.output_tokens is None:
+            return None
+        duration = elapsed - first_token_time if first_token_time is not None else elapsed
+        if duration <= 0:
+            return None
+        return token_info.output_tokens / duration
\ No newline at end of file
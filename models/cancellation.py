@@ -0,0 +1,149 @@
+import contextvars
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, List, Optional
+
+_current_scope: contextvars.ContextVar = contextvars.ContextVar("cancel_scope", default=None)
+
+class RequestCancelled(Exception):
+    """Raised when a request's scope was cancelled or its deadline passed."""
+
+class CancelScope:
+    """
+    Deadline and cancellation shared by the requests of one comparison.
+
+    Executors activate the scope on each worker thread. Model calls read it
+    to cap their SDK timeout at the time left and to stop between streamed
+    chunks once it is cancelled, which closes the HTTP stream and returns
+    its connection to the pool.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, abort_requests: bool = False):
+        """
+        Initialize the scope.
+
+        Args:
+            timeout: Seconds until the deadline, or None for no deadline
+            abort_requests: On cancellation, also shut down the sockets of this
+                scope's HTTP responses still being read (see abort_on_cancel)
+        """
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.abort_requests = abort_requests
+        self.reason: Optional[str] = None
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._callbacks: List[Callable[[], None]] = []
+
+    def cancel(self, reason: str = "Cancelled"):
+        """Cancel the scope and run its callbacks once."""
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            self.reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def child(self, abort_requests: bool = False) -> "CancelScope":
+        """A scope with this scope's deadline that is also cancelled when this one is."""
+        child = CancelScope(abort_requests=abort_requests)
+        child.timeout, child.deadline = self.timeout, self.deadline
+        self.add_callback(lambda: child.cancel(self.reason or "Cancelled"))
+        return child
+
+    def add_callback(self, callback: Callable[[], None]):
+        """Run callback on cancellation, immediately if already cancelled."""
+        with self._lock:
+            if not self._cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._cancelled and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel(self.deadline_message())
+        return self._cancelled
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the deadline, or None without one."""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def deadline_message(self) -> str:
+        return f"Deadline exceeded ({self.timeout:g}s)"
+
+    def check(self):
+        """Raise RequestCancelled if the scope is cancelled or past its deadline."""
+        if self.cancelled:
+            raise RequestCancelled(self.reason)
+
+    @contextmanager
+    def activate(self):
+        """Make this the current scope for model calls on this thread."""
+        token = _current_scope.set(self)
+        try:
+            yield self
+        finally:
+            _current_scope.reset(token)
+
+def current_scope() -> Optional[CancelScope]:
+    return _current_scope.get()
+
+def check_cancelled():
+    """Raise RequestCancelled if the current scope, if any, is cancelled."""
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.check()
+
+def effective_timeout(timeout: Optional[float]) -> Optional[float]:
+    """A request timeout capped at the current scope's time left."""
+    scope = _current_scope.get()
+    remaining = scope.remaining() if scope is not None else None
+    if remaining is None:
+        return timeout
+    if timeout is None:
+        return remaining
+    return min(timeout, remaining)
+
+def abort_on_cancel(response: Any):
+    """
+    httpx response hook: abort the response if its scope is cancelled while it is read.
+
+    Only scopes created with abort_requests=True are affected. Shutting the
+    socket down wakes a thread blocked reading the body, where stopping
+    between chunks would wait for the next one. The SDK call then fails with
+    a connection error, which is not retried because the scope is cancelled.
+    """
+    scope = _current_scope.get()
+    if scope is None or not scope.abort_requests:
+        return
+    scope.add_callback(lambda: _abort_response(response))
+
+def _abort_response(response: Any):
+    # A finished response's connection may already serve another request
+    if response.is_closed:
+        return
+    network_stream = response.extensions.get("network_stream")
+    sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+def cancellable_sleep(seconds: float, interval: float = 0.25):
+    """Sleep, waking early to raise RequestCancelled if the current scope is cancelled."""
+    end = time.monotonic() + seconds
+    while True:
+        check_cancelled()
+        left = end - time.monotonic()
+        if left <= 0:
+            return
+        time.sleep(min(left, interval))
@@ -1,28 +1,94 @@
 import anthropic
-from typing import Tuple
+from typing import Tuple, Iterator, Union, Dict, Any
 from .base import BaseModel, TokenInfo
 
+# Cache the prompt up to and including the marked block for Anthropic's default five minutes
+CACHE_CONTROL = {"type": "ephemeral"}
+
 class ClaudeModel(BaseModel):
     """Anthropic Claude model implementation."""
     
+    provider = "claude"
+    api_key_env = "ANTHROPIC_API_KEY"
+    base_url_env = "ANTHROPIC_BASE_URL"
+    
     def _create_client(self):
-        """Create Anthropic client."""
-        return anthropic.Anthropic()
+        """Create Anthropic client; retries are left to _call_rate_limited()."""
+        return anthropic.Anthropic(max_retries=0)
+    
+    def _create_async_client(self):
+        """Create async Anthropic client; retries are left to _acall_rate_limited()."""
+        return anthropic.AsyncAnthropic(max_retries=0)
+    
+    def _warmup_request(self, client):
+        """List models to open a pooled connection."""
+        client.models.list(limit=1)
+    
+    def _build_request(self, prompt: str) -> Dict[str, Any]:
+        """
+        Build message arguments shared by all call paths.
+        
+        The system prompt and the end of the history are marked as cache
+        breakpoints, so later calls with the same prefix read it from
+        Anthropic's prompt cache instead of processing it again.
+        """
+        request = {
+            "model": self.model_name,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "messages": self._messages(prompt)
+        }
+        if self.system_prompt:
+            request["system"] = [
+                {"type": "text", "text": self.system_prompt, "cache_control": CACHE_CONTROL}
+            ]
+        if self.history:
+            last = request["messages"][-2]
+            request["messages"][-2] = {
+                "role": last["role"],
+                "content": [{"type": "text", "text": last["content"], "cache_control": CACHE_CONTROL}]
+            }
+        return request
+    
+    @staticmethod
+    def _token_info(usage) -> TokenInfo:
+        """
+        Convert Anthropic usage into TokenInfo.
+        
+        Anthropic reports cache writes and reads apart from input_tokens;
+        they are added back so input_tokens covers the whole prompt.
+        """
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        cache_read = getattr(usage, "cache_read_input_tokens", None)
+        input_tokens = usage.input_tokens + cache_write + (cache_read or 0)
+        return TokenInfo(
+            input_tokens=input_tokens,
+            output_tokens=usage.output_tokens,
+            total_tokens=input_tokens + usage.output_tokens,
+            cached_input_tokens=cache_read
+        )
     
     def _generate_response(self, prompt: str) -> Tuple[str, TokenInfo]:
         """Generate response using Claude API."""
         completion = self.client.messages.create(
-            model=self.model_name,
-            max_tokens=self.max_tokens,
-            temperature=self.temperature,
-            messages=[{"role": "user", "content": prompt}]
+            **self._build_request(prompt), **self._request_options()
         )
-        
-        usage = completion.usage
-        token_info = TokenInfo(
-            input_tokens=usage.input_tokens,
-            output_tokens=usage.output_tokens,
-            total_tokens=usage.input_tokens + usage.output_tokens
+        return completion.content[0].text, self._token_info(completion.usage)
+    
+    async def _agenerate_response(self, prompt: str) -> Tuple[str, TokenInfo]:
+        """Generate response using the async Claude API."""
+        completion = await self.async_client.messages.create(
+            **self._build_request(prompt), **self._request_options()
         )
+        return completion.content[0].text, self._token_info(completion.usage)
+    
+    def _stream_response(self, prompt: str) -> Iterator[Union[str, TokenInfo]]:
+        """Stream response using Claude API."""
+        with self.client.messages.stream(
+            **self._build_request(prompt), **self._request_options()
+        ) as stream:
+            for text in stream.text_stream:
+                yield text
+            usage = stream.get_final_message().usage
         
-        return completion.content[0].text, token_info 
+        yield self._token_info(usage)
@@ -0,0 +1,259 @@
+import hashlib
+import inspect
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PoolStats:
+    """Usage statistics for one provider/credentials entry in the pool."""
+    provider: str
+    hits: int = 0
+    new_clients: int = 0
+    open_connections: Optional[int] = None
+    idle_connections: Optional[int] = None
+    warmed_up: bool = False
+    # Seconds spent building the SDK client the first time
+    init_seconds: Optional[float] = None
+
+class ClientPool:
+    """
+    Process-wide, thread-safe registry of provider API clients.
+
+    Clients are keyed by provider and a hash of their credentials, so every
+    model instance, Streamlit rerun and session using the same account shares
+    one SDK client and therefore one pool of keep-alive HTTP connections.
+    Clients are built outside the pool lock, so a slow first import or
+    construction for one provider doesn't hold up requests to the others.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple[str, str], Any] = {}
+        self._stats: Dict[Tuple[str, str], PoolStats] = {}
+        # Async clients per event loop, held weakly by loop so they go away with it
+        self._loop_clients: "weakref.WeakKeyDictionary[Any, Dict[Tuple[str, str], Any]]" = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def credentials_key(*credentials: Optional[str]) -> str:
+        """Hash credentials so raw API keys are never held as dictionary keys."""
+        joined = "\0".join(c or "" for c in credentials)
+        return hashlib.sha256(joined.encode("utf-8")).hexdigest()[:16]
+
+    def get(self, provider: str, credentials_key: str, factory: Callable[[], Any]) -> Any:
+        """
+        Get the shared client for a provider/credentials pair, creating it once.
+
+        Args:
+            provider: Provider name, e.g. "openai"
+            credentials_key: Value from credentials_key()
+            factory: Called to build the client on first use
+
+        Returns:
+            The shared SDK client
+        """
+        key = (provider, credentials_key)
+        with self._lock:
+            stats = self._stats.setdefault(key, PoolStats(provider=provider))
+            client = self._clients.get(key)
+            if client is not None:
+                stats.hits += 1
+                return client
+
+        start = time.perf_counter()
+        client = factory()
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            stats = self._stats.setdefault(key, PoolStats(provider=provider))
+            existing = self._clients.get(key)
+            if existing is None:
+                self._clients[key] = client
+                stats.init_seconds = elapsed
+                stats.new_clients += 1
+                logger.debug(f"Created new {provider} client")
+                return client
+            stats.hits += 1
+
+        # Another thread built the same client first; keep its connections
+        self._close(client)
+        return existing
+
+    def get_for_loop(self, provider: str, credentials_key: str, loop: Any, factory: Callable[[], Any]) -> Any:
+        """
+        Get the shared async client for a provider/credentials pair on one event loop.
+
+        Async SDK clients hold connections bound to the loop that opened them,
+        so each loop gets its own. Each client is closed on its loop when the
+        loop shuts down its async generators, as asyncio.run() does before
+        closing it. Loops are held by weak reference, and clients of loops
+        closed without that step are dropped when another loop asks for a
+        client. Short-lived loops therefore don't leak clients, and a new
+        loop is never handed a client bound to a closed one.
+
+        Args:
+            provider: Provider name, e.g. "openai:async"
+            credentials_key: Value from credentials_key()
+            loop: The running event loop
+            factory: Called to build the client on first use on this loop
+
+        Returns:
+            The loop's shared SDK client
+        """
+        key = (provider, credentials_key)
+        with self._lock:
+            stats = self._stats.setdefault(key, PoolStats(provider=provider))
+            clients = self._loop_clients.get(loop)
+            if clients is not None and key in clients:
+                stats.hits += 1
+                return clients[key][0]
+
+        # Only the loop's own thread asks for its clients, and factory() doesn't yield to
+        # the loop, so nothing else can build this client meanwhile
+        start = time.perf_counter()
+        client = factory()
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            stats = self._stats.setdefault(key, PoolStats(provider=provider))
+            clients = self._loop_clients.get(loop)
+            if clients is None:
+                # Open connections reference their loop, so a closed loop's entry
+                # would otherwise outlive it
+                for closed in [other for other in self._loop_clients.keys() if other.is_closed()]:
+                    del self._loop_clients[closed]
+                clients = self._loop_clients[loop] = {}
+            stats.init_seconds = elapsed
+            # Starting the generator registers it with the running loop, which finalizes it on shutdown
+            closer = _close_on_shutdown(client)
+            try:
+                closer.asend(None).send(None)
+            except StopIteration:
+                pass
+            # The loop only holds the generator weakly
+            clients[key] = (client, closer)
+            stats.new_clients += 1
+            logger.debug(f"Created new {provider} client")
+            return client
+
+    def warmup(self, models: List[Any], max_workers: int = None) -> Dict[str, str]:
+        """
+        Pre-open connections for each distinct provider/credentials pair.
+
+        Args:
+            models: Model instances; one per provider/credentials pair is used
+            max_workers: Maximum number of warmup threads
+
+        Returns:
+            Dictionary mapping provider names to warmup error messages
+        """
+        representatives = {}
+        for model in models:
+            try:
+                key = (model.provider, model._credentials_key())
+            except Exception as e:
+                logger.warning(f"Skipping warmup for {model.model_name}: {e}")
+                continue
+            representatives.setdefault(key, model)
+
+        errors = {}
+        if not representatives:
+            return errors
+
+        def warm(key, model):
+            try:
+                model.warm_up()
+                with self._lock:
+                    self._stats.setdefault(key, PoolStats(provider=key[0])).warmed_up = True
+            except Exception as e:
+                logger.warning(f"Warmup failed for {key[0]}: {e}")
+                errors[key[0]] = str(e)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for key, model in representatives.items():
+                executor.submit(warm, key, model)
+
+        return errors
+
+    def stats(self) -> List[PoolStats]:
+        """Get a snapshot of per-provider pool statistics."""
+        with self._lock:
+            entries = [(key, self._clients.get(key), stats) for key, stats in self._stats.items()]
+
+        snapshot = []
+        for key, client, stats in entries:
+            open_count, idle_count = self._connection_counts(client)
+            snapshot.append(PoolStats(
+                provider=stats.provider,
+                hits=stats.hits,
+                new_clients=stats.new_clients,
+                open_connections=open_count,
+                idle_connections=idle_count,
+                warmed_up=stats.warmed_up,
+                init_seconds=stats.init_seconds
+            ))
+        return snapshot
+
+    def clear(self):
+        """Close and drop all pooled clients."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._stats.clear()
+            # Async clients can only be closed on their own loop; drop them
+            self._loop_clients.clear()
+
+        for client in clients:
+            self._close(client)
+
+    @staticmethod
+    def _close(client: Any):
+        """Close a sync client's connections, ignoring errors."""
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                logger.debug(f"Error closing client: {e}")
+
+    @staticmethod
+    def _connection_counts(client: Any) -> Tuple[Optional[int], Optional[int]]:
+        """Best-effort (open, idle) connection counts from the SDK's httpx pool."""
+        http_client = getattr(client, "_client", None)
+        transport = getattr(http_client, "_transport", None)
+        pool = getattr(transport, "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return None, None
+
+        try:
+            idle = sum(1 for conn in connections if conn.is_idle())
+        except Exception:
+            idle = None
+        return len(connections), idle
+
+async def _close_on_shutdown(client: Any):
+    """Async generator that closes an async client when its loop finalizes it (shutdown_asyncgens())."""
+    try:
+        yield
+    finally:
+        close = getattr(client, "aclose", None) or getattr(client, "close", None)
+        if close is None:
+            # google-genai's async client keeps its httpx client on its API client
+            close = getattr(getattr(getattr(client, "_api_client", None), "_async_httpx_client", None), "aclose", None)
+        if close is not None:
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.debug(f"Error closing async client: {e}")
+
+# Shared instance used by all models in this process
+client_pool = ClientPool()
\ No newline at end of file
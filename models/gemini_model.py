@@ -1,31 +1,120 @@
+import os
 from google import genai
 from google.genai import types
-from typing import Tuple
+from typing import List, Optional, Tuple, Iterator, Union
 from .base import BaseModel, TokenInfo
 
 class GeminiModel(BaseModel):
     """Google Gemini model implementation."""
     
+    provider = "gemini"
+    api_key_env = "GOOGLE_API_KEY"
+    base_url_env = "GOOGLE_GEMINI_BASE_URL"
+    
     def _create_client(self):
         """Create Gemini client."""
-        return genai.Client()
+        return genai.Client(http_options=self._http_options())
+    
+    def _create_async_client(self):
+        """Create Gemini client and return its async (aio) interface."""
+        return genai.Client(http_options=self._http_options()).aio
+    
+    def _http_options(self):
+        """Point the client at GOOGLE_GEMINI_BASE_URL when set (e.g. the local mock server)."""
+        base_url = os.getenv(self.base_url_env)
+        return types.HttpOptions(base_url=base_url) if base_url else None
+    
+    def _build_config(self) -> types.GenerateContentConfig:
+        """Build the generation config shared by blocking and streaming calls."""
+        options = {}
+        timeout = self._request_timeout()
+        if timeout is not None:
+            options["http_options"] = types.HttpOptions(timeout=max(int(timeout * 1000), 1))
+        if self.system_prompt:
+            options["system_instruction"] = self.system_prompt
+        return types.GenerateContentConfig(
+            max_output_tokens=self.max_tokens,
+            temperature=self.temperature,
+            thinking_config=types.ThinkingConfig(thinking_budget=0),
+            **options
+        )
+    
+    def _contents(self, prompt: str) -> Union[str, List[types.Content]]:
+        """The prompt, preceded by the conversation history with assistant turns in Gemini's "model" role."""
+        if not self.history:
+            return prompt
+        return [
+            types.Content(
+                role="model" if message["role"] == "assistant" else "user",
+                parts=[types.Part(text=message["content"])]
+            )
+            for message in self._messages(prompt)
+        ]
+    
+    def _warmup_request(self, client):
+        """List models to open a pooled connection."""
+        client.models.list(config={"page_size": 1})
+    
+    @staticmethod
+    def _token_info(usage) -> Optional[TokenInfo]:
+        """
+        Convert Gemini usage metadata into TokenInfo.
+        
+        Thinking tokens are billed as output, so they are counted in
+        output_tokens and reported separately as reasoning_tokens.
+        """
+        if usage is None or usage.prompt_token_count is None:
+            return None
+        thoughts = usage.thoughts_token_count
+        output_tokens = (usage.candidates_token_count or 0) + (thoughts or 0)
+        return TokenInfo(
+            input_tokens=usage.prompt_token_count,
+            output_tokens=output_tokens,
+            total_tokens=usage.total_token_count or usage.prompt_token_count + output_tokens,
+            reasoning_tokens=thoughts,
+            cached_input_tokens=usage.cached_content_token_count
+        )
     
     def _generate_response(self, prompt: str) -> Tuple[str, TokenInfo]:
         """Generate response using Gemini API."""
         response = self.client.models.generate_content(
             model=self.model_name,
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                max_output_tokens=self.max_tokens,
-                temperature=self.temperature,
-                thinking_config=types.ThinkingConfig(thinking_budget=0)
-            )
+            contents=self._contents(prompt),
+            config=self._build_config()
         )
         
-        token_info = TokenInfo(
-            input_tokens='Not available',
-            output_tokens='Not available',
-            total_tokens='Not available'
+        return response.text, self._token_info(response.usage_metadata)
+    
+    async def _agenerate_response(self, prompt: str) -> Tuple[str, TokenInfo]:
+        """Generate response using the async Gemini API."""
+        response = await self.async_client.models.generate_content(
+            model=self.model_name,
+            contents=self._contents(prompt),
+            config=self._build_config()
         )
         
-        return response.text, token_info 
\ No newline at end of file
+        return response.text, self._token_info(response.usage_metadata)
+    
+    def _stream_response(self, prompt: str) -> Iterator[Union[str, TokenInfo]]:
+        """Stream response using Gemini API."""
+        stream = self.client.models.generate_content_stream(
+            model=self.model_name,
+            contents=self._contents(prompt),
+            config=self._build_config()
+        )
+        
+        usage = None
+        try:
+            for chunk in stream:
+                # Usage is cumulative; the last chunk carries the final counts
+                if chunk.usage_metadata:
+                    usage = chunk.usage_metadata
+                if chunk.text:
+                    yield chunk.text
+        finally:
+            # The SDK streams from a generator; closing it releases the connection
+            stream.close()
+        
+        token_info = self._token_info(usage)
+        if token_info:
+            yield token_info
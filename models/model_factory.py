@@ -1,35 +1,125 @@
-from typing import Dict, Type
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Type, Union
+import importlib
+import logging
+import threading
+import time
 from .base import BaseModel
-from .openai_model import OpenAIModel
-from .claude_model import ClaudeModel
-from .gemini_model import GeminiModel
-from .grok_model import GrokModel
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ProviderLoadStats:
+    """Startup cost of one provider: importing its model class and SDK."""
+    provider: str
+    import_path: str
+    loaded: bool = False
+    import_seconds: Optional[float] = None
+    error: Optional[str] = None
 
 class ModelFactory:
-    """Factory class to create model instances based on provider."""
-    
-    _model_classes: Dict[str, Type[BaseModel]] = {
-        "openai": OpenAIModel,
-        "claude": ClaudeModel,
-        "gemini": GeminiModel,
-        "grok": GrokModel
+    """
+    Factory class to create model instances based on provider.
+
+    Providers are registered by import path ("module:ClassName") and the
+    module, with its SDK, is imported the first time a model of that provider
+    is created. Disabled providers or providers without an API key never pay
+    for importing openai, anthropic or google-genai.
+    """
+
+    _model_classes: Dict[str, Union[str, Type[BaseModel]]] = {
+        "openai": "models.openai_model:OpenAIModel",
+        "claude": "models.claude_model:ClaudeModel",
+        "gemini": "models.gemini_model:GeminiModel",
+        "grok": "models.grok_model:GrokModel"
     }
+    _load_stats: Dict[str, ProviderLoadStats] = {}
+    _lock = threading.Lock()
     
     @classmethod
-    def create_model(cls, model_name: str, provider: str, max_tokens: int = 1000, temperature: float = 1.0) -> BaseModel:
-        """Create a model instance based on provider."""
+    def get_model_class(cls, provider: str) -> Type[BaseModel]:
+        """Get a provider's model class, importing it on first use."""
         if provider not in cls._model_classes:
             raise ValueError(f"Unknown provider: {provider}")
 
-        model_class = cls._model_classes[provider]
-        return model_class(model_name, max_tokens=max_tokens, temperature=temperature)
+        with cls._lock:
+            target = cls._model_classes[provider]
+            if not isinstance(target, str):
+                return target
+
+            stats = cls._load_stats.setdefault(provider, ProviderLoadStats(provider, target))
+            module_name, _, class_name = target.partition(":")
+            start = time.perf_counter()
+            try:
+                model_class = getattr(importlib.import_module(module_name), class_name)
+            except Exception as e:
+                stats.error = str(e)
+                raise ImportError(f"Could not load provider '{provider}' from {target}: {e}") from e
+            stats.import_seconds = time.perf_counter() - start
+            stats.loaded = True
+            stats.error = None
+            logger.info(f"Loaded {provider} provider in {stats.import_seconds:.3f}s")
+
+            cls._model_classes[provider] = model_class
+            return model_class
+    
+    @classmethod
+    def create_model(cls, model_name: str, provider: str, max_tokens: int = 1000, temperature: float = 1.0,
+                     cache=None, timeout: float = None, input_price: float = None,
+                     output_price: float = None, similarity_threshold: float = None,
+                     system_prompt: str = None, history: list = None,
+                     cached_input_price: float = None) -> BaseModel:
+        """
+        Create a model instance based on provider.
+
+        Optionally backed by a ResponseCache (serving near-duplicate prompts
+        above similarity_threshold), with a request timeout, USD prices
+        per million input/output/cached-input tokens for cost estimates, and
+        a system prompt and conversation history sent ahead of each prompt.
+        """
+        model_class = cls.get_model_class(provider)
+        return model_class(
+            model_name,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            cache=cache,
+            timeout=timeout,
+            input_price=input_price,
+            output_price=output_price,
+            similarity_threshold=similarity_threshold,
+            system_prompt=system_prompt,
+            history=history,
+            cached_input_price=cached_input_price
+        )
     
     @classmethod
     def get_supported_providers(cls) -> list:
-        """Get list of supported providers."""
+        """Get list of supported providers (without importing them)."""
         return list(cls._model_classes.keys())
     
     @classmethod
-    def register_model(cls, provider: str, model_class: Type[BaseModel]):
-        """Register a new model provider (for extensibility)."""
-        cls._model_classes[provider] = model_class 
\ No newline at end of file
+    def register_model(cls, provider: str, model_class: Union[str, Type[BaseModel]]):
+        """
+        Register a new model provider (for extensibility).
+
+        Args:
+            provider: Provider name used in models_config.json
+            model_class: BaseModel subclass, or its "module:ClassName" import
+                path to load it lazily
+        """
+        with cls._lock:
+            cls._model_classes[provider] = model_class
+            cls._load_stats.pop(provider, None)
+    
+    @classmethod
+    def load_report(cls) -> List[ProviderLoadStats]:
+        """Import cost of every provider registered by path; unloaded ones have no timing yet."""
+        with cls._lock:
+            report = []
+            for provider, target in cls._model_classes.items():
+                stats = cls._load_stats.get(provider)
+                if stats is not None:
+                    report.append(ProviderLoadStats(**vars(stats)))
+                elif isinstance(target, str):
+                    report.append(ProviderLoadStats(provider, target))
+            return report
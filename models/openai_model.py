@@ -1,28 +1,92 @@
-from openai import OpenAI
-from typing import Tuple
+from openai import OpenAI, AsyncOpenAI
+from typing import Tuple, Iterator, Union, Dict, Any
 from .base import BaseModel, TokenInfo
 
 class OpenAIModel(BaseModel):
     """OpenAI GPT model implementation."""
     
+    provider = "openai"
+    api_key_env = "OPENAI_API_KEY"
+    base_url_env = "OPENAI_BASE_URL"
+    
     def _create_client(self):
-        """Create OpenAI client."""
-        return OpenAI()
+        """Create OpenAI client; retries are left to _call_rate_limited()."""
+        return OpenAI(max_retries=0)
+    
+    def _create_async_client(self):
+        """Create async OpenAI client; retries are left to _acall_rate_limited()."""
+        return AsyncOpenAI(max_retries=0)
+    
+    def _warmup_request(self, client):
+        """List models to open a pooled connection."""
+        client.models.list()
+    
+    def _build_request(self, prompt: str) -> Dict[str, Any]:
+        """
+        Build chat completion arguments shared by all call paths.
+        
+        The system prompt and history always come first and are sent
+        unchanged, so OpenAI's automatic prefix caching can reuse them.
+        """
+        system = [{"role": "system", "content": self.system_prompt}] if self.system_prompt else []
+        return {
+            "model": self.model_name,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "messages": system + self._messages(prompt)
+        }
+    
+    @staticmethod
+    def _token_info(usage) -> TokenInfo:
+        """Convert OpenAI chat completion usage into TokenInfo, including reasoning and cached tokens when reported."""
+        details = getattr(usage, "completion_tokens_details", None)
+        prompt_details = getattr(usage, "prompt_tokens_details", None)
+        return TokenInfo(
+            input_tokens=usage.prompt_tokens,
+            output_tokens=usage.completion_tokens,
+            total_tokens=usage.total_tokens,
+            reasoning_tokens=getattr(details, "reasoning_tokens", None),
+            cached_input_tokens=getattr(prompt_details, "cached_tokens", None)
+        )
+    
+    def _parse_completion(self, completion) -> Tuple[str, TokenInfo]:
+        """Extract text and token usage from a chat completion."""
+        token_info = self._token_info(completion.usage) if completion.usage else None
+        return completion.choices[0].message.content, token_info
     
     def _generate_response(self, prompt: str) -> Tuple[str, TokenInfo]:
         """Generate response using OpenAI API."""
         completion = self.client.chat.completions.create(
-            model=self.model_name,
-            max_tokens=self.max_tokens,
-            temperature=self.temperature,
-            messages=[{"role": "user", "content": prompt}]
+            **self._build_request(prompt), **self._request_options()
         )
-        
-        usage = completion.usage
-        token_info = TokenInfo(
-            input_tokens=usage.prompt_tokens,
-            output_tokens=usage.completion_tokens,
-            total_tokens=usage.total_tokens
+        return self._parse_completion(completion)
+    
+    async def _agenerate_response(self, prompt: str) -> Tuple[str, TokenInfo]:
+        """Generate response using the async OpenAI API."""
+        completion = await self.async_client.chat.completions.create(
+            **self._build_request(prompt), **self._request_options()
+        )
+        return self._parse_completion(completion)
+    
+    def _stream_response(self, prompt: str) -> Iterator[Union[str, TokenInfo]]:
+        """Stream response using OpenAI API."""
+        stream = self.client.chat.completions.create(
+            **self._build_request(prompt),
+            **self._request_options(),
+            stream=True,
+            stream_options={"include_usage": True}
         )
         
-        return completion.choices[0].message.content, token_info 
\ No newline at end of file
+        usage = None
+        try:
+            for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Close the HTTP response if the consumer stops early
+            stream.response.close()
+        
+        if usage:
+            yield self._token_info(usage)
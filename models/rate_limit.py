@@ -0,0 +1,431 @@
+import asyncio
+import contextvars
+import logging
+import math
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .cancellation import cancellable_sleep, check_cancelled
+
+logger = logging.getLogger(__name__)
+
+# Rate-limit response headers: OpenAI-compatible (OpenAI, xAI) first, then Anthropic
+LIMIT_HEADERS = {
+    "requests": ("x-ratelimit-limit-requests", "anthropic-ratelimit-requests-limit"),
+    "tokens": ("x-ratelimit-limit-tokens", "anthropic-ratelimit-tokens-limit"),
+}
+REMAINING_HEADERS = {
+    "requests": ("x-ratelimit-remaining-requests", "anthropic-ratelimit-requests-remaining"),
+    "tokens": ("x-ratelimit-remaining-tokens", "anthropic-ratelimit-tokens-remaining"),
+}
+RESET_HEADERS = {
+    "requests": ("x-ratelimit-reset-requests", "anthropic-ratelimit-requests-reset"),
+    "tokens": ("x-ratelimit-reset-tokens", "anthropic-ratelimit-tokens-reset"),
+}
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+_current_ticket: contextvars.ContextVar = contextvars.ContextVar("rate_limit_ticket", default=None)
+
+class TokenBucket:
+    """
+    Budget of requests or tokens per minute that refills continuously.
+
+    A bucket without a limit never delays anything. The level may go
+    negative when a request costs more than estimated; later requests then
+    wait for the debt to refill.
+    """
+
+    def __init__(self, per_minute: Optional[float] = None):
+        self.capacity: Optional[float] = None
+        self.level: Optional[float] = None
+        self._updated = time.monotonic()
+        self.set_limit(per_minute)
+
+    def set_limit(self, per_minute: Optional[float]):
+        """Change the limit, keeping the current level within the new capacity."""
+        self._refill()
+        self.capacity = float(per_minute) if per_minute else None
+        if self.capacity is None:
+            self.level = None
+        elif self.level is None:
+            self.level = self.capacity
+        else:
+            self.level = min(self.level, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.capacity is not None:
+            self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60.0)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available; a request larger than the bucket waits for a full one."""
+        if self.capacity is None:
+            return 0.0
+        self._refill()
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) * 60.0 / self.capacity
+
+    def take(self, amount: float):
+        if self.capacity is not None:
+            self._refill()
+            self.level -= amount
+
+    def give(self, amount: float):
+        if self.capacity is not None:
+            self._refill()
+            self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, remaining: float):
+        """Lower the level to what the provider reports as remaining."""
+        if self.capacity is not None:
+            self._refill()
+            self.level = min(self.level, remaining)
+
+@dataclass
+class RateLimitState:
+    """Snapshot of one provider's or model's rate limits."""
+    key: str
+    rpm: Optional[float] = None
+    tpm: Optional[float] = None
+    requests_available: Optional[float] = None
+    tokens_available: Optional[float] = None
+    # Seconds until requests are allowed again after a 429 or an exhausted quota
+    blocked_for: float = 0.0
+    # Requests that had to wait for capacity, 429 responses seen, and retries after them
+    throttled: int = 0
+    rate_limited: int = 0
+    retries: int = 0
+
+class _Limits:
+    """Request and token buckets for one provider or model."""
+
+    def __init__(self, key: str, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.key = key
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self.rate_limited = 0
+        self.retries = 0
+
+    def wait_time(self, tokens: float) -> float:
+        return max(
+            self.blocked_until - time.monotonic(),
+            self.requests.wait_time(1),
+            self.tokens.wait_time(tokens)
+        )
+
+    def state(self) -> RateLimitState:
+        return RateLimitState(
+            key=self.key,
+            rpm=self.requests.capacity,
+            tpm=self.tokens.capacity,
+            requests_available=self.requests.level,
+            tokens_available=self.tokens.level,
+            blocked_for=max(self.blocked_until - time.monotonic(), 0.0),
+            throttled=self.throttled,
+            rate_limited=self.rate_limited,
+            retries=self.retries
+        )
+
+@dataclass
+class RateLimitTicket:
+    """Capacity reserved for one request attempt."""
+    provider: _Limits
+    model: _Limits
+    tokens: int
+
+class RateLimiter:
+    """
+    Process-wide token buckets per provider and per model.
+
+    Provider buckets come from ProviderConfig.rpm/tpm. Model buckets start
+    from ModelConfig.rpm/tpm and follow the limits and remaining quota the
+    provider reports in its rate-limit response headers. Every request
+    reserves one request and its estimated token cost (prompt estimate plus
+    max_tokens) from both buckets before it is sent; the estimate is
+    corrected from the reported usage afterwards. A 429 blocks the model
+    until its Retry-After, and the request is retried with jittered
+    exponential backoff once capacity is available again.
+
+    The provider clients are built without SDK retries, so every retry,
+    including those of timeouts, connection errors and 5xx responses,
+    goes through backoff() and re-acquires capacity first.
+    """
+
+    def __init__(self, max_retries: int = 4, base_backoff: float = 1.0, max_backoff: float = 30.0,
+                 chars_per_token: float = 4.0, max_error_retries: int = 2):
+        """
+        Initialize the limiter.
+
+        Args:
+            max_retries: Retries of a request after rate-limit errors
+            base_backoff: Backoff ceiling in seconds for the first retry; doubles each retry
+            max_backoff: Upper bound on the backoff ceiling in seconds
+            chars_per_token: Characters per token used to estimate prompt size
+            max_error_retries: Retries after transient errors (timeouts, connection
+                errors, 408/409/5xx), as many as the provider SDKs make by default
+        """
+        self.max_retries = max_retries
+        self.max_error_retries = max_error_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.chars_per_token = chars_per_token
+        self._lock = threading.Lock()
+        self._provider_seeds: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+        self._model_seeds: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+        self._providers: Dict[str, _Limits] = {}
+        self._models: Dict[str, _Limits] = {}
+
+    def configure(self, config_manager):
+        """Seed provider and model limits from a ConfigManager, replacing earlier seeds."""
+        with self._lock:
+            self._provider_seeds = {
+                provider: (settings.rpm, settings.tpm)
+                for provider, settings in config_manager.providers.items()
+            }
+            self._model_seeds = {
+                f"{m.provider}/{m.model_id}": (m.rpm, m.tpm)
+                for m in config_manager.models
+            }
+            for key, limits in self._providers.items():
+                self._apply_seed(limits, self._provider_seeds.get(key))
+            for key, limits in self._models.items():
+                self._apply_seed(limits, self._model_seeds.get(key))
+
+    @staticmethod
+    def _apply_seed(limits: _Limits, seed: Optional[Tuple[Optional[float], Optional[float]]]):
+        # Without a configured value, keep whatever the provider's headers reported
+        rpm, tpm = seed or (None, None)
+        if rpm:
+            limits.requests.set_limit(rpm)
+        if tpm:
+            limits.tokens.set_limit(tpm)
+
+    def _limits(self, provider: str, model_name: str) -> Tuple[_Limits, _Limits]:
+        """Get (creating on first use) the buckets for a provider and one of its models."""
+        model_key = f"{provider}/{model_name}"
+        provider_limits = self._providers.get(provider)
+        if provider_limits is None:
+            provider_limits = self._providers[provider] = _Limits(
+                provider, *(self._provider_seeds.get(provider) or (None, None))
+            )
+        model_limits = self._models.get(model_key)
+        if model_limits is None:
+            model_limits = self._models[model_key] = _Limits(
+                model_key, *(self._model_seeds.get(model_key) or (None, None))
+            )
+        return provider_limits, model_limits
+
+    def estimate_tokens(self, prompt: str, max_tokens: int) -> int:
+        """Token cost charged before sending: estimated prompt tokens plus the output budget."""
+        return math.ceil(len(prompt) / self.chars_per_token) + max_tokens
+
+    def reserve(self, provider: str, model_name: str, tokens: int) -> Tuple[Optional[RateLimitTicket], float]:
+        """
+        Reserve capacity without blocking.
+
+        Returns:
+            (ticket, 0.0) if the request may be sent now, otherwise
+            (None, seconds to wait before trying again)
+        """
+        with self._lock:
+            provider_limits, model_limits = self._limits(provider, model_name)
+            wait = max(provider_limits.wait_time(tokens), model_limits.wait_time(tokens))
+            if wait > 0:
+                return None, wait
+            for limits in (provider_limits, model_limits):
+                limits.requests.take(1)
+                limits.tokens.take(tokens)
+            return RateLimitTicket(provider_limits, model_limits, tokens), 0.0
+
+    def acquire(self, provider: str, model_name: str, tokens: int) -> RateLimitTicket:
+        """Reserve capacity, waiting until it is available or the current scope is cancelled."""
+        throttled = False
+        while True:
+            ticket, wait = self.reserve(provider, model_name, tokens)
+            if ticket is not None:
+                return ticket
+            if not throttled:
+                throttled = True
+                self._count_throttled(provider, model_name)
+                logger.debug(f"Rate limit reached for {provider}/{model_name}, waiting {wait:.2f}s")
+            cancellable_sleep(wait)
+
+    async def aacquire(self, provider: str, model_name: str, tokens: int) -> RateLimitTicket:
+        """Async version of acquire() that waits without blocking the event loop."""
+        throttled = False
+        while True:
+            ticket, wait = self.reserve(provider, model_name, tokens)
+            if ticket is not None:
+                return ticket
+            if not throttled:
+                throttled = True
+                self._count_throttled(provider, model_name)
+            check_cancelled()
+            await asyncio.sleep(min(wait, 0.25))
+
+    def _count_throttled(self, provider: str, model_name: str):
+        with self._lock:
+            for limits in self._limits(provider, model_name):
+                limits.throttled += 1
+
+    def settle(self, ticket: RateLimitTicket, token_info: Any):
+        """Replace a request's estimated token cost with its reported usage."""
+        used = getattr(token_info, "total_tokens", None)
+        if not isinstance(used, int):
+            return
+        with self._lock:
+            for limits in (ticket.provider, ticket.model):
+                limits.tokens.give(ticket.tokens - used)
+
+    def backoff(self, ticket: RateLimitTicket, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Handle a failed attempt.
+
+        Returns:
+            Seconds of jittered backoff before re-acquiring capacity and
+            retrying, or None if the error is neither a rate limit nor
+            transient, or retries are exhausted
+        """
+        with self._lock:
+            # A failed request does not count against the token quota
+            for limits in (ticket.provider, ticket.model):
+                limits.tokens.give(ticket.tokens)
+        if is_rate_limit_error(error):
+            max_retries = self.max_retries
+        elif is_transient_error(error):
+            max_retries = self.max_error_retries
+        else:
+            return None
+        if attempt >= max_retries:
+            return None
+
+        retry_after = _retry_after(getattr(getattr(error, "response", None), "headers", None))
+        with self._lock:
+            ticket.model.retries += 1
+            if retry_after is not None and is_rate_limit_error(error):
+                ticket.model.blocked_until = max(ticket.model.blocked_until, time.monotonic() + retry_after)
+        # Full jitter spreads out the retries of requests rejected together
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+
+    def observe(self, ticket: RateLimitTicket, status_code: int, headers: Mapping[str, str]):
+        """Update a model's buckets from one HTTP response's rate-limit headers."""
+        now = time.monotonic()
+        with self._lock:
+            limits = ticket.model
+            for kind, bucket in (("requests", limits.requests), ("tokens", limits.tokens)):
+                limit = _number(_header(headers, LIMIT_HEADERS[kind]))
+                if limit and limit != bucket.capacity:
+                    bucket.set_limit(limit)
+                remaining = _number(_header(headers, REMAINING_HEADERS[kind]))
+                if remaining is None:
+                    continue
+                bucket.sync(remaining)
+                reset = _duration(_header(headers, RESET_HEADERS[kind]))
+                if remaining <= 0 and reset:
+                    limits.blocked_until = max(limits.blocked_until, now + reset)
+            if status_code == 429:
+                limits.rate_limited += 1
+                retry_after = _retry_after(headers)
+                if retry_after is not None:
+                    limits.blocked_until = max(limits.blocked_until, now + retry_after)
+
+    @contextmanager
+    def track(self, ticket: RateLimitTicket):
+        """Route rate-limit headers of responses received in this block to ticket's model."""
+        token = _current_ticket.set(ticket)
+        try:
+            yield ticket
+        finally:
+            try:
+                _current_ticket.reset(token)
+            except ValueError:
+                # A stream closed from another context
+                pass
+
+    def snapshot(self) -> List[RateLimitState]:
+        """Current state of every provider and model bucket that has been used."""
+        with self._lock:
+            return [limits.state() for limits in [*self._providers.values(), *self._models.values()]]
+
+    def reset(self):
+        """Forget learned limits and counters; configured seeds are kept."""
+        with self._lock:
+            self._providers.clear()
+            self._models.clear()
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for HTTP 429 errors from the OpenAI, Anthropic and Google SDKs."""
+    return getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429
+
+def is_transient_error(error: Exception) -> bool:
+    """True for errors the provider SDKs retry: 408, 409 and 5xx responses, timeouts and connection failures."""
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int):
+        return status in (408, 409) or status >= 500
+    # openai/anthropic APIConnectionError (and APITimeoutError), or a bare httpx error from google-genai
+    return any(cls.__name__ in ("APIConnectionError", "TransportError") for cls in type(error).__mro__)
+
+def observe_response(response: Any):
+    """httpx response hook feeding rate-limit headers to the limiter of the request in progress."""
+    ticket = _current_ticket.get()
+    if ticket is None:
+        return
+    try:
+        rate_limiter.observe(ticket, response.status_code, response.headers)
+    except Exception as e:
+        logger.debug(f"Could not read rate-limit headers: {e}")
+
+def _header(headers: Mapping[str, str], names: Tuple[str, ...]) -> Optional[str]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return value
+    return None
+
+def _number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+def _duration(value: Optional[str]) -> Optional[float]:
+    """Seconds from "20ms" / "6m0s" / "1.5" style durations or an RFC 3339 reset time."""
+    if not value:
+        return None
+    seconds = _number(value)
+    if seconds is not None:
+        return seconds
+    parts = _DURATION_PART.findall(value)
+    if parts and "".join(n + unit for n, unit in parts) == value.strip():
+        return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+    try:
+        reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if reset_at.tzinfo is None:
+        reset_at = reset_at.replace(tzinfo=timezone.utc)
+    return max((reset_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+def _retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    if not headers:
+        return None
+    retry_after_ms = _number(headers.get("retry-after-ms"))
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000.0
+    return _number(headers.get("retry-after"))
+
+# Shared instance used by all models in this process
+rate_limiter = RateLimiter()
@@ -0,0 +1,119 @@
+import contextvars
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Phases reported in ModelResponse.phase_timings, in request order
+PHASES = ("rate_limit_wait", "client_acquire", "request_send", "first_byte", "body_parse")
+
+_current_timer: contextvars.ContextVar = contextvars.ContextVar("phase_timer", default=None)
+
+class PhaseTimer:
+    """
+    Splits one model call into phases on the monotonic clock.
+
+    Marks are set by BaseModel (client acquired) and by HTTP event hooks
+    installed on the SDK's httpx client (request sent, response headers
+    received). When the hooks are unavailable only client_acquire and a
+    combined "request" phase are reported.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, name: str):
+        """Record the current time for a mark; retries overwrite earlier attempts."""
+        self.marks[name] = time.perf_counter()
+
+    def phases(self, end: Optional[float] = None) -> Dict[str, float]:
+        """Durations in seconds for each phase that could be measured."""
+        end = end if end is not None else time.perf_counter()
+        admitted = self.marks.get("rate_limit_acquired", self.start)
+        acquired = self.marks.get("client_acquired", admitted)
+        sent = self.marks.get("request_sent")
+        first_byte = self.marks.get("first_byte")
+
+        phases = {}
+        if "rate_limit_acquired" in self.marks:
+            phases["rate_limit_wait"] = admitted - self.start
+        phases["client_acquire"] = acquired - admitted
+        if sent is None or first_byte is None or first_byte < sent:
+            phases["request"] = end - acquired
+            return phases
+
+        phases["request_send"] = sent - acquired
+        phases["first_byte"] = first_byte - sent
+        phases["body_parse"] = end - first_byte
+        return phases
+
+    def __enter__(self) -> "PhaseTimer":
+        self._token = _current_timer.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            _current_timer.reset(self._token)
+        except ValueError:
+            # An abandoned stream closed from another context
+            pass
+
+def mark_current(name: str):
+    """Set a mark on the timer of the call in progress, if any."""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.mark(name)
+
+def _on_request(request):
+    mark_current("request_sent")
+
+def _on_response(response):
+    mark_current("first_byte")
+
+async def _on_request_async(request):
+    mark_current("request_sent")
+
+async def _on_response_async(response):
+    mark_current("first_byte")
+
+def _async_hook(hook: Callable[[Any], None]) -> Callable[[Any], Any]:
+    async def run(response):
+        hook(response)
+    return run
+
+def instrument_client(client: Any, response_hooks: Sequence[Callable[[Any], None]] = ()) -> Any:
+    """
+    Best-effort install of timing hooks on an SDK client's underlying httpx client.
+
+    Response hooks run once headers arrive, before the body is read, which
+    separates time-to-first-byte from body download and parsing. Clients
+    whose HTTP layer cannot be reached are returned unchanged.
+
+    Args:
+        client: SDK client to instrument
+        response_hooks: Extra synchronous callables given each httpx response,
+            e.g. to read rate-limit headers
+    """
+    http_client = getattr(client, "_client", None)
+    if http_client is None:
+        # google-genai keeps its httpx clients on the shared API client
+        attr = "_async_httpx_client" if type(client).__name__.startswith("Async") else "_httpx_client"
+        http_client = getattr(getattr(client, "_api_client", None), attr, None)
+
+    hooks = getattr(http_client, "event_hooks", None)
+    if not isinstance(hooks, dict):
+        return client
+
+    is_async = type(http_client).__name__.startswith("Async")
+    try:
+        hooks = {key: list(value) for key, value in hooks.items()}
+        hooks.setdefault("request", []).append(_on_request_async if is_async else _on_request)
+        hooks.setdefault("response", []).append(_on_response_async if is_async else _on_response)
+        for hook in response_hooks:
+            hooks["response"].append(_async_hook(hook) if is_async else hook)
+        http_client.event_hooks = hooks
+    except Exception as e:
+        logger.debug(f"Could not instrument {type(client).__name__}: {e}")
+    return client
\ No newline at end of file
@@ -0,0 +1,41 @@
+import logging
+import math
+from functools import lru_cache
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Characters per token assumed when tiktoken is not installed
+CHARS_PER_TOKEN = 4.0
+
+# Models whose tokenizer tiktoken knows by name fall back to this encoding otherwise
+DEFAULT_ENCODING = "o200k_base"
+
+@lru_cache(maxsize=None)
+def _encoder(model_name: str) -> Optional[Any]:
+    """
+    tiktoken encoder for a model, built once per model and process.
+
+    Returns None when tiktoken is not installed. Models tiktoken doesn't know
+    (Claude, Gemini, Grok) use DEFAULT_ENCODING, which is close enough for
+    an estimate.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        logger.info("tiktoken is not installed; estimating token counts from text length")
+        return None
+
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+def count_tokens(text: Optional[str], model_name: str = "") -> int:
+    """Estimate the number of tokens in text for a model."""
+    if not text:
+        return 0
+    encoder = _encoder(model_name)
+    if encoder is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoder.encode(text, disallowed_special=()))
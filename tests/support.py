@@ -0,0 +1,34 @@
+import os
+import unittest
+from unittest import mock
+
+from mock_providers.server import MockProviderServer
+
+class MockProvidersTestCase(unittest.TestCase):
+    """Runs the mock provider server for a test class and points every SDK at it."""
+
+    batch_seconds = 0.0
+    profile = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = MockProviderServer(batch_seconds=cls.batch_seconds, profile=cls.profile).start()
+        url = cls.server.url
+        cls._environ = mock.patch.dict(os.environ, {
+            "OPENAI_BASE_URL": f"{url}/v1",
+            "XAI_BASE_URL": f"{url}/v1",
+            "ANTHROPIC_BASE_URL": url,
+            "GOOGLE_GEMINI_BASE_URL": url,
+            "OPENAI_API_KEY": "mock",
+            "ANTHROPIC_API_KEY": "mock",
+            "GOOGLE_API_KEY": "mock",
+            "XAI_API_KEY": "mock",
+        })
+        cls._environ.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._environ.stop()
+        cls.server.stop()
+        super().tearDownClass()
@@ -0,0 +1,63 @@
+import unittest
+
+import utils.agreement as agreement
+from utils.agreement import AgreementEngine
+
+MODELS = ["a", "b", "c", "d"]
+
+# Short answers are common in eval sets; they are shorter than the default 4-character n-grams
+SHORT_ANSWERS = [
+    ["abc", "abc", "abc", "abc"],
+    ["B", "B", "b", "A"],
+    ["42", "42", "42", "43"],
+    ["The capital of France is Paris.", "Paris is the capital of France.", "I don't know.", None],
+]
+
+class ShortAnswerAgreementTest(unittest.TestCase):
+    """Identical short answers must agree on both the NumPy and the pure Python path."""
+
+    def compare(self, use_numpy: bool):
+        if use_numpy and agreement.np is None:
+            self.skipTest("NumPy is not installed")
+        saved = agreement.np
+        if not use_numpy:
+            agreement.np = None
+        try:
+            return AgreementEngine().compare(SHORT_ANSWERS, MODELS, prompt_ids=["abc", "letter", "number", "long"])
+        finally:
+            agreement.np = saved
+
+    def check(self, report):
+        abc, letter, number, _ = report.similarity
+        for i in range(4):
+            for j in range(4):
+                self.assertAlmostEqual(abc[i][j], 1.0, places=5)
+        self.assertAlmostEqual(letter[0][2], 1.0, places=5)
+        self.assertAlmostEqual(letter[0][3], 0.0, places=5)
+        self.assertAlmostEqual(number[0][1], 1.0, places=5)
+        self.assertLess(number[0][3], 1.0)
+        # Four identical answers agree completely, so that prompt is the least divergent
+        self.assertEqual(report.divergent_prompts[-1][0], "abc")
+
+    def test_numpy(self):
+        self.check(self.compare(use_numpy=True))
+
+    def test_pure_python(self):
+        self.check(self.compare(use_numpy=False))
+
+    def test_paths_match(self):
+        if agreement.np is None:
+            self.skipTest("NumPy is not installed")
+        numpy_report = self.compare(use_numpy=True)
+        python_report = self.compare(use_numpy=False)
+        for numpy_matrix, python_matrix in zip(numpy_report.similarity, python_report.similarity):
+            for numpy_row, python_row in zip(numpy_matrix, python_matrix):
+                for x, y in zip(numpy_row, python_row):
+                    if x is None or y is None:
+                        self.assertIsNone(x)
+                        self.assertIsNone(y)
+                    else:
+                        self.assertAlmostEqual(x, y, places=4)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from starlette.testclient import TestClient
+
+import api_server
+from mock_providers.server import LatencyProfile
+from models.cancellation import CancelScope
+
+from support import MockProvidersTestCase
+
+MODELS = [
+    {"model_id": "gpt-a", "provider": "openai", "cache": False},
+    {"model_id": "claude-b", "provider": "claude", "cache": False},
+]
+
+def parse_events(body: str):
+    """(event, data) pairs of an SSE body, skipping keep-alive comments."""
+    events = []
+    for block in body.split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+class RecordingScope(CancelScope):
+    """CancelScope that remembers every instance, so a test can see how a comparison ended."""
+
+    created = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created.append(self)
+
+class CompareEndpointTest(MockProvidersTestCase):
+    """/compare over the mock providers."""
+
+    # Each reply streams 20 tokens over about a second
+    profile = LatencyProfile(latency=0.05, tokens_per_second=20, reply_tokens=20)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        config_file = os.path.join(directory.name, "models_config.json")
+        with open(config_file, 'w') as f:
+            json.dump(MODELS, f)
+        environ = mock.patch.dict(os.environ, {
+            "CONFIG_FILE": config_file,
+            "PROVIDERS_CONFIG_FILE": os.path.join(directory.name, "providers_config.json"),
+            "API_MAX_CONCURRENT": "1",
+            "API_QUEUE_TIMEOUT": "0",
+            "API_NO_CACHE": "1",
+            "API_NO_HISTORY": "1",
+        })
+        environ.start()
+        self.addCleanup(environ.stop)
+        self.app = api_server.create_app()
+        self.service = self.app.state.service
+        self.client = TestClient(self.app)
+        self.client.__enter__()
+        self.addCleanup(self.client.__exit__, None, None, None)
+
+    def compare(self, **body):
+        return self.client.post("/compare", json={"prompt": "hello there", **body})
+
+    def test_event_order(self):
+        response = self.compare()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        events = parse_events(response.text)
+
+        names = [name for name, _ in events]
+        self.assertEqual(names[0], "start")
+        self.assertEqual(names[-1], "done")
+        self.assertEqual(names.count("result"), 2)
+        self.assertEqual([m["model_id"] for m in events[0][1]["models"]], ["gpt-a", "claude-b"])
+        for index in (0, 1):
+            model_events = [(name, data) for name, data in events if data.get("index") == index and name != "start"]
+            # Every chunk of a model comes before its result, and the chunks make up its text
+            self.assertEqual([name for name, _ in model_events][-1], "result")
+            self.assertGreater(len(model_events), 2)
+            text = "".join(data["text"] for name, data in model_events[:-1])
+            self.assertEqual(text, model_events[-1][1]["text"])
+        self.assertEqual(events[-1][1]["completed"], 2)
+        self.assertEqual(events[-1][1]["failed"], 0)
+        self.assertEqual(self.service.limit.in_flight, 0)
+
+    def test_without_streaming_only_results_are_sent(self):
+        names = [name for name, _ in parse_events(self.compare(stream=False).text)]
+        self.assertEqual(names, ["start", "result", "result", "done"])
+
+    def test_invalid_bodies(self):
+        for body, message in (
+            ({"deadline": True}, "'deadline' must be a positive number of seconds"),
+            ({"deadline": 0}, "'deadline' must be a positive number of seconds"),
+            ({"stream": "false"}, "'stream' must be true or false"),
+            ({"use_cache": 0}, "'use_cache' must be true or false"),
+            ({"models": ["unknown"]}, "Unknown model ID: unknown"),
+        ):
+            with self.subTest(body=body):
+                response = self.compare(**body)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {"error": message})
+        response = self.client.post("/compare", content=b"{not json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_full_worker_returns_503(self):
+        self.assertTrue(self.client.portal.call(self.service.limit.acquire))
+        try:
+            response = self.compare()
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers["retry-after"], "1")
+        finally:
+            self.service.limit.release()
+        self.assertEqual(self.service.limit.rejected, 1)
+        self.assertEqual(self.compare(models=["gpt-a"]).status_code, 200)
+
+    def test_client_disconnect_cancels_the_comparison(self):
+        RecordingScope.created = []
+        disconnected = asyncio.Event()
+        body_read = []
+        sent = []
+        disconnected_at = []
+
+        async def receive():
+            if not body_read:
+                body_read.append(True)
+                return {"type": "http.request", "body": json.dumps({"prompt": "hello there"}).encode(),
+                        "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            if b"event: chunk" in message.get("body", b""):
+                # The client goes away as soon as the first model starts answering
+                disconnected.set()
+                disconnected_at.append(time.perf_counter())
+
+        async def call():
+            scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+                     "scheme": "http", "path": "/compare", "raw_path": b"/compare", "query_string": b"",
+                     "root_path": "", "headers": [(b"content-type", b"application/json")],
+                     "client": ("test", 1), "server": ("test", 80)}
+            await self.app(scope, receive, send)
+
+        with mock.patch.object(api_server, "CancelScope", RecordingScope):
+            self.client.portal.call(call)
+        # The response ends right away rather than after the remaining second of streaming
+        self.assertLess(time.perf_counter() - disconnected_at[0], 0.3)
+
+        self.assertEqual(len(RecordingScope.created), 1)
+        self.assertEqual(RecordingScope.created[0].reason, "Client disconnected")
+        self.assertEqual(self.service.limit.in_flight, 0)
+        bodies = b"".join(message.get("body", b"") for message in sent)
+        self.assertNotIn(b"event: done", bodies)
+        # The relay thread ends once the aborted requests return, well before the replies would have
+        deadline = time.monotonic() + 0.5
+        while any(t.name == "compare-relay" for t in threading.enumerate()) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual([t for t in threading.enumerate() if t.name == "compare-relay"], [])
+
+if __name__ == "__main__":
+    unittest.main()
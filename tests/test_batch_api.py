@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from config.settings import ModelConfig
+from mock_providers.server import count_tokens, mock_reply
+from models.model_factory import ModelFactory
+from utils.batch_api import BATCH_PRICE_FACTOR, BatchAPIRunner, ClaudeBatchBackend, OpenAIBatchBackend
+
+from support import MockProvidersTestCase
+
+PROMPTS = ["What is 2 + 2?", "Name a primary color.", "Say hello."]
+
+class BatchBackendTest(MockProvidersTestCase):
+    """Submit, poll and read results through each batch backend against the mock server."""
+
+    def run_batch(self, backend_class, provider: str, model_name: str):
+        model = ModelFactory.create_model(model_name, provider)
+        backend = backend_class(model.client)
+        batch_id = backend.submit([(f"req-{i}", model, prompt) for i, prompt in enumerate(PROMPTS)])
+
+        deadline = time.time() + 10
+        finished, status = backend.status(batch_id)
+        while not finished and time.time() < deadline:
+            time.sleep(0.05)
+            finished, status = backend.status(batch_id)
+        self.assertTrue(finished, status)
+        return {custom_id: (text, token_info, error) for custom_id, text, token_info, error in backend.results(batch_id)}
+
+    def check(self, results):
+        self.assertEqual(sorted(results), [f"req-{i}" for i in range(len(PROMPTS))])
+        for i, prompt in enumerate(PROMPTS):
+            text, token_info, error = results[f"req-{i}"]
+            self.assertIsNone(error)
+            self.assertEqual(text, mock_reply(prompt))
+            self.assertEqual(token_info.input_tokens, count_tokens(prompt))
+            self.assertEqual(token_info.output_tokens, count_tokens(mock_reply(prompt)))
+
+    def test_openai(self):
+        self.check(self.run_batch(OpenAIBatchBackend, "openai", "gpt-4o-mini"))
+
+    def test_claude(self):
+        self.check(self.run_batch(ClaudeBatchBackend, "claude", "claude-3-5-haiku-latest"))
+
+class BatchAPIRunnerTest(MockProvidersTestCase):
+    """End-to-end runs of BatchAPIRunner through the mock batch endpoints."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.input_path = os.path.join(directory.name, "prompts.jsonl")
+        self.output_path = os.path.join(directory.name, "results.jsonl")
+        with open(self.input_path, 'w') as f:
+            for i, prompt in enumerate(PROMPTS):
+                f.write(json.dumps({"id": f"p{i}", "prompt": prompt}) + "\n")
+
+    def run_configs(self, configs):
+        summary = BatchAPIRunner(configs, poll_interval=0.05).run(self.input_path, self.output_path)
+        with open(self.output_path) as f:
+            records = [json.loads(line) for line in f]
+        return summary, records
+
+    def test_mixed_claude_batch_prices_each_model(self):
+        # Both models go into one Claude batch; each result must use its own model's prices
+        configs = [
+            ModelConfig("claude-cheap", "claude", "Cheap", input_price=1.0, output_price=2.0),
+            ModelConfig("claude-dear", "claude", "Dear", input_price=10.0, output_price=20.0),
+        ]
+        summary, records = self.run_configs(configs)
+        self.assertEqual((summary.completed, summary.failed), (6, 0))
+        self.assertEqual(len(records), 6)
+
+        prices = {config.model_id: config for config in configs}
+        for record in records:
+            config = prices[record["model_id"]]
+            tokens = record["token_info"]
+            expected = (tokens["input_tokens"] * config.input_price
+                        + tokens["output_tokens"] * config.output_price) / 1_000_000 * BATCH_PRICE_FACTOR
+            self.assertAlmostEqual(record["cost"], expected)
+
+    def test_openai_batch_per_model(self):
+        configs = [
+            ModelConfig("gpt-a", "openai", "A", input_price=1.0, output_price=2.0),
+            ModelConfig("gpt-b", "openai", "B", input_price=3.0, output_price=4.0),
+        ]
+        summary, records = self.run_configs(configs)
+        self.assertEqual((summary.completed, summary.failed), (6, 0))
+        self.assertEqual(
+            sorted((record["prompt_id"], record["model_id"]) for record in records),
+            sorted((f"p{i}", model_id) for i in range(len(PROMPTS)) for model_id in ("gpt-a", "gpt-b"))
+        )
+        self.assertFalse(os.path.exists(f"{self.output_path}.batches.json"))
+
+if __name__ == "__main__":
+    unittest.main()
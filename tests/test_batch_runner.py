@@ -0,0 +1,58 @@
+import json
+import os
+import tempfile
+import unittest
+
+from config.settings import ModelConfig
+from utils.batch_runner import BatchRunner, load_completed
+
+from support import MockProvidersTestCase
+
+CONFIGS = [
+    ModelConfig("gpt-a", "openai", "A", cache=False),
+    ModelConfig("claude-b", "claude", "B", cache=False),
+]
+
+class ResumeTest(MockProvidersTestCase):
+    """A restarted run picks up where an interrupted one stopped."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.input_path = os.path.join(directory.name, "prompts.jsonl")
+        self.output_path = os.path.join(directory.name, "results.jsonl")
+        with open(self.input_path, 'w') as f:
+            for i in range(10):
+                f.write(json.dumps({"id": f"p{i}", "prompt": f"Prompt number {i}"}) + "\n")
+        self.expected = {(f"p{i}", config.model_id) for i in range(10) for config in CONFIGS}
+
+    def run_batch(self):
+        return BatchRunner(CONFIGS, max_in_flight=4).run(self.input_path, self.output_path)
+
+    def read_records(self):
+        with open(self.output_path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_resume_after_truncated_last_line(self):
+        self.assertEqual(self.run_batch().completed, 20)
+        with open(self.output_path, 'rb+') as f:
+            # A run killed mid-write leaves part of its last record behind
+            f.truncate(f.seek(0, os.SEEK_END) - 25)
+        self.assertEqual(len(load_completed(self.output_path)), 19)
+
+        with self.assertLogs("utils.batch_runner", "WARNING"):
+            summary = self.run_batch()
+        self.assertEqual((summary.completed, summary.skipped), (1, 19))
+        records = self.read_records()
+        self.assertEqual(len(records), 20)
+        self.assertEqual({(r["prompt_id"], r["model_id"]) for r in records}, self.expected)
+        self.assertEqual(load_completed(self.output_path), self.expected)
+
+    def test_resume_skips_completed_pairs(self):
+        self.run_batch()
+        summary = self.run_batch()
+        self.assertEqual((summary.completed, summary.skipped), (0, 20))
+        self.assertEqual(len(self.read_records()), 20)
+
+if __name__ == "__main__":
+    unittest.main()
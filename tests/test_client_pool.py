@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from models.client_pool import ClientPool
+
+class FakeClient:
+
+    def __init__(self, name: str):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    async def aclose(self):
+        self.closed = True
+
+class ClientPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ClientPool()
+
+    def test_client_is_built_once_and_shared(self):
+        built = []
+
+        def factory():
+            built.append(FakeClient("a"))
+            return built[-1]
+
+        first = self.pool.get("openai", "k", factory)
+        self.assertIs(self.pool.get("openai", "k", factory), first)
+        self.assertEqual(len(built), 1)
+        [stats] = self.pool.stats()
+        self.assertEqual((stats.new_clients, stats.hits), (1, 1))
+        self.assertIsNotNone(stats.init_seconds)
+
+    def test_slow_factory_does_not_block_other_providers(self):
+        release = threading.Event()
+
+        def slow_factory():
+            release.wait(5)
+            return FakeClient("slow")
+
+        thread = threading.Thread(target=self.pool.get, args=("gemini", "k", slow_factory))
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        time.sleep(0.05)
+
+        start = time.perf_counter()
+        client = self.pool.get("openai", "k", lambda: FakeClient("fast"))
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(client.name, "fast")
+        # Cached clients and stats stay readable meanwhile too
+        self.assertIs(self.pool.get("openai", "k", lambda: FakeClient("other")), client)
+        self.assertEqual(len(self.pool.stats()), 2)
+
+        release.set()
+        thread.join()
+        self.assertEqual(self.pool.get("gemini", "k", lambda: FakeClient("other")).name, "slow")
+
+    def test_concurrent_builds_keep_the_first_client(self):
+        barrier = threading.Barrier(2)
+        built = []
+        results = []
+
+        def factory():
+            client = FakeClient(f"c{len(built)}")
+            built.append(client)
+            # Both callers are building at once
+            barrier.wait(5)
+            return client
+
+        threads = [threading.Thread(target=lambda: results.append(self.pool.get("openai", "k", factory)))
+                   for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(built), 2)
+        self.assertIs(results[0], results[1])
+        [loser] = [client for client in built if client is not results[0]]
+        self.assertTrue(loser.closed)
+        self.assertFalse(results[0].closed)
+        [stats] = self.pool.stats()
+        self.assertEqual((stats.new_clients, stats.hits), (1, 1))
+
+    def test_failed_factory_leaves_no_client(self):
+        def failing():
+            raise RuntimeError("no key")
+
+        with self.assertRaises(RuntimeError):
+            self.pool.get("openai", "k", failing)
+        self.assertEqual(self.pool.get("openai", "k", lambda: FakeClient("a")).name, "a")
+
+    def test_clear_closes_clients(self):
+        client = self.pool.get("openai", "k", lambda: FakeClient("a"))
+        self.pool.clear()
+        self.assertTrue(client.closed)
+        self.assertEqual(self.pool.stats(), [])
+
+    def test_loop_clients_are_per_loop_and_closed_on_shutdown(self):
+        async def get_twice():
+            loop = asyncio.get_running_loop()
+            first = self.pool.get_for_loop("openai:async", "k", loop, lambda: FakeClient("a"))
+            self.assertIs(self.pool.get_for_loop("openai:async", "k", loop, lambda: FakeClient("b")), first)
+            return first
+
+        first = asyncio.run(get_twice())
+        second = asyncio.run(get_twice())
+        self.assertIsNot(first, second)
+        self.assertTrue(first.closed and second.closed)
+        [stats] = self.pool.stats()
+        self.assertEqual((stats.new_clients, stats.hits), (2, 2))
+
+if __name__ == "__main__":
+    unittest.main()
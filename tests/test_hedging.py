@@ -0,0 +1,207 @@
+import threading
+import time
+import unittest
+
+from mock_providers.server import LatencyProfile
+from models.base import ModelResponse
+from models.cancellation import CancelScope, RequestCancelled, current_scope
+from models.model_factory import ModelFactory
+from utils.hedging import HedgePolicy
+from utils.metrics import MetricsRegistry
+from utils.parallel_executor import ParallelExecutor
+from utils.provider_scheduler import ProviderScheduler
+
+from support import MockProvidersTestCase
+
+class FixedDelay:
+    """Metrics stand-in giving every model the same hedge delay."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def quantile(self, *args, **kwargs):
+        return self.delay
+
+class FakeModel:
+    """A model whose nth request answers after delays[n] seconds, or fails if errors[n] is set."""
+
+    provider = "fake"
+    model_name = "fake-model"
+
+    def __init__(self, delays, errors=()):
+        self.delays = list(delays)
+        self.errors = list(errors) + [None] * len(self.delays)
+        self.calls = 0
+        self.cancelled = []
+        self.finished = []
+        self._lock = threading.Lock()
+
+    def generate_stream(self, prompt: str):
+        with self._lock:
+            attempt = self.calls
+            self.calls += 1
+        end = time.monotonic() + self.delays[attempt]
+        while time.monotonic() < end:
+            if current_scope().cancelled:
+                self.cancelled.append(attempt)
+                raise RequestCancelled(current_scope().reason)
+            time.sleep(0.005)
+        self.finished.append(attempt)
+        if self.errors[attempt]:
+            return ModelResponse(model_name=self.model_name, error=self.errors[attempt])
+        yield f"chunk from {attempt}"
+        return ModelResponse(model_name=self.model_name, text=f"attempt {attempt}",
+                             elapsed_time=self.delays[attempt], time_to_first_token=self.delays[attempt])
+
+class RaceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = HedgePolicy(metrics=FixedDelay(0.1), min_delay=0.1)
+
+    def slots_in_flight(self):
+        return [slots.in_flight for slots in self.policy.slots()]
+
+    def test_hedge_wins_and_the_primary_is_cancelled(self):
+        model = FakeModel([5.0, 0.05])
+        start = time.perf_counter()
+        response = self.policy.generate(model, "hi")
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+        self.assertEqual(response.text, "attempt 1")
+        self.assertTrue(response.hedged and response.hedge_won)
+        # Timings count from the first request's start
+        self.assertGreaterEqual(response.elapsed_time, 0.15)
+        self.assertIsNone(response.time_to_first_token)
+        self.assertEqual(self.slots_in_flight(), [0])
+        time.sleep(0.05)
+        self.assertEqual(model.cancelled, [0])
+
+    def test_primary_wins_and_the_hedge_is_cancelled(self):
+        model = FakeModel([0.3, 5.0])
+        response = self.policy.generate(model, "hi")
+        self.assertEqual(response.text, "attempt 0")
+        self.assertTrue(response.hedged)
+        self.assertFalse(response.hedge_won)
+        self.assertEqual(self.slots_in_flight(), [0])
+        time.sleep(0.05)
+        self.assertEqual(model.cancelled, [1])
+
+    def test_fast_request_is_not_hedged(self):
+        model = FakeModel([0.01])
+        response = self.policy.generate(model, "hi")
+        self.assertFalse(response.hedged)
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(self.slots_in_flight(), [])
+
+    def test_failed_primary_falls_back_to_the_hedge(self):
+        model = FakeModel([0.2, 0.3], errors=["boom"])
+        response = self.policy.generate(model, "hi")
+        self.assertEqual(response.text, "attempt 1")
+        self.assertTrue(response.hedge_won)
+        self.assertEqual(self.slots_in_flight(), [0])
+
+    def test_streaming_sends_only_the_winners_chunks(self):
+        model = FakeModel([5.0, 0.05])
+        chunks = []
+        response = self.policy.generate(model, "hi", on_chunk=chunks.append)
+        self.assertEqual(chunks, ["chunk from 1"])
+        self.assertTrue(response.hedge_won)
+        self.assertIsNotNone(response.time_to_first_token)
+        self.assertEqual(self.slots_in_flight(), [0])
+
+    def test_hedge_cap(self):
+        policy = HedgePolicy(metrics=FixedDelay(0.1), min_delay=0.1, default_limit=0)
+        response = policy.generate(FakeModel([0.3]), "hi")
+        self.assertFalse(response.hedged)
+
+    def test_cancelling_the_caller_cancels_every_attempt(self):
+        model = FakeModel([5.0, 5.0])
+        scope = CancelScope()
+        threading.Timer(0.3, scope.cancel).start()
+        with scope.activate():
+            response = self.policy.generate(model, "hi")
+        self.assertIsNotNone(response.error)
+        self.assertEqual(sorted(model.cancelled), [0, 1])
+        self.assertEqual(self.slots_in_flight(), [0])
+
+class SchedulerTest(unittest.TestCase):
+    """Hedges run in the provider's bulkhead."""
+
+    def setUp(self):
+        self.policy = HedgePolicy(metrics=FixedDelay(0.1), min_delay=0.1)
+
+    def run_through(self, scheduler, model):
+        executor = ParallelExecutor(scheduler=scheduler, hedge_policy=self.policy)
+        return executor.execute_parallel([model], "hi")[0]
+
+    def test_hedge_uses_a_bulkhead_worker(self):
+        scheduler = ProviderScheduler(limits={"fake": 2})
+        self.addCleanup(scheduler.shutdown)
+        response = self.run_through(scheduler, FakeModel([5.0, 0.05]))
+        self.assertTrue(response.hedge_won)
+        metrics = scheduler.metrics()[0]
+        # The comparison's own request and its hedge
+        self.assertEqual((metrics.completed, metrics.queued), (2, 0))
+
+    def test_queued_hedge_is_dropped_when_the_primary_wins(self):
+        scheduler = ProviderScheduler(limits={"fake": 1})
+        self.addCleanup(scheduler.shutdown)
+        model = FakeModel([0.3, 0.01])
+        response = self.run_through(scheduler, model)
+        self.assertEqual(response.text, "attempt 0")
+        self.assertEqual(model.calls, 1)
+        self.assertEqual([slots.in_flight for slots in self.policy.slots()], [0])
+        time.sleep(0.05)
+        metrics = scheduler.metrics()[0]
+        self.assertEqual((metrics.completed, metrics.queued, metrics.in_flight), (1, 0, 0))
+
+    def test_queued_hedge_does_not_block_a_failed_primary(self):
+        scheduler = ProviderScheduler(limits={"fake": 1})
+        self.addCleanup(scheduler.shutdown)
+        model = FakeModel([0.3], errors=["boom"])
+        start = time.perf_counter()
+        response = self.run_through(scheduler, model)
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(response.error, "boom")
+        self.assertEqual([slots.in_flight for slots in self.policy.slots()], [0])
+
+class HedgeDelayTest(unittest.TestCase):
+
+    def test_delay_ignores_failed_requests(self):
+        metrics = MetricsRegistry()
+        for _ in range(20):
+            metrics.record("fake", "fake-model", ModelResponse(model_name="fake-model", elapsed_time=2.0))
+            metrics.record("fake", "fake-model", ModelResponse(model_name="fake-model", elapsed_time=0.01,
+                                                                error="HTTP 500"))
+        policy = HedgePolicy(metrics=metrics, min_samples=20)
+        self.assertEqual(policy.delay(FakeModel([])), 2.0)
+        # The full history still includes the errors
+        self.assertLess(metrics.quantile("fake-model", "latency_seconds", 0.5), 2.0)
+
+    def test_too_few_successes_means_no_hedging(self):
+        metrics = MetricsRegistry()
+        for _ in range(30):
+            metrics.record("fake", "fake-model", ModelResponse(model_name="fake-model", elapsed_time=0.01,
+                                                                error="HTTP 500"))
+        self.assertIsNone(HedgePolicy(metrics=metrics, min_samples=20).delay(FakeModel([])))
+
+class MockProviderHedgeTest(MockProvidersTestCase):
+    """A losing request through a real SDK is aborted, not read to the end."""
+
+    profile = LatencyProfile(latency=0.05, tokens_per_second=20, reply_tokens=30)
+
+    def test_losing_request_is_aborted(self):
+        for provider, model_name in (("openai", "gpt-4o-mini"), ("claude", "claude-3-5-haiku-latest")):
+            with self.subTest(provider=provider):
+                policy = HedgePolicy(metrics=FixedDelay(0.25), min_delay=0.25)
+                model = ModelFactory.create_model(model_name, provider)
+                response = policy.generate(model, "hello")
+                self.assertIsNone(response.error)
+                self.assertTrue(response.hedged)
+                self.assertEqual([slots.in_flight for slots in policy.slots()], [0])
+                # Both requests stream for ~1.5s, 0.25s apart: read to the end, the loser would still be running
+                time.sleep(0.1)
+                self.assertEqual([t for t in threading.enumerate() if t.name == "hedged-request"], [])
+
+if __name__ == "__main__":
+    unittest.main()
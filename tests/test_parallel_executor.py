@@ -0,0 +1,147 @@
+import threading
+import time
+import unittest
+
+from models.base import ModelResponse
+from models.cancellation import CancelScope, current_scope
+from utils.parallel_executor import ParallelExecutor
+from utils.provider_scheduler import ProviderScheduler
+
+class SleepyModel:
+    """Answers after a delay, stopping early once the current scope is cancelled."""
+
+    provider = "fake"
+
+    def __init__(self, name: str, delay: float, tracker: "Tracker"):
+        self.model_name = name
+        self.delay = delay
+        self.tracker = tracker
+
+    def generate(self, prompt: str, on_chunk=None):
+        self.tracker.enter()
+        try:
+            end = time.monotonic() + self.delay
+            while time.monotonic() < end:
+                if current_scope().cancelled:
+                    self.tracker.cancelled.append(self.model_name)
+                    return ModelResponse(model_name=self.model_name, error=current_scope().reason)
+                time.sleep(0.005)
+            return ModelResponse(model_name=self.model_name, text=prompt)
+        finally:
+            self.tracker.leave()
+
+class Tracker:
+    """Counts requests in flight and the most seen at once."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.started = 0
+        self.cancelled = []
+
+    def enter(self):
+        with self.lock:
+            self.in_flight += 1
+            self.started += 1
+            self.peak = max(self.peak, self.in_flight)
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+class IterResultsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tracker = Tracker()
+        self.pulled = 0
+
+    def tasks(self, count: int, delay: float = 0.02):
+        for i in range(count):
+            self.pulled += 1
+            yield SleepyModel(f"m{i}", delay, self.tracker), f"prompt {i}"
+
+    def test_every_task_once_with_bounded_in_flight(self):
+        results = dict(ParallelExecutor(max_workers=16, metrics=None).iter_results(
+            self.tasks(50), max_in_flight=4
+        ))
+        self.assertEqual(sorted(results), list(range(50)))
+        self.assertTrue(all(results[i].text == f"prompt {i}" for i in range(50)))
+        self.assertLessEqual(self.tracker.peak, 4)
+        self.assertGreater(self.tracker.peak, 1)
+
+    def test_tasks_are_pulled_lazily(self):
+        results = ParallelExecutor(max_workers=16, metrics=None).iter_results(self.tasks(100), max_in_flight=3)
+        for _ in range(5):
+            next(results)
+            # A freed slot is refilled only when the next result is requested
+            self.assertLessEqual(self.pulled, 5 + 3)
+        results.close()
+
+    def test_cancelling_from_another_thread_stops_everything(self):
+        scope = CancelScope()
+        results = ParallelExecutor(max_workers=16, metrics=None).iter_results(
+            self.tasks(20, delay=5.0), max_in_flight=4, scope=scope
+        )
+        start = time.perf_counter()
+        threading.Timer(0.1, scope.cancel, args=("Stop",)).start()
+        errors = [response.error for _, response in results]
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(errors, ["Stop"] * 20)
+        time.sleep(0.1)
+        self.assertEqual(self.tracker.in_flight, 0)
+        # Tasks after the first four were never submitted
+        self.assertEqual(self.tracker.started, 4)
+
+    def test_closing_early_cancels_the_scope(self):
+        scope = CancelScope()
+        models = [SleepyModel("fast", 0.01, self.tracker)] + [
+            SleepyModel(f"slow{i}", 5.0, self.tracker) for i in range(3)
+        ]
+        results = ParallelExecutor(max_workers=8, metrics=None).iter_results(
+            ((model, "hi") for model in models), scope=scope
+        )
+        index, response = next(results)
+        self.assertEqual((index, response.text), (0, "hi"))
+        results.close()
+        self.assertEqual(scope.reason, "Cancelled")
+        time.sleep(0.1)
+        self.assertEqual(sorted(self.tracker.cancelled), ["slow0", "slow1", "slow2"])
+        self.assertEqual(self.tracker.in_flight, 0)
+
+    def test_deadline_reports_stragglers_and_unsubmitted_tasks(self):
+        scope = CancelScope(timeout=0.3)
+        models = [SleepyModel("fast", 0.01, self.tracker)] + [
+            SleepyModel(f"slow{i}", 5.0, self.tracker) for i in range(5)
+        ]
+        start = time.perf_counter()
+        results = list(ParallelExecutor(max_workers=8, metrics=None).iter_results(
+            ((model, "hi") for model in models), max_in_flight=3, scope=scope
+        ))
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+        self.assertEqual(sorted(index for index, _ in results), list(range(6)))
+        by_index = dict(results)
+        self.assertIsNone(by_index[0].error)
+        for index in range(1, 6):
+            self.assertEqual(by_index[index].error, "Deadline exceeded (0.3s)")
+        # Three slow requests filled the slots (one taking the fast one's); the last two never started
+        self.assertEqual(self.tracker.started, 4)
+        time.sleep(0.1)
+        self.assertEqual(self.tracker.in_flight, 0)
+
+    def test_scheduler_runs_tasks_in_provider_bulkheads(self):
+        scheduler = ProviderScheduler(limits={"fake": 2})
+        self.addCleanup(scheduler.shutdown)
+        results = dict(ParallelExecutor(scheduler=scheduler, metrics=None).iter_results(
+            self.tasks(10), max_in_flight=8
+        ))
+        self.assertEqual(len(results), 10)
+        self.assertLessEqual(self.tracker.peak, 2)
+
+    def test_invalid_max_in_flight(self):
+        with self.assertRaises(ValueError):
+            list(ParallelExecutor(metrics=None).iter_results(self.tasks(1), max_in_flight=0))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,274 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import mock
+
+import models.rate_limit as rate_limit
+from mock_providers.server import LatencyProfile
+from models.model_factory import ModelFactory
+from models.rate_limit import RateLimiter, TokenBucket, is_rate_limit_error, is_transient_error, rate_limiter
+
+from support import MockProvidersTestCase
+
+class FakeClock:
+    """Stands in for the time module so bucket refills can be stepped exactly."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+class ClockTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(rate_limit, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+class TokenBucketTest(ClockTestCase):
+
+    def test_unlimited_bucket_never_waits(self):
+        bucket = TokenBucket()
+        bucket.take(1e9)
+        self.assertEqual(bucket.wait_time(1e9), 0.0)
+        self.assertIsNone(bucket.level)
+
+    def test_refills_continuously_up_to_capacity(self):
+        bucket = TokenBucket(60)
+        self.assertEqual(bucket.wait_time(60), 0.0)
+        bucket.take(60)
+        # 60 per minute is one per second
+        self.assertAlmostEqual(bucket.wait_time(1), 1.0)
+        self.assertAlmostEqual(bucket.wait_time(10), 10.0)
+        self.clock.advance(4)
+        self.assertAlmostEqual(bucket.wait_time(10), 6.0)
+        self.clock.advance(600)
+        self.assertEqual(bucket.wait_time(60), 0.0)
+        bucket.give(100)
+        self.assertEqual(bucket.level, 60)
+
+    def test_debt_delays_later_requests(self):
+        bucket = TokenBucket(120)
+        bucket.take(180)
+        self.assertAlmostEqual(bucket.level, -60)
+        self.assertAlmostEqual(bucket.wait_time(1), 30.5)
+
+    def test_oversized_request_waits_for_a_full_bucket(self):
+        bucket = TokenBucket(60)
+        bucket.take(30)
+        self.assertAlmostEqual(bucket.wait_time(1000), 30.0)
+
+    def test_set_limit_and_sync_only_lower_the_level(self):
+        bucket = TokenBucket(100)
+        bucket.set_limit(50)
+        self.assertEqual((bucket.capacity, bucket.level), (50, 50))
+        bucket.sync(80)
+        self.assertEqual(bucket.level, 50)
+        bucket.sync(10)
+        self.assertEqual(bucket.level, 10)
+        bucket.set_limit(None)
+        self.assertIsNone(bucket.level)
+
+class HeaderParsingTest(unittest.TestCase):
+
+    def test_durations(self):
+        self.assertEqual(rate_limit._duration("1.5"), 1.5)
+        self.assertEqual(rate_limit._duration("20ms"), 0.02)
+        self.assertEqual(rate_limit._duration("6m0s"), 360.0)
+        self.assertEqual(rate_limit._duration("1h2m3.5s"), 3723.5)
+        self.assertIsNone(rate_limit._duration(""))
+        self.assertIsNone(rate_limit._duration("soon"))
+        self.assertIsNone(rate_limit._duration("5x"))
+
+    def test_rfc3339_reset_time(self):
+        reset_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+        seconds = rate_limit._duration(reset_at.isoformat().replace("+00:00", "Z"))
+        self.assertAlmostEqual(seconds, 30, delta=1)
+        self.assertEqual(rate_limit._duration("2000-01-01T00:00:00Z"), 0.0)
+
+    def test_retry_after(self):
+        self.assertEqual(rate_limit._retry_after({"retry-after-ms": "1500", "retry-after": "9"}), 1.5)
+        self.assertEqual(rate_limit._retry_after({"retry-after": "2"}), 2.0)
+        self.assertIsNone(rate_limit._retry_after({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}))
+        self.assertIsNone(rate_limit._retry_after(None))
+
+class ObserveTest(ClockTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.limiter = RateLimiter()
+        self.ticket, _ = self.limiter.reserve("openai", "gpt", 100)
+
+    def model_state(self):
+        return next(s for s in self.limiter.snapshot() if s.key == "openai/gpt")
+
+    def test_openai_headers(self):
+        self.limiter.observe(self.ticket, 200, {
+            "x-ratelimit-limit-requests": "500",
+            "x-ratelimit-remaining-requests": "499",
+            "x-ratelimit-reset-requests": "120ms",
+            "x-ratelimit-limit-tokens": "30000",
+            "x-ratelimit-remaining-tokens": "29000",
+            "x-ratelimit-reset-tokens": "2s",
+        })
+        state = self.model_state()
+        self.assertEqual((state.rpm, state.tpm), (500, 30000))
+        self.assertEqual((state.requests_available, state.tokens_available), (499, 29000))
+        self.assertEqual(state.blocked_for, 0.0)
+
+    def test_anthropic_headers_block_until_reset_when_exhausted(self):
+        reset_at = (datetime.now(timezone.utc) + timedelta(seconds=20)).isoformat()
+        self.limiter.observe(self.ticket, 200, {
+            "anthropic-ratelimit-requests-limit": "50",
+            "anthropic-ratelimit-requests-remaining": "0",
+            "anthropic-ratelimit-requests-reset": reset_at,
+            "anthropic-ratelimit-tokens-limit": "40000",
+            "anthropic-ratelimit-tokens-remaining": "39000",
+        })
+        state = self.model_state()
+        self.assertEqual((state.rpm, state.tpm), (50, 40000))
+        self.assertAlmostEqual(state.blocked_for, 20, delta=1)
+        ticket, wait = self.limiter.reserve("openai", "gpt", 100)
+        self.assertIsNone(ticket)
+        self.assertAlmostEqual(wait, 20, delta=1)
+
+    def test_429_counts_and_blocks_for_retry_after(self):
+        self.limiter.observe(self.ticket, 429, {"retry-after": "3"})
+        state = self.model_state()
+        self.assertEqual(state.rate_limited, 1)
+        self.assertEqual(state.blocked_for, 3.0)
+        self.clock.advance(3)
+        self.assertIsNotNone(self.limiter.reserve("openai", "gpt", 100)[0])
+
+    def test_response_hook_reports_to_the_tracked_ticket(self):
+        response = SimpleNamespace(status_code=200, headers={"x-ratelimit-limit-requests": "7"})
+        with mock.patch.object(rate_limit, "rate_limiter", self.limiter):
+            rate_limit.observe_response(response)
+            self.assertIsNone(self.model_state().rpm)
+            with self.limiter.track(self.ticket):
+                rate_limit.observe_response(response)
+        self.assertEqual(self.model_state().rpm, 7)
+
+class ReserveTest(ClockTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.limiter = RateLimiter()
+        self.limiter.configure(SimpleNamespace(
+            providers={"openai": SimpleNamespace(rpm=None, tpm=1000)},
+            models=[SimpleNamespace(provider="openai", model_id="gpt", rpm=2, tpm=None)]
+        ))
+
+    def test_both_buckets_gate_requests(self):
+        self.assertIsNotNone(self.limiter.reserve("openai", "gpt", 100)[0])
+        self.assertIsNotNone(self.limiter.reserve("openai", "gpt", 100)[0])
+        # The model allows 2 requests per minute, so the third waits 30s for one to refill
+        ticket, wait = self.limiter.reserve("openai", "gpt", 100)
+        self.assertIsNone(ticket)
+        self.assertAlmostEqual(wait, 30.0)
+        # Provider token bucket: 800 tokens left of 1000 per minute
+        ticket, wait = self.limiter.reserve("openai", "other", 900)
+        self.assertIsNone(ticket)
+        self.assertAlmostEqual(wait, 6.0)
+
+    def test_settle_returns_unused_estimate(self):
+        ticket, _ = self.limiter.reserve("openai", "gpt", 600)
+        self.assertIsNone(self.limiter.reserve("openai", "other", 600)[0])
+        self.limiter.settle(ticket, SimpleNamespace(total_tokens=100))
+        self.assertIsNotNone(self.limiter.reserve("openai", "other", 600)[0])
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+class APIConnectionError(Exception):
+    pass
+
+class APITimeoutError(APIConnectionError):
+    pass
+
+class BackoffTest(ClockTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.limiter = RateLimiter(max_retries=4, max_error_retries=2, base_backoff=1.0, max_backoff=5.0)
+
+    def ticket(self):
+        return self.limiter.reserve("openai", "gpt", 100)[0]
+
+    def test_error_classification(self):
+        self.assertTrue(is_rate_limit_error(StatusError(429)))
+        self.assertTrue(is_rate_limit_error(SimpleNamespace(code=429)))
+        for status in (408, 409, 500, 503):
+            self.assertTrue(is_transient_error(StatusError(status)))
+        for status in (400, 401, 404, 429):
+            self.assertFalse(is_transient_error(StatusError(status)))
+        self.assertTrue(is_transient_error(APITimeoutError()))
+        self.assertFalse(is_transient_error(ValueError()))
+
+    def test_retry_limits(self):
+        for error, retries in ((StatusError(429), 4), (StatusError(503), 2), (APIConnectionError(), 2),
+                               (StatusError(400), 0)):
+            delays = [self.limiter.backoff(self.ticket(), error, attempt) for attempt in range(6)]
+            self.assertEqual(sum(delay is not None for delay in delays), retries, error)
+            self.assertTrue(all(delay is None for delay in delays[retries:]), error)
+
+    def test_jittered_backoff_is_capped(self):
+        for attempt in range(4):
+            ceiling = min(5.0, 2 ** attempt)
+            delays = [self.limiter.backoff(self.ticket(), StatusError(429), attempt) for _ in range(200)]
+            self.assertTrue(all(0 <= delay <= ceiling for delay in delays))
+            # Full jitter: spread over the whole range, not clustered at the ceiling
+            self.assertLess(min(delays), ceiling * 0.25)
+            self.assertGreater(max(delays), ceiling * 0.75)
+
+    def test_only_rate_limits_honour_retry_after(self):
+        self.limiter.backoff(self.ticket(), StatusError(503, {"retry-after": "60"}), 0)
+        self.assertIsNotNone(self.limiter.reserve("openai", "gpt", 100)[0])
+        self.limiter.backoff(self.ticket(), StatusError(429, {"retry-after-ms": "2500"}), 0)
+        ticket, wait = self.limiter.reserve("openai", "gpt", 100)
+        self.assertIsNone(ticket)
+        self.assertAlmostEqual(wait, 2.5)
+
+    def test_failed_attempt_returns_its_tokens(self):
+        self.limiter.configure(SimpleNamespace(providers={}, models=[
+            SimpleNamespace(provider="openai", model_id="gpt", rpm=None, tpm=1000)
+        ]))
+        ticket = self.limiter.reserve("openai", "gpt", 1000)[0]
+        self.assertIsNone(self.limiter.reserve("openai", "gpt", 1000)[0])
+        self.limiter.backoff(ticket, StatusError(400), 0)
+        self.assertIsNotNone(self.limiter.reserve("openai", "gpt", 1000)[0])
+
+class SDKRetryTest(MockProvidersTestCase):
+    """Every retry goes through the limiter: SDK retries would show up as extra 429 responses."""
+
+    profile = LatencyProfile(error_rate=1.0, error_status=429)
+
+    def setUp(self):
+        patcher = mock.patch.object(rate_limiter, "base_backoff", 0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        rate_limiter.reset()
+        self.addCleanup(rate_limiter.reset)
+
+    def test_each_provider_makes_max_retries_plus_one_requests(self):
+        for provider, model_name in (("openai", "gpt-4o-mini"), ("claude", "claude-3-5-haiku-latest"),
+                                     ("grok", "grok-3-mini"), ("gemini", "gemini-2.0-flash")):
+            with self.subTest(provider=provider):
+                response = ModelFactory.create_model(model_name, provider).generate("Hello")
+                self.assertIsNotNone(response.error)
+                state = next(s for s in rate_limiter.snapshot() if s.key == f"{provider}/{model_name}")
+                self.assertEqual(state.retries, rate_limiter.max_retries)
+                if provider != "gemini":
+                    # google-genai has no response hook for rate-limit headers
+                    self.assertEqual(state.rate_limited, rate_limiter.max_retries + 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+from models.base import ModelResponse, TokenInfo
+from models.model_factory import ModelFactory
+from utils.response_cache import ResponseCache
+
+PROMPT = "Summarize the plot of the novel Moby Dick in three sentences for a student"
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = ResponseCache(os.path.join(directory.name, "responses.sqlite3"), ttl_seconds=60)
+
+    def age(self, key: str, seconds: float):
+        conn = self.cache._connection()
+        conn.execute("UPDATE responses SET created_at = created_at - ? WHERE key = ?", (seconds, key))
+        conn.commit()
+
+    def indexed_prompts(self) -> int:
+        return self.cache._connection().execute("SELECT COUNT(*) FROM prompts").fetchone()[0]
+
+    def test_find_similar_skips_expired_entries(self):
+        # The expired entry is the closer match, but get() would miss on it
+        self.cache.put("exact", {"text": "old"}, prompt=PROMPT)
+        self.cache.put("close", {"text": "new"}, prompt=PROMPT + " please")
+        self.age("exact", 120)
+
+        match = self.cache.find_similar(PROMPT, threshold=0.5)
+        self.assertEqual(match.key, "close")
+        self.assertEqual(self.cache.get(match.key), {"text": "new"})
+
+    def test_find_similar_prefers_closest_unexpired_entry(self):
+        self.cache.put("exact", {"text": "a"}, prompt=PROMPT)
+        self.cache.put("close", {"text": "b"}, prompt=PROMPT + " please")
+        self.assertEqual(self.cache.find_similar(PROMPT, threshold=0.5).key, "exact")
+
+    def test_prompts_indexed_only_when_matching_similar_prompts(self):
+        response = ModelResponse(model_name="gpt-4o-mini", text="Call me Ishmael.", token_info=TokenInfo())
+        plain = ModelFactory.create_model("gpt-4o-mini", "openai", cache=self.cache)
+        plain._store_response(PROMPT, response)
+        self.assertEqual(self.cache.stats()["entries"], 1)
+        self.assertEqual(self.indexed_prompts(), 0)
+
+        matching = ModelFactory.create_model("gpt-4o-mini", "openai", cache=self.cache, similarity_threshold=0.8)
+        matching._store_response(PROMPT + " please", response)
+        self.assertEqual(self.indexed_prompts(), 1)
+        self.assertIsNotNone(matching._cached_response(PROMPT + " please!"))
+
+if __name__ == "__main__":
+    unittest.main()
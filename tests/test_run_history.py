@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from models.base import ModelResponse
+from utils.run_history import ROLLUP_SECONDS, SCHEMA_VERSION, RunHistory
+
+def response(elapsed_time: float, error=None, cache_hit=False, cost=0.01) -> ModelResponse:
+    return ModelResponse(model_name="m", text=None if error else "ok", error=error, elapsed_time=elapsed_time,
+                         time_to_first_token=elapsed_time / 2, cache_hit=cache_hit, cost=cost)
+
+class RunHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "history.sqlite3")
+
+    def test_same_model_from_two_providers_is_kept_apart(self):
+        history = RunHistory(self.path)
+        for _ in range(3):
+            history.record("openai", "llama-3", response(1.0))
+        history.record("grok", "llama-3", response(4.0, cost=0.5))
+
+        self.assertEqual(history.models(), [("grok", "llama-3"), ("openai", "llama-3")])
+        points = {p.provider: p for p in history.trends()}
+        self.assertEqual(set(points), {"openai", "grok"})
+        self.assertEqual((points["openai"].requests, points["grok"].requests), (3, 1))
+        self.assertAlmostEqual(points["openai"].latency_mean, 1.0)
+        self.assertAlmostEqual(points["grok"].latency_p50, 4.0, delta=0.2)
+        self.assertAlmostEqual(points["grok"].cost, 0.5)
+
+    def test_errors_are_counted_but_kept_out_of_latency(self):
+        history = RunHistory(self.path)
+        for _ in range(4):
+            history.record("openai", "gpt-a", response(2.0))
+        # Fast failures, e.g. 429s, would otherwise pull the percentiles down
+        for _ in range(6):
+            history.record("openai", "gpt-a", response(0.05, error="HTTP 429"))
+        history.record("openai", "gpt-a", response(0.001, cache_hit=True))
+
+        [point] = history.trends()
+        self.assertEqual((point.requests, point.errors, point.cache_hits), (11, 6, 1))
+        self.assertAlmostEqual(point.error_rate, 6 / 11)
+        self.assertAlmostEqual(point.latency_mean, 2.0)
+        self.assertAlmostEqual(point.latency_p50, 2.0, delta=0.1)
+        self.assertAlmostEqual(point.ttft_p95, 1.0, delta=0.05)
+        # Failed requests are still billed
+        self.assertAlmostEqual(point.cost, 0.1)
+
+    def test_only_errors_means_no_latency(self):
+        history = RunHistory(self.path)
+        history.record("openai", "gpt-a", response(0.05, error="HTTP 500"))
+        [point] = history.trends()
+        self.assertEqual(point.errors, 1)
+        self.assertIsNone(point.latency_mean)
+        self.assertIsNone(point.latency_p50)
+
+    def create_version_1(self, bucket: int):
+        conn = sqlite3.connect(self.path)
+        conn.executescript(f"""
+            CREATE TABLE runs_hourly (
+                bucket INTEGER NOT NULL, model_id TEXT NOT NULL, provider TEXT NOT NULL,
+                requests INTEGER NOT NULL, errors INTEGER NOT NULL, cache_hits INTEGER NOT NULL,
+                latency_sum REAL NOT NULL, latency_count INTEGER NOT NULL,
+                ttft_sum REAL NOT NULL, ttft_count INTEGER NOT NULL,
+                tps_sum REAL NOT NULL, tps_count INTEGER NOT NULL,
+                output_tokens INTEGER NOT NULL, cost REAL NOT NULL,
+                PRIMARY KEY (bucket, model_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX idx_runs_hourly_model ON runs_hourly (model_id, bucket);
+            CREATE TABLE runs_hourly_bins (
+                bucket INTEGER NOT NULL, model_id TEXT NOT NULL, metric TEXT NOT NULL,
+                bin INTEGER NOT NULL, count INTEGER NOT NULL,
+                PRIMARY KEY (bucket, model_id, metric, bin)
+            ) WITHOUT ROWID;
+            INSERT INTO runs_hourly VALUES ({bucket}, 'gpt-a', 'openai', 2, 0, 0, 3.0, 2, 1.0, 2, 0, 0, 20, 0.2);
+            INSERT INTO runs_hourly_bins VALUES ({bucket}, 'gpt-a', 'latency', 8, 2);
+        """)
+        conn.close()
+
+    def test_version_1_rollups_are_migrated(self):
+        bucket = 1000 * ROLLUP_SECONDS
+        self.create_version_1(bucket)
+        history = RunHistory(self.path)
+        [point] = history.trends()
+        self.assertEqual((point.bucket_start, point.provider, point.requests), (bucket, "openai", 2))
+        self.assertAlmostEqual(point.latency_mean, 1.5)
+        self.assertIsNotNone(point.latency_p50)
+
+        # The same model ID from another provider now gets rows of its own
+        history.record("grok", "gpt-a", response(1.0))
+        self.assertEqual(history.models(), [("grok", "gpt-a"), ("openai", "gpt-a")])
+        conn = sqlite3.connect(self.path)
+        self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+        tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertEqual(tables, {"runs", "runs_hourly", "runs_hourly_bins"})
+        conn.close()
+
+        # Opening it again leaves it alone
+        self.assertEqual(len(RunHistory(self.path).trends()), 2)
+
+    def test_workers_opening_at_once_migrate_once(self):
+        self.create_version_1(1000 * ROLLUP_SECONDS)
+        errors = []
+
+        def open_history():
+            try:
+                RunHistory(self.path)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=open_history) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        [point] = RunHistory(self.path).trends()
+        self.assertEqual(point.requests, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,216 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from config.settings import ConfigManager, ConfigWatcher
+
+MODELS = [{"model_id": "gpt-a", "provider": "openai"}, {"model_id": "claude-b", "provider": "claude"}]
+
+class ConfigFilesTestCase(unittest.TestCase):
+    """A model and a provider config file in a temporary directory."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.config_file = os.path.join(directory.name, "models_config.json")
+        self.providers_file = os.path.join(directory.name, "providers_config.json")
+        self.write_models(MODELS)
+        self.calls = []
+
+    def write_models(self, models):
+        self.write_config(json.dumps(models))
+
+    def write_config(self, content: str):
+        # Replaced in one step, so a watcher never reads a half-written file
+        with open(self.config_file + ".tmp", 'w') as f:
+            f.write(content)
+        os.replace(self.config_file + ".tmp", self.config_file)
+
+    def touch(self, path: str):
+        """Bump a file's mtime without changing its content."""
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def create_manager(self, check_interval: float = 0.0) -> ConfigManager:
+        manager = ConfigManager(self.config_file, providers_file=self.providers_file,
+                                check_interval=check_interval)
+        manager.add_listener(self.calls.append)
+        # Parse both files once, as the app does on startup
+        manager.get_enabled_models()
+        manager.providers
+        return manager
+
+class RefreshTest(ConfigFilesTestCase):
+
+    def test_unchanged_files_do_not_reload(self):
+        manager = self.create_manager()
+        self.assertFalse(manager.refresh(force=True))
+        self.assertEqual((manager.version, self.calls), (0, []))
+
+    def test_changed_content_reloads_once(self):
+        manager = self.create_manager()
+        self.write_models(MODELS + [{"model_id": "grok-c", "provider": "grok"}])
+        self.assertTrue(manager.refresh(force=True))
+        self.assertFalse(manager.refresh(force=True))
+        self.assertEqual(manager.version, 1)
+        self.assertEqual(self.calls, [manager])
+        self.assertIsNotNone(manager.get_model_by_id("grok-c"))
+
+    def test_touched_file_with_same_content_is_not_reloaded(self):
+        manager = self.create_manager()
+        self.touch(self.config_file)
+        with mock.patch("config.settings.json.loads", wraps=json.loads) as loads:
+            self.assertFalse(manager.refresh(force=True))
+            # The new mtime is remembered, so the file is hashed once rather than on every check
+            with mock.patch("config.settings.hashlib.sha256") as sha256:
+                self.assertFalse(manager.refresh(force=True))
+                sha256.assert_not_called()
+        loads.assert_not_called()
+        self.assertEqual((manager.version, self.calls), (0, []))
+
+    def test_same_size_edit_is_detected_by_hash(self):
+        manager = self.create_manager()
+        self.write_models([{"model_id": "gpt-b", "provider": "openai"}, MODELS[1]])
+        self.touch(self.config_file)
+        self.assertTrue(manager.refresh(force=True))
+        self.assertEqual([m.model_id for m in manager.get_enabled_models()], ["gpt-b", "claude-b"])
+
+    def test_providers_file_created_later(self):
+        manager = self.create_manager()
+        self.assertEqual(manager.providers, {})
+        with open(self.providers_file, 'w') as f:
+            json.dump({"openai": {"max_concurrency": 2}}, f)
+        self.assertTrue(manager.refresh(force=True))
+        self.assertEqual(manager.get_provider_config("openai").max_concurrency, 2)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_checks_are_rate_limited(self):
+        manager = self.create_manager(check_interval=60.0)
+        # The first check stats the files and starts the interval
+        self.assertFalse(manager.refresh())
+        self.write_models(MODELS[:1])
+        self.assertFalse(manager.refresh())
+        self.assertEqual(len(manager.get_enabled_models()), 2)
+        self.assertTrue(manager.refresh(force=True))
+        self.assertEqual(len(manager.get_enabled_models()), 1)
+
+    def test_failing_listener_does_not_stop_the_others(self):
+        manager = self.create_manager()
+        failing = mock.Mock(side_effect=RuntimeError("boom"))
+        manager.add_listener(failing)
+        manager.add_listener(self.calls.append)
+        self.write_models(MODELS[:1])
+        with self.assertLogs("config.settings", "WARNING") as logs:
+            self.assertTrue(manager.refresh(force=True))
+        self.assertIn("Configuration listener failed: boom", logs.output[0])
+        failing.assert_called_once_with(manager)
+        self.assertEqual(self.calls, [manager, manager])
+
+class WatcherTest(ConfigFilesTestCase):
+
+    def wait_for(self, condition, timeout: float = 2.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_change_triggers_exactly_one_reload(self):
+        # The watcher checks regardless of check_interval
+        manager = self.create_manager(check_interval=60.0)
+        watcher = ConfigWatcher(manager, interval=0.02).start()
+        self.addCleanup(watcher.stop)
+        time.sleep(0.1)
+        self.assertEqual(self.calls, [])
+
+        self.write_models(MODELS[:1])
+        self.wait_for(lambda: self.calls)
+        # Several more polls see nothing new
+        time.sleep(0.1)
+        self.assertEqual(self.calls, [manager])
+        self.assertEqual(manager.version, 1)
+        self.assertEqual(len(manager.get_enabled_models()), 1)
+
+    def test_stop(self):
+        manager = self.create_manager()
+        watcher = ConfigWatcher(manager, interval=0.02).start()
+        watcher.stop()
+        watcher._thread.join(1.0)
+        self.assertFalse(watcher._thread.is_alive())
+        self.write_models(MODELS[:1])
+        time.sleep(0.1)
+        self.assertEqual(self.calls, [])
+
+    def test_broken_file_keeps_the_watcher_running(self):
+        manager = self.create_manager()
+        watcher = ConfigWatcher(manager, interval=0.02).start()
+        self.addCleanup(watcher.stop)
+        # A reload listener that reads the models fails on invalid JSON
+        manager.add_listener(lambda m: m.get_enabled_models())
+        with self.assertLogs("config.settings", "WARNING") as logs:
+            self.write_config("[{")
+            self.wait_for(lambda: logs.output)
+        self.assertIn("Invalid JSON", logs.output[0])
+        self.assertEqual(len(self.calls), 1)
+        self.write_models(MODELS[:1])
+        self.wait_for(lambda: len(self.calls) == 2)
+        self.assertEqual(len(self.calls), 2)
+        self.assertTrue(watcher._thread.is_alive())
+        self.assertEqual(len(manager.get_enabled_models()), 1)
+
+class WatchConfigNoticeTest(unittest.TestCase):
+    """LLMComparisonApp._watch_config, with and without st.fragment."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # main configures logging for the default config on import
+        with contextlib.redirect_stdout(io.StringIO()):
+            import main
+        cls.main = main
+
+    def render(self, st, session_version, config_version=1, apply=False):
+        st.session_state = {"config_version": session_version}
+        st.info = mock.Mock()
+        st.button = mock.Mock(return_value=apply)
+        st.rerun = mock.Mock()
+        app = SimpleNamespace(config_manager=SimpleNamespace(version=config_version))
+        with mock.patch.object(self.main, "st", st), \
+                mock.patch.dict(os.environ, {"CONFIG_WATCH_INTERVAL": "5"}):
+            self.main.LLMComparisonApp._watch_config(app)
+        return st
+
+    def test_fragment_polls_on_a_timer(self):
+        wrapped = []
+
+        def fragment(run_every):
+            def decorate(function):
+                wrapped.append((function.__name__, run_every))
+                return function
+            return decorate
+
+        st = self.render(SimpleNamespace(fragment=fragment), session_version=0)
+        self.assertEqual(wrapped, [("poll", 5.0)])
+        st.info.assert_called_once()
+        st.button.assert_called_once_with("Apply new configuration")
+
+    def test_without_fragment_the_notice_renders_inline(self):
+        st = self.render(SimpleNamespace(), session_version=0)
+        st.info.assert_called_once()
+        self.assertEqual(st.info.call_args.args[0], "🔄 The model configuration changed on disk.")
+
+    def test_no_notice_when_the_session_is_current(self):
+        st = self.render(SimpleNamespace(), session_version=1)
+        st.info.assert_not_called()
+        st.button.assert_not_called()
+
+    def test_apply_reruns(self):
+        st = self.render(SimpleNamespace(), session_version=0, apply=True)
+        st.rerun.assert_called_once_with()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from config.settings import ModelConfig
+from utils.distributed_run import DistributedRun
+from utils.work_queue import ShardQueue
+
+from support import MockProvidersTestCase
+
+PROMPTS = [(f"p{i}", f"Prompt number {i}") for i in range(5)]
+
+class ShardQueueTest(unittest.TestCase):
+    """Leases, fencing tokens and retries of the shard queue."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "queue.sqlite3")
+
+    def create(self, shard_size: int = 5, **kwargs) -> ShardQueue:
+        return ShardQueue.create(self.path, PROMPTS, shard_size, meta={"models": ["m"]}, **kwargs)
+
+    def test_shards_and_meta(self):
+        queue = self.create(shard_size=2)
+        self.assertEqual(queue.shard_ids(), [0, 1, 2])
+        self.assertEqual(queue.meta(), {"models": ["m"]})
+        shard = queue.claim("a")
+        self.assertEqual((shard.shard_id, shard.attempt), (0, 1))
+        self.assertEqual(shard.prompts, PROMPTS[:2])
+
+    def test_leased_shard_is_not_claimed_again(self):
+        queue = self.create()
+        self.assertIsNotNone(queue.claim("a"))
+        self.assertIsNone(queue.claim("b"))
+        status = queue.status()
+        self.assertEqual((status.leased, status.pending, status.expired), (1, 0, 0))
+        self.assertEqual(status.workers, ("a",))
+        self.assertFalse(status.finished)
+
+    def test_concurrent_claims_never_share_a_shard(self):
+        queue = self.create(shard_size=1)
+        claimed = []
+        lock = threading.Lock()
+
+        def worker(name):
+            while True:
+                shard = ShardQueue(self.path).claim(name)
+                if shard is None:
+                    return
+                with lock:
+                    claimed.append(shard.shard_id)
+
+        threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(claimed), list(range(len(PROMPTS))))
+
+    def test_expired_lease_is_reclaimed_and_fences_out_the_old_holder(self):
+        queue = self.create(lease_seconds=0.05)
+        first = queue.claim("a")
+        time.sleep(0.1)
+        self.assertEqual(queue.status().expired, 1)
+
+        second = queue.claim("b")
+        self.assertEqual((second.shard_id, second.attempt), (first.shard_id, 2))
+        self.assertNotEqual(second.lease_token, first.lease_token)
+
+        # The stale token can neither renew nor complete the shard
+        self.assertFalse(queue.renew(first))
+        self.assertFalse(queue.complete(first))
+        self.assertEqual(queue.status().leased, 1)
+        self.assertTrue(queue.complete(second))
+        status = queue.status()
+        self.assertEqual((status.done, status.leased), (1, 0))
+        self.assertTrue(status.finished)
+
+    def test_renew_keeps_the_lease(self):
+        queue = self.create(lease_seconds=0.2)
+        shard = queue.claim("a")
+        for _ in range(3):
+            time.sleep(0.1)
+            self.assertTrue(queue.renew(shard))
+        self.assertIsNone(queue.claim("b"))
+        self.assertTrue(queue.complete(shard))
+
+    def test_release_retries_until_max_attempts_then_retry_failed(self):
+        queue = self.create(max_attempts=2)
+        queue.release(queue.claim("a"), "boom")
+        self.assertEqual(queue.status().pending, 1)
+        shard = queue.claim("a")
+        self.assertEqual(shard.attempt, 2)
+        queue.release(shard, "boom again")
+
+        status = queue.status()
+        self.assertEqual((status.failed, status.pending), (1, 0))
+        self.assertTrue(status.finished)
+        self.assertIsNone(queue.claim("a"))
+        self.assertEqual(queue.errors(), [(0, "failed", "boom again")])
+
+        self.assertEqual(queue.retry_failed(), 1)
+        self.assertEqual(queue.claim("a").attempt, 1)
+
+    def test_expired_lease_on_last_attempt_fails_the_shard(self):
+        queue = self.create(lease_seconds=0.05, max_attempts=1)
+        shard = queue.claim("a")
+        time.sleep(0.1)
+        self.assertIsNone(queue.claim("b"))
+        self.assertEqual(queue.status().failed, 1)
+        self.assertFalse(queue.complete(shard))
+        self.assertEqual(queue.errors(), [(0, "failed", "Lease expired on every attempt")])
+
+class MergeTest(unittest.TestCase):
+    """merge() keeps one result per prompt × model pair across shard attempts."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.run_dir = directory.name
+        input_path = os.path.join(directory.name, "prompts.jsonl")
+        with open(input_path, 'w') as f:
+            for prompt_id, prompt in PROMPTS:
+                f.write(json.dumps({"id": prompt_id, "prompt": prompt}) + "\n")
+        self.run = DistributedRun.create(self.run_dir, input_path, ["m"], shard_size=5)
+
+    def write(self, attempt: int, records):
+        with open(self.run.attempt_path(0, attempt), 'w') as f:
+            for prompt_id, text, error in records:
+                f.write(json.dumps({"prompt_id": prompt_id, "model_id": "m", "text": text, "error": error}) + "\n")
+
+    def test_merge_drops_duplicates_and_prefers_successes(self):
+        self.write(1, [("p0", "first", None), ("p1", None, "timeout"), ("p2", "first", None)])
+        # A lost lease: the retry ran every pair again and left a partial last line
+        self.write(2, [("p0", "second", None), ("p1", "second", None), ("p2", None, "boom"),
+                       ("p3", "second", None), ("p4", None, "boom")])
+        with open(self.run.attempt_path(0, 2), 'a') as f:
+            f.write('{"prompt_id": "p4", "mod')
+
+        output = os.path.join(self.run_dir, "merged.jsonl")
+        summary = self.run.merge(output)
+        with open(output) as f:
+            merged = {record["prompt_id"]: record for record in map(json.loads, f)}
+
+        self.assertEqual((summary.records, summary.failed, summary.duplicates), (5, 1, 3))
+        self.assertEqual(summary.unfinished_shards, 1)
+        self.assertEqual(merged["p0"]["text"], "first")
+        self.assertEqual(merged["p1"]["text"], "second")
+        self.assertEqual(merged["p2"]["text"], "first")
+        self.assertEqual(merged["p4"]["error"], "boom")
+
+class DistributedWorkTest(MockProvidersTestCase):
+    """Workers sharing a run directory each pair exactly once."""
+
+    def test_two_workers(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        input_path = os.path.join(directory.name, "prompts.jsonl")
+        with open(input_path, 'w') as f:
+            for prompt_id, prompt in PROMPTS:
+                f.write(json.dumps({"id": prompt_id, "prompt": prompt}) + "\n")
+        configs = {
+            "gpt-a": ModelConfig("gpt-a", "openai", "A", cache=False),
+            "claude-b": ModelConfig("claude-b", "claude", "B", cache=False),
+        }
+        config_manager = SimpleNamespace(get_model_by_id=configs.get)
+        run_dir = os.path.join(directory.name, "run")
+        DistributedRun.create(run_dir, input_path, list(configs), shard_size=1)
+
+        summaries = []
+        workers = [
+            threading.Thread(target=lambda name=name: summaries.append(
+                DistributedRun(run_dir).work(config_manager, worker_id=name, poll_interval=0.05)
+            ))
+            for name in ("a", "b")
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(sum(summary.completed for summary in summaries), 10)
+        output = os.path.join(directory.name, "merged.jsonl")
+        summary = DistributedRun(run_dir).merge(output)
+        self.assertEqual((summary.records, summary.failed, summary.duplicates, summary.unfinished_shards),
+                         (10, 0, 0, 0))
+
+if __name__ == "__main__":
+    unittest.main()
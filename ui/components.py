@@ -1,5 +1,9 @@
+import html
+import time
+from collections import defaultdict
+from datetime import datetime
 import streamlit as st
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from config.settings import ModelConfig
 from models.base import ModelResponse
 
@@ -87,9 +91,28 @@ class ResponseDisplay:
     @staticmethod
     def _render_stats(response: ModelResponse):
         """Render response statistics."""
-        token_display = ResponseDisplay._format_token_info(response.token_info)
-        
-        st.caption(f"⏱️ {response.elapsed_time:.2f}s | {token_display}")
+        st.caption(ResponseDisplay._format_stats(response))
+    
+    @staticmethod
+    def _format_stats(response: ModelResponse) -> str:
+        """Format timing, throughput and token statistics for display."""
+        if response.similar_prompt is not None:
+            parts = [f"🔁 similar prompt ({response.similarity:.0%} match, originally "
+                     f"{response.original_elapsed_time:.2f}s)"]
+        elif response.cache_hit:
+            parts = [f"♻️ cached (originally {response.original_elapsed_time:.2f}s)"]
+        else:
+            parts = [f"⏱️ {response.elapsed_time:.2f}s"]
+        if response.time_to_first_token is not None:
+            parts.append(f"⚡ TTFT {response.time_to_first_token:.2f}s")
+        if response.tokens_per_second is not None:
+            parts.append(f"🚀 {response.tokens_per_second:.1f} tok/s")
+        if response.hedged:
+            parts.append("🔀 hedge won" if response.hedge_won else "🔀 hedged")
+        parts.append(ResponseDisplay._format_token_info(response.token_info))
+        if response.cost is not None:
+            parts.append(f"💵 ${response.cost:.4f}")
+        return " | ".join(parts)
     
     @staticmethod
     def _render_error_stats(response: ModelResponse):
@@ -99,15 +122,107 @@ class ResponseDisplay:
     @staticmethod
     def _format_token_info(token_info) -> str:
         """Format token information for display."""
-        if not token_info:
+        if not token_info or token_info.total_tokens is None:
             return "📊 Tokens: Not available"
         
-        if (token_info.total_tokens not in ['Not available', 'Error'] and 
-            isinstance(token_info.total_tokens, int)):
-            return (f"📊 Tokens: {token_info.input_tokens} in, "
-                   f"{token_info.output_tokens} out ({token_info.total_tokens} total)")
-        else:
-            return f"📊 Tokens: {token_info.total_tokens}"
+        text = (f"📊 Tokens: {token_info.input_tokens} in, "
+                f"{token_info.output_tokens} out ({token_info.total_tokens} total)")
+        if token_info.reasoning_tokens:
+            text += f", {token_info.reasoning_tokens} reasoning"
+        if token_info.cached_input_tokens:
+            text += f", {token_info.cached_input_tokens} cached"
+        if token_info.estimated:
+            text += " ≈ estimated"
+        return text
+
+class LiveResponseDisplay:
+    """Component that fills in model response columns as tokens and results arrive."""
+    
+    def __init__(self, model_names: List[str], refresh_interval: float = 0.1,
+                 waiting_message: str = "⏳ Waiting for first token...",
+                 on_fresh_call: Optional[Callable[[int], None]] = None):
+        """
+        Render one empty column per model.
+        
+        Args:
+            model_names: Display names, in column order
+            refresh_interval: Minimum seconds between redraws of a column
+            waiting_message: Caption shown until a column receives output
+            on_fresh_call: Called with a column's index when the user asks to call
+                a model whose response came from a similar prompt
+        """
+        self.model_names = model_names
+        self.on_fresh_call = on_fresh_call
+        self.refresh_interval = refresh_interval
+        self._buffers = [""] * len(model_names)
+        self._last_draw = [0.0] * len(model_names)
+        self._bodies = []
+        self._stats = []
+        
+        cols = st.columns(len(model_names)) if model_names else []
+        for col, name in zip(cols, model_names):
+            with col:
+                st.markdown(f"#### {name}")
+                self._bodies.append(st.empty())
+                self._stats.append(st.empty())
+        
+        for stats in self._stats:
+            stats.caption(waiting_message)
+    
+    def append(self, index: int, chunk: str):
+        """Append a streamed chunk to a column, redrawing at most every refresh_interval."""
+        self._buffers[index] += chunk
+        now = time.time()
+        if now - self._last_draw[index] >= self.refresh_interval:
+            self._last_draw[index] = now
+            self._draw_partial(index)
+    
+    def finalize(self, index: int, response: ModelResponse):
+        """Replace a column's partial output with the completed response."""
+        body = self._bodies[index]
+        if response.error and self._buffers[index]:
+            # Cut off mid-stream (e.g. by the deadline): keep the text received so far
+            self._draw_partial(index)
+            self._stats[index].caption(
+                f"⚠️ {response.error}; partial output after {response.elapsed_time:.2f} seconds"
+            )
+            return
+        if response.error:
+            body.error(f"Error: {response.error}")
+            self._stats[index].caption(f"⏱️ Time: {response.elapsed_time:.2f} seconds")
+            return
+        
+        body.text_area(
+            "Response:",
+            value=response.text,
+            height=200,
+            disabled=True,
+            key=f"response_{index}"
+        )
+        if response.similar_prompt is None:
+            self._stats[index].caption(ResponseDisplay._format_stats(response))
+            return
+        
+        with self._stats[index].container():
+            st.caption(ResponseDisplay._format_stats(response))
+            prompt = response.similar_prompt
+            st.caption(f"Answer to: “{prompt[:200] + '…' if len(prompt) > 200 else prompt}”")
+            if self.on_fresh_call is not None:
+                st.button(
+                    f"Call {self.model_names[index]} for this prompt",
+                    key=f"fresh_call_{index}",
+                    on_click=self.on_fresh_call,
+                    args=(index,)
+                )
+    
+    def _draw_partial(self, index: int):
+        """Draw the text received so far for a column."""
+        self._bodies[index].markdown(
+            f'<div class="response-container" style="white-space: pre-wrap;">'
+            f'{html.escape(self._buffers[index])}</div>',
+            unsafe_allow_html=True
+        )
+        self._stats[index].caption("✍️ Streaming...")
 
 class PromptInput:
     """Component for prompt input."""
@@ -131,6 +246,383 @@ class PromptInput:
             key="prompt_input",
             max_chars=50000
         )
+    
+    @staticmethod
+    def render_system_prompt(height: int = 120) -> str:
+        """
+        Render the system prompt text area, collapsed by default.
+        
+        Args:
+            height: Height of the text area
+            
+        Returns:
+            The entered system prompt, sent ahead of the prompt to every model
+        """
+        with st.expander("🧭 System prompt", expanded=False):
+            return st.text_area(
+                "Instructions sent to every model before the prompt:",
+                height=height,
+                placeholder="You are a helpful assistant...",
+                key="system_prompt_input",
+                max_chars=50000,
+                help="Sent unchanged on every call, so providers can serve it from their prompt caches."
+            )
+    
+    @staticmethod
+    def render_conversation(turns: int) -> bool:
+        """
+        Render the conversation status and a button to start over.
+        
+        Args:
+            turns: Number of earlier prompts in the conversation
+            
+        Returns:
+            True if the new conversation button was clicked
+        """
+        col1, col2 = st.columns([3, 1])
+        if turns:
+            col1.caption(f"💬 Continuing after {turns} earlier prompt(s); each model sees its own answers.")
+        else:
+            col1.caption("💬 New conversation: the next prompt starts it.")
+        return col2.button("New conversation", key="new_conversation", disabled=not turns)
+
+class ClientPoolPanel:
+    """Component for showing shared client pool statistics."""
+    
+    @staticmethod
+    def render(stats: List[Any]) -> bool:
+        """
+        Render pool statistics and a warmup button.
+        
+        Args:
+            stats: List of PoolStats snapshots
+            
+        Returns:
+            True if the warmup button was clicked
+        """
+        with st.expander("🔌 Connections", expanded=False):
+            if not stats:
+                st.caption("No provider clients created yet.")
+            for entry in stats:
+                connections = "n/a"
+                if entry.open_connections is not None:
+                    connections = f"{entry.open_connections} open, {entry.idle_connections} idle"
+                warmed = " · warmed" if entry.warmed_up else ""
+                st.caption(
+                    f"**{entry.provider}**: {entry.hits} hits, {entry.new_clients} new clients, "
+                    f"{connections}{warmed}"
+                )
+            return st.button("Warm up connections", key="warm_up_connections")
+
+class StartupPanel:
+    """Component for showing per-provider import and client initialization cost."""
+    
+    @staticmethod
+    def render(load_report: List[Any], pool_stats: List[Any]):
+        """
+        Render the startup cost report.
+        
+        Args:
+            load_report: List of ProviderLoadStats from ModelFactory.load_report()
+            pool_stats: List of PoolStats snapshots, for client init times
+        """
+        init_seconds = {}
+        for entry in pool_stats:
+            if entry.init_seconds is not None and ":" not in entry.provider:
+                init_seconds[entry.provider] = init_seconds.get(entry.provider, 0.0) + entry.init_seconds
+        
+        with st.expander("⏱️ Startup cost", expanded=False):
+            for entry in load_report:
+                if entry.error:
+                    st.caption(f"**{entry.provider}**: ⚠️ failed to load ({entry.error})")
+                    continue
+                if not entry.loaded:
+                    st.caption(f"**{entry.provider}**: not loaded (no model created yet)")
+                    continue
+                caption = f"**{entry.provider}**: import {entry.import_seconds:.2f}s"
+                if entry.provider in init_seconds:
+                    caption += f", client init {init_seconds[entry.provider]:.2f}s"
+                st.caption(caption)
+
+class BulkheadPanel:
+    """Component for showing per-provider queue depth and in-flight requests."""
+    
+    @staticmethod
+    def render(metrics: List[Any]):
+        """
+        Render per-provider scheduler metrics.
+        
+        Args:
+            metrics: List of BulkheadMetrics snapshots
+        """
+        with st.expander("🚦 Provider queues", expanded=False):
+            if not metrics:
+                st.caption("No requests scheduled yet.")
+            for entry in metrics:
+                st.caption(
+                    f"**{entry.provider}**: {entry.in_flight}/{entry.max_workers} in flight, "
+                    f"{entry.queued} queued, {entry.completed} done ({entry.failed} failed)"
+                )
+
+class RateLimitPanel:
+    """Component for showing rate-limit headroom per provider and model."""
+    
+    @staticmethod
+    def render(states: List[Any]):
+        """
+        Render rate limiter state.
+        
+        Args:
+            states: List of RateLimitState snapshots
+        """
+        with st.expander("🪣 Rate limits", expanded=False):
+            if not states:
+                st.caption("No requests sent yet.")
+            for state in states:
+                requests = RateLimitPanel._headroom(state.requests_available, state.rpm, "RPM")
+                tokens = RateLimitPanel._headroom(state.tokens_available, state.tpm, "TPM")
+                caption = f"**{state.key}**: {requests}, {tokens}"
+                if state.throttled or state.rate_limited:
+                    caption += f" · {state.throttled} throttled, {state.rate_limited}×429, {state.retries} retried"
+                if state.blocked_for > 0:
+                    caption += f" · ⏸️ {state.blocked_for:.1f}s"
+                st.caption(caption)
+    
+    @staticmethod
+    def _headroom(available: Any, limit: Any, unit: str) -> str:
+        if limit is None:
+            return f"{unit} unlimited"
+        return f"{max(available, 0):,.0f}/{limit:,.0f} {unit}"
+
+class MetricsPanel:
+    """Component for showing latency and throughput percentiles per model and provider."""
+    
+    @staticmethod
+    def render(summaries: List[Any], prometheus_text: str):
+        """
+        Render metrics tables and a Prometheus export download.
+        
+        Args:
+            summaries: List of MetricsSummary entries
+            prometheus_text: Registry contents in Prometheus text format
+        """
+        with st.expander("📊 Latency & Throughput Metrics", expanded=False):
+            if not summaries:
+                st.caption("No requests recorded yet.")
+                return
+            
+            for scope, title in (("model", "Per model"), ("provider", "Per provider")):
+                rows = [MetricsPanel._row(s) for s in summaries if s.scope == scope]
+                if rows:
+                    st.markdown(f"**{title}**")
+                    st.dataframe(rows, use_container_width=True, hide_index=True)
+            
+            st.download_button(
+                "Download Prometheus metrics",
+                data=prometheus_text,
+                file_name="llm_metrics.prom",
+                mime="text/plain"
+            )
+    
+    @staticmethod
+    def _row(summary) -> Dict[str, Any]:
+        """Flatten a MetricsSummary into a table row."""
+        fmt = lambda value, digits=2: None if value is None else round(value, digits)
+        row = {
+            "name": summary.name,
+            "requests": summary.requests,
+            "error rate": f"{summary.error_rate:.1%}",
+            "cached": summary.cache_hits,
+            "hedges": summary.hedges,
+            "hedge wins": summary.hedge_wins,
+            "p50 (s)": fmt(summary.latency_p50),
+            "p95 (s)": fmt(summary.latency_p95),
+            "p99 (s)": fmt(summary.latency_p99),
+            "TTFT p50 (s)": fmt(summary.ttft_p50),
+            "tok/s p50": fmt(summary.tokens_per_second_p50, 1),
+            "output tokens": summary.output_tokens,
+            "cost ($)": fmt(summary.cost, 4),
+        }
+        for phase, seconds in summary.phases_p50.items():
+            row[f"{phase} p50 (s)"] = fmt(seconds, 3)
+        return row
+
+class BenchmarkDisplay:
+    """Component for showing repeated-sampling latency distributions per model."""
+    
+    METRIC_LABELS = {"latency": "Latency (s)", "ttft": "TTFT (s)", "tokens_per_second": "Tokens/sec"}
+    
+    @staticmethod
+    def render(report):
+        """
+        Render per-metric statistics tables and significant pairwise differences.
+        
+        Args:
+            report: BenchmarkReport from LatencyBenchmark.run
+        """
+        st.caption(
+            f"{report.repetitions} repetitions per model after {report.warmup} warmup run(s), "
+            f"concurrency {report.concurrency}, {report.elapsed_time:.1f}s total"
+        )
+        
+        for metric, label in BenchmarkDisplay.METRIC_LABELS.items():
+            rows = []
+            for result in report.results:
+                stats = result.stats()[metric]
+                if stats is None:
+                    continue
+                rows.append({
+                    "model": result.model_name,
+                    "n": stats.n,
+                    "mean": round(stats.mean, 3),
+                    "95% CI": f"{stats.ci_low:.3f} – {stats.ci_high:.3f}",
+                    "stddev": round(stats.stddev, 3),
+                    "p50": round(stats.p50, 3),
+                    "p95": round(stats.p95, 3),
+                    "p99": round(stats.p99, 3),
+                    "errors": result.errors,
+                })
+            if rows:
+                st.markdown(f"**{label}**")
+                st.dataframe(rows, use_container_width=True, hide_index=True)
+        
+        significant = [c for c in report.comparisons if c.significant]
+        st.markdown(f"**Significant differences** (Mann-Whitney U, Holm-adjusted, α = {report.alpha})")
+        if not significant:
+            st.caption("No difference between models is statistically significant; try more repetitions.")
+        for c in significant:
+            label = BenchmarkDisplay.METRIC_LABELS[c.metric]
+            st.caption(
+                f"✅ {label}: **{c.better}** is better — {c.model_a} {c.mean_a:.3f} vs "
+                f"{c.model_b} {c.mean_b:.3f} (p = {c.p_value:.4f})"
+            )
+
+class HistoryDashboard:
+    """Component for showing latency, TTFT, error-rate and throughput trends from the run history."""
+    
+    RANGES = {"Last 24 hours": 1, "Last 7 days": 7, "Last 30 days": 30, "Last 90 days": 90}
+    BUCKETS = {"Hour": 3600, "Day": 86400}
+    CHARTS = (
+        ("Latency p50 (s)", "latency_p50"),
+        ("Latency p95 (s)", "latency_p95"),
+        ("TTFT p50 (s)", "ttft_p50"),
+        ("TTFT p95 (s)", "ttft_p95"),
+        ("Error rate", "error_rate"),
+        ("Output tokens/sec", "tokens_per_second"),
+    )
+    
+    @staticmethod
+    def render(history):
+        """
+        Render trend filters, per-model charts and recent requests.
+        
+        Args:
+            history: RunHistory to query
+        """
+        st.subheader("📈 Run History")
+        models = history.models()
+        stats = history.stats()
+        st.caption(f"{stats['requests']:,} requests recorded · {stats['bytes'] / 1e6:.1f} MB")
+        if not models:
+            st.info("No requests recorded yet. Run a comparison to start building history.")
+            return
+        
+        col1, col2, col3 = st.columns([1, 1, 3])
+        days = HistoryDashboard.RANGES[col1.selectbox("Range", list(HistoryDashboard.RANGES), index=1)]
+        bucket = HistoryDashboard.BUCKETS[
+            col2.selectbox("Bucket", list(HistoryDashboard.BUCKETS), index=0 if days <= 7 else 1)
+        ]
+        model_ids = list(dict.fromkeys(model_id for _, model_id in models))
+        selected = col3.multiselect("Models", model_ids, default=model_ids[:8])
+        
+        points = history.trends(selected, since=time.time() - days * 86400, bucket_seconds=bucket)
+        if not points:
+            st.caption("No requests for these models in the selected range.")
+            return
+        
+        # A model ID served by several providers is charted once per provider
+        providers = defaultdict(set)
+        for p in points:
+            providers[p.model_id].add(p.provider)
+        names = {
+            (p.model_id, p.provider): p.model_id if len(providers[p.model_id]) == 1 else f"{p.model_id} ({p.provider})"
+            for p in points
+        }
+        
+        for i in range(0, len(HistoryDashboard.CHARTS), 2):
+            for column, (label, field) in zip(st.columns(2), HistoryDashboard.CHARTS[i:i + 2]):
+                rows = [
+                    {"time": datetime.fromtimestamp(p.bucket_start), "model": names[(p.model_id, p.provider)],
+                     label: getattr(p, field)}
+                    for p in points if getattr(p, field) is not None
+                ]
+                with column:
+                    st.markdown(f"**{label}**")
+                    if rows:
+                        st.line_chart(rows, x="time", y=label, color="model")
+                    else:
+                        st.caption("No data.")
+        
+        with st.expander("Per-model totals", expanded=False):
+            totals: Dict[Tuple[str, str], Dict[str, Any]] = {}
+            for p in points:
+                row = totals.setdefault((p.model_id, p.provider), {
+                    "model": p.model_id, "provider": p.provider, "requests": 0, "errors": 0,
+                    "cached": 0, "output tokens": 0, "cost ($)": 0.0
+                })
+                row["requests"] += p.requests
+                row["errors"] += p.errors
+                row["cached"] += p.cache_hits
+                row["output tokens"] += p.output_tokens
+                row["cost ($)"] = round(row["cost ($)"] + p.cost, 4)
+            st.dataframe(list(totals.values()), use_container_width=True, hide_index=True)
+        
+        with st.expander("Recent requests", expanded=False):
+            model_id = selected[0] if len(selected) == 1 else None
+            rows = history.recent(model_id, limit=200)
+            for row in rows:
+                row["created_at"] = datetime.fromtimestamp(row.pop("created_at")).strftime("%Y-%m-%d %H:%M:%S")
+                row.pop("id", None)
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+
+class AgreementDisplay:
+    """Component for showing how similar the models' responses are to each other."""
+    
+    @staticmethod
+    def render(report):
+        """
+        Render the pairwise similarity heatmap and the least-agreeing responses.
+        
+        Args:
+            report: AgreementReport from AgreementEngine.compare
+        """
+        import altair as alt
+        
+        with st.expander("🤝 Response Agreement", expanded=False):
+            cells = [
+                {"model": a, "compared with": b, "similarity": round(value, 3)}
+                for a, row in zip(report.models, report.mean_matrix)
+                for b, value in zip(report.models, row)
+                if value is not None
+            ]
+            if not cells:
+                st.caption("Needs at least two successful responses.")
+                return
+            
+            chart = alt.Chart(alt.Data(values=cells)).mark_rect().encode(
+                x=alt.X("compared with:N", sort=report.models),
+                y=alt.Y("model:N", sort=report.models),
+                color=alt.Color("similarity:Q", scale=alt.Scale(domain=[0, 1], scheme="viridis")),
+                tooltip=["model:N", "compared with:N", "similarity:Q"]
+            )
+            st.altair_chart(chart, use_container_width=True)
+            st.caption("Cosine similarity of character n-gram TF-IDF vectors; 1.0 is identical text.")
+            
+            for outlier in report.outliers:
+                st.caption(
+                    f"⚠️ **{outlier.model}** differs most from the others: {outlier.agreement:.2f} "
+                    f"vs a typical {outlier.prompt_median:.2f}"
+                )
 
 class CustomCSS:
     """Component for rendering custom CSS styles."""
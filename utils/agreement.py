@@ -0,0 +1,353 @@
+import logging
+import math
+import statistics
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Matrix of pairwise similarities between the models' responses to one prompt; None where a response is missing
+Matrix = List[List[Optional[float]]]
+
+# 32-bit FNV-1a n-gram hashes, spread over the feature space by Fibonacci hashing
+_FNV_OFFSET = 2166136261
+_FNV_PRIME = 16777619
+_FIBONACCI = 2654435769
+_MASK32 = (1 << 32) - 1
+
+@dataclass
+class Outlier:
+    """A response that agrees with the other models much less than is typical for its prompt."""
+    prompt_id: str
+    model: str
+    # Mean similarity of this response to the other responses
+    agreement: float
+    # Median of that mean over all responses to the prompt
+    prompt_median: float
+    gap: float
+
+@dataclass
+class AgreementReport:
+    """Pairwise response similarity for every prompt, with aggregates over all prompts."""
+    models: List[str]
+    prompt_ids: List[str]
+    similarity: List[Matrix]
+    # Mean similarity of each model pair over prompts both answered: the agreement heatmap
+    mean_matrix: Matrix = field(default_factory=list)
+    # Mean similarity of each model to all others
+    model_agreement: Dict[str, Optional[float]] = field(default_factory=dict)
+    outliers: List[Outlier] = field(default_factory=list)
+    # Prompts with the lowest mean pairwise similarity, as (prompt_id, mean similarity)
+    divergent_prompts: List[Tuple[str, float]] = field(default_factory=list)
+
+class AgreementEngine:
+    """
+    Measures how far models' responses to the same prompts diverge.
+
+    Responses are lowercased, whitespace-collapsed and turned into hashed
+    character n-gram TF-IDF vectors (sublinear term frequency, IDF from up to
+    idf_sample prompts' responses), and each prompt gets the cosine
+    similarity matrix of its responses. With NumPy installed, n-gram hashing,
+    counting and the pairwise dot products run as whole-array operations over
+    chunks of prompts, so 10k prompts × 11 models take seconds; without it a
+    pure Python fallback computes the same result, suited to a few prompts.
+    Each extra n-gram length adds about as much work as the first.
+    """
+
+    def __init__(self, ngram_range: Tuple[int, int] = (4, 4), hash_bits: int = 20, max_chars: int = 4000,
+                 chunk_size: int = 100, idf_sample: int = 2000, max_dense_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            ngram_range: Smallest and largest character n-gram length
+            hash_bits: log2 of the hashed feature space size
+            max_chars: Characters of each response considered
+            chunk_size: Prompts processed per batch, bounding memory use
+            idf_sample: Prompts (evenly spaced) whose responses document frequencies are taken from
+            max_dense_bytes: Size limit of the dense tensors used for the pairwise products
+        """
+        self.ngram_range = ngram_range
+        self.hash_bits = hash_bits
+        self.max_chars = max_chars
+        self.chunk_size = chunk_size
+        self.idf_sample = idf_sample
+        self.max_dense_bytes = max_dense_bytes
+
+    def compare(self, responses: Sequence[Sequence[Optional[str]]], models: Sequence[str],
+                prompt_ids: Optional[Sequence[str]] = None, outlier_limit: int = 20,
+                min_models: int = 3) -> AgreementReport:
+        """
+        Compute similarity matrices and aggregates.
+
+        Args:
+            responses: One row per prompt with one response text per model, None if missing or failed
+            models: Model names, in column order
+            prompt_ids: Prompt IDs, in row order (default: row numbers)
+            outlier_limit: Maximum outliers and divergent prompts reported
+            min_models: Responses a prompt needs before it can have outliers
+
+        Returns:
+            AgreementReport
+        """
+        models = list(models)
+        prompt_ids = [str(i) for i in range(len(responses))] if prompt_ids is None else list(prompt_ids)
+        texts = [[self._normalize(text) for text in row] for row in responses]
+        if any(len(row) != len(models) for row in texts):
+            raise ValueError("Every row needs one response per model")
+
+        if np is not None:
+            similarity = self._similarity_numpy(texts, len(models))
+        else:
+            logger.info("NumPy is not installed; computing response agreement in pure Python")
+            similarity = self._similarity_python(texts)
+
+        report = AgreementReport(models=models, prompt_ids=prompt_ids, similarity=similarity)
+        self._aggregate(report, outlier_limit, min_models)
+        return report
+
+    def _normalize(self, text: Optional[str]) -> Optional[str]:
+        """
+        Lower-case and collapse whitespace, then pad with boundary spaces.
+
+        As with char_wb n-grams, the padding gives the text's first and last
+        characters their own n-grams, and padding to the shortest n-gram
+        length gives answers like "B" or "42" a feature, so identical short
+        answers agree instead of scoring 0.
+        """
+        if not text:
+            return None
+        text = " ".join(text.lower().split())[:self.max_chars]
+        if not text:
+            return None
+        return f" {text} ".ljust(self.ngram_range[0])
+
+    def _similarity_numpy(self, texts: List[List[Optional[str]]], k: int) -> List[Matrix]:
+        """Cosine similarity matrices, computed chunk by chunk with array operations."""
+        size = 1 << self.hash_bits
+        model_bits = max(1, (k - 1).bit_length())
+        chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+
+        # First pass: in how many responses does each feature occur, over an evenly spaced sample of prompts
+        step = max(1, math.ceil(len(texts) / self.idf_sample))
+        sample = texts[::step]
+        df = np.zeros(size, dtype=np.int64)
+        for i in range(0, len(sample), self.chunk_size):
+            keys, _ = self._counts(sample[i:i + self.chunk_size], k)
+            df += np.bincount((keys >> model_bits) & (size - 1), minlength=size)
+        n_docs = sum(text is not None for row in sample for text in row)
+        idf = (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+
+        similarity = []
+        for chunk in chunks:
+            keys, counts = self._counts(chunk, k)
+            local = keys & ((1 << model_bits) - 1)
+            prompt = keys >> (model_bits + self.hash_bits)
+            weights = (1 + np.log(counts, dtype=np.float32)) * idf[(keys >> model_bits) & (size - 1)]
+
+            # L2-normalize each response vector
+            doc = prompt * k + local
+            norms = np.sqrt(np.bincount(doc, weights=weights ** 2, minlength=len(chunk) * k))
+            weights = weights / norms[doc].astype(np.float32)
+
+            # Keys are sorted by (prompt, feature, model), so responses sharing a feature are
+            # adjacent; features only one response has contribute nothing to the dot products
+            group = keys >> model_bits
+            shared = np.zeros(len(group), dtype=bool)
+            shared[1:] = group[1:] == group[:-1]
+            shared[:-1] |= shared[1:]
+            group, local, prompt, weights = group[shared], local[shared], prompt[shared], weights[shared]
+
+            matrices = np.zeros((len(chunk), k, k), dtype=np.float32)
+            if len(group):
+                self._gram(matrices, group, local, prompt, weights)
+            matrices[:, np.arange(k), np.arange(k)] = 1.0
+            present = np.array([[text is not None for text in row] for row in chunk], dtype=bool)
+            matrices[~present[:, :, None] | ~present[:, None, :]] = np.nan
+            similarity.extend(
+                [[None if math.isnan(v) else min(v, 1.0) for v in r] for r in m]
+                for m in matrices.tolist()
+            )
+        return similarity
+
+    def _gram(self, matrices, group, local, prompt, weights):
+        """
+        Fill each prompt's k × k matrix with the dot products of its responses.
+
+        Each prompt's shared features are numbered from 0 and the responses
+        scattered into a dense (prompts, k, features) tensor, so one batched
+        matrix product covers many prompts; prompts are batched so the tensor
+        stays under max_dense_bytes.
+        """
+        k = matrices.shape[1]
+        new = np.empty(len(group), dtype=bool)
+        new[0] = True
+        new[1:] = group[1:] != group[:-1]
+        feature_id = np.cumsum(new) - 1
+        columns = np.bincount(prompt[new], minlength=len(matrices))
+        first_feature = np.concatenate(([0], np.cumsum(columns)[:-1]))
+        column = feature_id - first_feature[prompt]
+        bounds = np.searchsorted(prompt, np.arange(len(matrices) + 1))
+
+        start = 0
+        while start < len(matrices):
+            # Grow the batch while prompts × widest prompt fits the budget
+            end, width = start, 0
+            while end < len(matrices):
+                width_next = max(width, int(columns[end]), 1)
+                if end > start and (end + 1 - start) * k * width_next * 4 > self.max_dense_bytes:
+                    break
+                width = width_next
+                end += 1
+            lo, hi = bounds[start], bounds[end]
+            dense = np.zeros((end - start, k, width), dtype=np.float32)
+            dense[prompt[lo:hi] - start, local[lo:hi], column[lo:hi]] = weights[lo:hi]
+            matrices[start:end] = dense @ dense.transpose(0, 2, 1)
+            start = end
+
+    def _counts(self, chunk: List[List[Optional[str]]], k: int):
+        """
+        Hashed n-gram counts of a chunk's responses.
+
+        Returns:
+            Sorted unique keys (prompt, feature and model index packed into bit fields) and their counts
+        """
+        model_bits = max(1, (k - 1).bit_length())
+        docs = [((p << (self.hash_bits + model_bits)) | m, text.encode("utf-8")) for p, row in enumerate(chunk)
+                for m, text in enumerate(row) if text is not None]
+        if not docs:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        data = np.frombuffer(b"".join(text for _, text in docs), dtype=np.uint8).astype(np.uint32)
+        lengths = np.array([len(text) for _, text in docs])
+        owner = np.repeat(np.array([d for d, _ in docs], dtype=np.int64), lengths)
+
+        keys = []
+        with np.errstate(over="ignore"):
+            # FNV-1a is computed byte by byte, so each n-gram's hash extends the (n-1)-gram's
+            h = np.full(len(data), _FNV_OFFSET, dtype=np.uint32)
+            for n in range(1, self.ngram_range[1] + 1):
+                if len(data) < n:
+                    break
+                h = (h[:len(data) - n + 1] ^ data[n - 1:]) * np.uint32(_FNV_PRIME)
+                if n < self.ngram_range[0]:
+                    continue
+                starts = owner[:len(h)]
+                valid = starts == owner[n - 1:]
+                feature = ((h[valid] * np.uint32(_FIBONACCI)) >> np.uint32(32 - self.hash_bits)).astype(np.int64)
+                keys.append(starts[valid] | (feature << model_bits))
+        if not keys:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(keys), return_counts=True)
+
+    def _features_python(self, text: str) -> Dict[int, int]:
+        """Hashed n-gram counts of one response, matching the NumPy path."""
+        data = text.encode("utf-8")
+        counts: Dict[int, int] = {}
+        for start in range(len(data)):
+            h = _FNV_OFFSET
+            for n, byte in enumerate(data[start:start + self.ngram_range[1]], 1):
+                h = ((h ^ byte) * _FNV_PRIME) & _MASK32
+                if n >= self.ngram_range[0]:
+                    feature = ((h * _FIBONACCI) & _MASK32) >> (32 - self.hash_bits)
+                    counts[feature] = counts.get(feature, 0) + 1
+        return counts
+
+    def _similarity_python(self, texts: List[List[Optional[str]]]) -> List[Matrix]:
+        """Cosine similarity matrices, one response at a time."""
+        features = [[self._features_python(text) if text is not None else None for text in row] for row in texts]
+        df: Dict[int, int] = {}
+        n_docs = 0
+        for row in features:
+            for counts in row:
+                if counts is None:
+                    continue
+                n_docs += 1
+                for feature in counts:
+                    df[feature] = df.get(feature, 0) + 1
+
+        similarity = []
+        for row in features:
+            vectors = []
+            for counts in row:
+                if counts is None:
+                    vectors.append(None)
+                    continue
+                vector = {
+                    f: (1 + math.log(c)) * (math.log((1 + n_docs) / (1 + df[f])) + 1) for f, c in counts.items()
+                }
+                norm = math.sqrt(sum(w * w for w in vector.values()))
+                vectors.append({f: w / norm for f, w in vector.items()})
+            similarity.append([
+                [
+                    None if a is None or b is None else
+                    1.0 if i == j else min(1.0, sum(w * b.get(f, 0.0) for f, w in a.items()))
+                    for j, b in enumerate(vectors)
+                ]
+                for i, a in enumerate(vectors)
+            ])
+        return similarity
+
+    @staticmethod
+    def _aggregate(report: AgreementReport, outlier_limit: int, min_models: int):
+        """Fill in the heatmap, per-model agreement, outliers and divergent prompts."""
+        k = len(report.models)
+        sums = [[0.0] * k for _ in range(k)]
+        counts = [[0] * k for _ in range(k)]
+        outliers = []
+        divergent = []
+
+        for prompt_id, matrix in zip(report.prompt_ids, report.similarity):
+            for i in range(k):
+                for j in range(k):
+                    if matrix[i][j] is not None:
+                        sums[i][j] += matrix[i][j]
+                        counts[i][j] += 1
+
+            present = [i for i in range(k) if matrix[i][i] is not None]
+            if len(present) < 2:
+                continue
+            means = {
+                i: statistics.fmean(matrix[i][j] for j in present if j != i) for i in present
+            }
+            divergent.append((prompt_id, statistics.fmean(means.values())))
+            if len(present) < min_models:
+                continue
+            median = statistics.median(means.values())
+            for i, agreement in means.items():
+                if agreement < median:
+                    outliers.append(Outlier(prompt_id, report.models[i], agreement, median, median - agreement))
+
+        report.mean_matrix = [
+            [sums[i][j] / counts[i][j] if counts[i][j] else None for j in range(k)] for i in range(k)
+        ]
+        for i, model in enumerate(report.models):
+            values = [report.mean_matrix[i][j] for j in range(k) if j != i and report.mean_matrix[i][j] is not None]
+            report.model_agreement[model] = statistics.fmean(values) if values else None
+        report.outliers = sorted(outliers, key=lambda o: o.gap, reverse=True)[:outlier_limit]
+        report.divergent_prompts = sorted(divergent, key=lambda item: item[1])[:outlier_limit]
+
+def responses_by_prompt(records: Iterable[Dict]) -> Tuple[List[str], List[str], List[List[Optional[str]]]]:
+    """
+    Arrange batch result records into a prompt × model table of response texts.
+
+    Records without text (errors) are left as None. When a pair appears more
+    than once, as after --retry-errors, the last successful record wins.
+
+    Returns:
+        (prompt IDs, model IDs, rows of response texts)
+    """
+    prompt_index: Dict[str, int] = {}
+    model_index: Dict[str, int] = {}
+    cells: Dict[Tuple[int, int], str] = {}
+    for record in records:
+        p = prompt_index.setdefault(str(record["prompt_id"]), len(prompt_index))
+        m = model_index.setdefault(record["model_id"], len(model_index))
+        if record.get("text") and not record.get("error"):
+            cells[(p, m)] = record["text"]
+
+    rows = [[cells.get((p, m)) for m in range(len(model_index))] for p in range(len(prompt_index))]
+    return list(prompt_index), list(model_index), rows
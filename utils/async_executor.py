@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import threading
+from typing import List, Any, Tuple, Iterable
+
+from .metrics import metrics_registry
+from .parallel_executor import create_error_response
+
+logger = logging.getLogger(__name__)
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the process-wide event loop used for synchronous callers.
+
+    Keeping one long-lived loop lets the pooled async clients, which are bound
+    to the loop that created them, keep their connections across calls.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-executor-loop", daemon=True).start()
+        return _loop
+
+class AsyncExecutor:
+    """Executes model generation requests concurrently on a single asyncio event loop."""
+
+    def __init__(self, max_concurrency: int = 100, metrics=metrics_registry):
+        """
+        Initialize the async executor.
+
+        Args:
+            max_concurrency: Maximum number of requests in flight at once
+            metrics: MetricsRegistry each response is recorded in, or None
+        """
+        self.max_concurrency = max_concurrency
+        self.metrics = metrics
+
+    def execute_parallel(self, models: List[Any], prompt: str) -> List[Any]:
+        """
+        Execute model generation requests concurrently from synchronous code.
+
+        Args:
+            models: List of model instances with agenerate() method
+            prompt: The prompt to send to all models
+
+        Returns:
+            List of ModelResponse objects in the same order as input models
+        """
+        return self.execute_tasks([(model, prompt) for model in models])
+
+    def execute_tasks(self, tasks: Iterable[Tuple[Any, str]]) -> List[Any]:
+        """
+        Execute (model, prompt) pairs concurrently from synchronous code.
+
+        Args:
+            tasks: Iterable of (model instance, prompt) pairs
+
+        Returns:
+            List of ModelResponse objects in the same order as the tasks
+        """
+        future = asyncio.run_coroutine_threadsafe(self.aexecute_tasks(tasks), _background_loop())
+        return future.result()
+
+    async def aexecute_parallel(self, models: List[Any], prompt: str) -> List[Any]:
+        """Async variant of execute_parallel for callers already running an event loop."""
+        return await self.aexecute_tasks([(model, prompt) for model in models])
+
+    async def aexecute_tasks(self, tasks: Iterable[Tuple[Any, str]]) -> List[Any]:
+        """
+        Execute (model, prompt) pairs concurrently, capped at max_concurrency.
+
+        Args:
+            tasks: Iterable of (model instance, prompt) pairs
+
+        Returns:
+            List of ModelResponse objects in the same order as the tasks
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(index: int, model, prompt: str):
+            async with semaphore:
+                try:
+                    result = await model.agenerate(prompt)
+                    logger.debug(f"Completed request for model at index {index}")
+                except Exception as e:
+                    logger.error(f"Error in model at index {index}: {e}")
+                    result = create_error_response(model.model_name, str(e))
+            if self.metrics is not None:
+                self.metrics.record_model(model, result)
+            return result
+
+        return await asyncio.gather(*(
+            run(i, model, prompt) for i, (model, prompt) in enumerate(tasks)
+        ))
\ No newline at end of file
@@ -0,0 +1,369 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json
+import logging
+import os
+import time
+
+from models.base import ModelResponse, TokenInfo
+from models.model_factory import ModelFactory
+from .batch_runner import (
+    BatchRunner, BatchSummary, BatchTask, load_completed, open_for_append, read_prompts, result_record
+)
+from .metrics import metrics_registry
+from .parallel_executor import create_error_response
+
+logger = logging.getLogger(__name__)
+
+# Both batch APIs bill at half the synchronous price
+BATCH_PRICE_FACTOR = 0.5
+
+# Model clients are built without SDK retries (the rate limiter owns those); batch
+# uploads, polls and downloads have no rate limiter, so they get the SDK default back
+BATCH_CLIENT_RETRIES = 2
+
+# (custom_id, text, token_info, error) for one request in a finished batch
+BatchResult = Tuple[str, Optional[str], Optional[TokenInfo], Optional[str]]
+
+class OpenAIBatchBackend:
+    """Submits chat completions through the OpenAI Batch API."""
+
+    provider = "openai"
+    max_requests = 50000
+    # The Batch API accepts requests for a single model per input file
+    one_model_per_batch = True
+
+    def __init__(self, client):
+        self.client = client.with_options(max_retries=BATCH_CLIENT_RETRIES)
+
+    def submit(self, entries: List[Tuple[str, Any, str]]) -> str:
+        """Upload (custom_id, model, prompt) entries as a JSONL file and create a batch."""
+        lines = [
+            json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": model._build_request(prompt),
+            })
+            for custom_id, model, prompt in entries
+        ]
+        upload = self.client.files.create(
+            file=("batch_input.jsonl", ("\n".join(lines) + "\n").encode("utf-8")),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=upload.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> Tuple[bool, str]:
+        """Return (finished, status) for a batch."""
+        batch = self.client.batches.retrieve(batch_id)
+        return batch.status in ("completed", "failed", "expired", "cancelled"), batch.status
+
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        """Download the output and error files of a finished batch."""
+        batch = self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                body = response.get("body") or {}
+                if record.get("error") or response.get("status_code") != 200:
+                    error = record.get("error") or body.get("error") or f"HTTP {response.get('status_code')}"
+                    message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+                    yield record["custom_id"], None, None, message
+                    continue
+
+                usage = body.get("usage") or {}
+                token_info = TokenInfo(
+                    input_tokens=usage.get("prompt_tokens"),
+                    output_tokens=usage.get("completion_tokens"),
+                    total_tokens=usage.get("total_tokens"),
+                    reasoning_tokens=(usage.get("completion_tokens_details") or {}).get("reasoning_tokens"),
+                    cached_input_tokens=(usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+                )
+                yield record["custom_id"], body["choices"][0]["message"]["content"], token_info, None
+
+class ClaudeBatchBackend:
+    """Submits messages through the Anthropic Message Batches API."""
+
+    provider = "claude"
+    max_requests = 100000
+    one_model_per_batch = False
+
+    def __init__(self, client):
+        self.client = client.with_options(max_retries=BATCH_CLIENT_RETRIES)
+
+    def submit(self, entries: List[Tuple[str, Any, str]]) -> str:
+        """Create a message batch from (custom_id, model, prompt) entries."""
+        batch = self.client.messages.batches.create(requests=[
+            {"custom_id": custom_id, "params": model._build_request(prompt)}
+            for custom_id, model, prompt in entries
+        ])
+        return batch.id
+
+    def status(self, batch_id: str) -> Tuple[bool, str]:
+        """Return (finished, status) for a batch."""
+        batch = self.client.messages.batches.retrieve(batch_id)
+        return batch.processing_status == "ended", batch.processing_status
+
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        """Stream the results of a finished batch."""
+        from models.claude_model import ClaudeModel
+
+        for entry in self.client.messages.batches.results(batch_id):
+            result = entry.result
+            if result.type == "succeeded":
+                message = result.message
+                yield entry.custom_id, message.content[0].text, ClaudeModel._token_info(message.usage), None
+                continue
+
+            error = getattr(getattr(getattr(result, "error", None), "error", None), "message", None)
+            yield entry.custom_id, None, None, error or f"Request {result.type}"
+
+BATCH_BACKENDS = {
+    "openai": OpenAIBatchBackend,
+    "claude": ClaudeBatchBackend,
+}
+
+@dataclass
+class SubmittedBatch:
+    """A batch awaiting results, persisted so restarted runs resume polling."""
+    batch_id: str
+    provider: str
+    model_id: str
+    submitted_at: float
+    # custom_id -> [prompt_id, model_id]
+    tasks: Dict[str, List[str]] = field(default_factory=dict)
+
+class BatchAPIRunner:
+    """
+    Runs a prompt × model matrix through provider batch APIs.
+
+    Requests for providers with a batch API are packed into batches, submitted,
+    polled and mapped back into ModelResponse records in the same JSONL format
+    as BatchRunner. Models from other providers fall back to BatchRunner's
+    synchronous calls. Submitted batch IDs are kept next to the output file, so
+    a restarted run resumes polling instead of resubmitting.
+    """
+
+    def __init__(self, model_configs: List[Any], scheduler=None, max_in_flight: int = 16,
+                 cache=None, poll_interval: float = 60.0, system_prompt: Optional[str] = None):
+        """
+        Initialize the runner.
+
+        Args:
+            model_configs: ModelConfig entries to run every prompt against
+            scheduler: Per-provider scheduler for the synchronous fallback
+            max_in_flight: Maximum synchronous fallback requests in flight
+            cache: Optional ResponseCache for the synchronous fallback
+            poll_interval: Seconds between batch status checks
+            system_prompt: Optional instructions sent ahead of every prompt
+        """
+        self.model_configs = model_configs
+        self.scheduler = scheduler
+        self.max_in_flight = max_in_flight
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.system_prompt = system_prompt
+        self._configs = {config.model_id: config for config in model_configs}
+        self._models = {
+            config.model_id: ModelFactory.create_model(
+                config.model_id,
+                config.provider,
+                max_tokens=config.max_tokens,
+                temperature=config.temperature,
+                input_price=config.input_price,
+                output_price=config.output_price,
+                cached_input_price=config.cached_input_price,
+                system_prompt=system_prompt
+            )
+            for config in model_configs
+            if config.provider in BATCH_BACKENDS
+        }
+
+    def run(self, input_path: str, output_path: str, retry_errors: bool = False) -> BatchSummary:
+        """
+        Submit, poll and collect every pending prompt × model pair.
+
+        Args:
+            input_path: JSONL file of prompts
+            output_path: JSONL file results are appended to
+            retry_errors: Re-run pairs whose previous result was an error
+
+        Returns:
+            BatchSummary with counts for this run
+        """
+        start_time = time.time()
+        state_path = f"{output_path}.batches.json"
+        batches = self._load_state(state_path)
+        completed = load_completed(output_path, retry_errors=retry_errors)
+        pending = {tuple(pair) for batch in batches for pair in batch.tasks.values()}
+        summary = BatchSummary()
+
+        with open_for_append(output_path) as out:
+            self._submit_pending(input_path, completed, pending, batches, state_path, out, summary)
+
+            fallback_configs = [c for c in self.model_configs if c.provider not in BATCH_BACKENDS]
+            if fallback_configs:
+                fallback = BatchRunner(
+                    fallback_configs,
+                    scheduler=self.scheduler,
+                    max_in_flight=self.max_in_flight,
+                    cache=self.cache,
+                    system_prompt=self.system_prompt
+                ).run(input_path, output_path, retry_errors=retry_errors)
+                summary.completed += fallback.completed
+                summary.failed += fallback.failed
+                summary.skipped += fallback.skipped
+
+            while batches:
+                for batch in list(batches):
+                    if self._collect(batch, out, summary):
+                        batches.remove(batch)
+                        self._save_state(state_path, batches)
+                if batches:
+                    time.sleep(self.poll_interval)
+
+        summary.elapsed_time = time.time() - start_time
+        return summary
+
+    def _submit_pending(self, input_path: str, completed, pending, batches: List[SubmittedBatch],
+                        state_path: str, out, summary: BatchSummary):
+        """Pack pending pairs into batches, submitting each group as it fills."""
+        groups: Dict[Tuple[str, str], List[BatchTask]] = {}
+
+        for prompt_id, prompt in read_prompts(input_path):
+            for model_id in self._models:
+                config = self._configs[model_id]
+                pair = (prompt_id, model_id)
+                if pair in completed or pair in pending:
+                    summary.skipped += 1
+                    continue
+
+                backend_class = BATCH_BACKENDS[config.provider]
+                group_key = (config.provider, model_id if backend_class.one_model_per_batch else "")
+                group = groups.setdefault(group_key, [])
+                group.append(BatchTask(prompt_id=prompt_id, prompt=prompt, model_config=config))
+                if len(group) >= backend_class.max_requests:
+                    self._submit_group(groups.pop(group_key), batches, state_path, out, summary)
+
+        for group in groups.values():
+            self._submit_group(group, batches, state_path, out, summary)
+
+    def _submit_group(self, tasks: List[BatchTask], batches: List[SubmittedBatch],
+                      state_path: str, out, summary: BatchSummary):
+        """Submit one batch and persist it; on failure, record every task as an error."""
+        model = self._models[tasks[0].model_config.model_id]
+        backend = BATCH_BACKENDS[model.provider](model.client)
+        entries = [
+            (f"req-{i}", self._models[task.model_config.model_id], task.prompt)
+            for i, task in enumerate(tasks)
+        ]
+
+        try:
+            batch_id = backend.submit(entries)
+        except Exception as e:
+            logger.error(f"Failed to submit {model.provider} batch of {len(tasks)} requests: {e}")
+            for task in tasks:
+                self._write(out, task, create_error_response(task.model_config.model_id, f"Batch submission failed: {e}"), summary)
+            return
+
+        logger.info(f"Submitted {model.provider} batch {batch_id} with {len(tasks)} requests")
+        batches.append(SubmittedBatch(
+            batch_id=batch_id,
+            provider=model.provider,
+            model_id=model.model_name,
+            submitted_at=time.time(),
+            tasks={custom_id: [task.prompt_id, task.model_config.model_id]
+                   for (custom_id, _, _), task in zip(entries, tasks)}
+        ))
+        self._save_state(state_path, batches)
+
+    def _collect(self, batch: SubmittedBatch, out, summary: BatchSummary) -> bool:
+        """Write results of a finished batch. Returns False while it is still running."""
+        backend = BATCH_BACKENDS[batch.provider](self._model_for(batch.model_id, batch.provider).client)
+
+        try:
+            finished, status = backend.status(batch.batch_id)
+        except Exception as e:
+            logger.warning(f"Could not poll batch {batch.batch_id}: {e}")
+            return False
+        if not finished:
+            logger.debug(f"Batch {batch.batch_id} is {status}")
+            return False
+
+        elapsed = time.time() - batch.submitted_at
+        remaining = dict(batch.tasks)
+        for custom_id, text, token_info, error in backend.results(batch.batch_id):
+            pair = remaining.pop(custom_id, None)
+            if pair is None:
+                continue
+            task = self._task_for(pair)
+            if error:
+                response = create_error_response(task.model_config.model_id, error)
+                response.elapsed_time = elapsed
+            else:
+                # Claude batches mix models, so each result is priced at its own model's rates
+                cost = self._model_for(task.model_config.model_id, batch.provider)._cost(token_info)
+                response = ModelResponse(
+                    model_name=task.model_config.model_id,
+                    text=text,
+                    token_info=token_info,
+                    elapsed_time=elapsed,
+                    cost=cost * BATCH_PRICE_FACTOR if cost is not None else None
+                )
+            self._write(out, task, response, summary)
+
+        for pair in remaining.values():
+            task = self._task_for(pair)
+            response = create_error_response(
+                task.model_config.model_id, f"Batch {batch.batch_id} ended with status '{status}'"
+            )
+            response.elapsed_time = elapsed
+            self._write(out, task, response, summary)
+
+        return True
+
+    def _model_for(self, model_id: str, provider: str):
+        """The configured model for model_id, or a default one for a batch left by another configuration."""
+        return self._models.get(model_id) or ModelFactory.create_model(model_id, provider)
+
+    def _task_for(self, pair: List[str]) -> BatchTask:
+        """Rebuild a task (without its prompt text) from a persisted pair."""
+        prompt_id, model_id = pair
+        return BatchTask(prompt_id=prompt_id, prompt="", model_config=self._configs[model_id])
+
+    @staticmethod
+    def _write(out, task: BatchTask, response, summary: BatchSummary):
+        out.write(json.dumps(result_record(task, response)) + "\n")
+        out.flush()
+        metrics_registry.record(task.model_config.provider, task.model_config.model_id, response)
+        summary.record(response)
+
+    @staticmethod
+    def _load_state(path: str) -> List[SubmittedBatch]:
+        """Load batches submitted by a previous run."""
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r') as f:
+            return [SubmittedBatch(**entry) for entry in json.load(f)]
+
+    @staticmethod
+    def _save_state(path: str, batches: List[SubmittedBatch]):
+        """Persist submitted batches atomically, removing the file once none remain."""
+        if not batches:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump([vars(batch) for batch in batches], f)
+        os.replace(tmp_path, path)
\ No newline at end of file
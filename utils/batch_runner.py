@@ -0,0 +1,255 @@
+from concurrent.futures import wait, FIRST_COMPLETED
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Any
+import json
+import logging
+import os
+import time
+
+from models.model_factory import ModelFactory
+from .metrics import metrics_registry
+from .parallel_executor import create_error_response
+from .provider_scheduler import ProviderScheduler
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class BatchTask:
+    """One prompt × model pair in a batch run."""
+    prompt_id: str
+    prompt: str
+    model_config: Any
+
+@dataclass
+class BatchSummary:
+    """Counts reported at the end of a batch run."""
+    completed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    elapsed_time: float = 0.0
+    output_tokens: int = 0
+    # Estimated USD spent, excluding cached responses
+    cost: float = 0.0
+
+    def record(self, response):
+        """Count one finished task."""
+        if response.error:
+            self.failed += 1
+            return
+        self.completed += 1
+        if response.cache_hit:
+            return
+        if response.token_info is not None and response.token_info.output_tokens is not None:
+            self.output_tokens += response.token_info.output_tokens
+        if response.cost is not None:
+            self.cost += response.cost
+
+def read_prompts(path: str) -> Iterator[Tuple[str, str]]:
+    """
+    Lazily read prompts from a JSONL file.
+
+    Each line is an object with a "prompt" field and an optional "id" field;
+    lines without an id are identified by their 1-based line number.
+
+    Yields:
+        (prompt_id, prompt) pairs
+    """
+    with open(path, 'r') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {line_number} of {path}: {e}")
+            if not isinstance(record, dict) or "prompt" not in record:
+                raise ValueError(f"Line {line_number} of {path} must be an object with a 'prompt' field")
+            yield str(record.get("id", line_number)), record["prompt"]
+
+def load_completed(path: str, retry_errors: bool = False) -> Set[Tuple[str, str]]:
+    """
+    Collect (prompt_id, model_id) pairs already written to an output file.
+
+    Args:
+        path: Output JSONL file from a previous run
+        retry_errors: If True, failed pairs are not counted as done
+
+    Returns:
+        Set of completed (prompt_id, model_id) pairs
+    """
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A partially written last line from an interrupted run
+                continue
+            if retry_errors and record.get("error"):
+                continue
+            completed.add((record["prompt_id"], record["model_id"]))
+    return completed
+
+def open_for_append(path: str):
+    """
+    Open an output JSONL file for appending results.
+
+    An interrupted run can leave a partially written last line. It is cut
+    back to the last newline first, so the next record starts a line of its
+    own; the pair it held was never counted as completed and runs again.
+    """
+    if os.path.exists(path):
+        with open(path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(position - 65536, 0)
+                f.seek(start)
+                newline = f.read(position - start).rfind(b"\n")
+                if newline != -1:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                logger.warning(f"Dropping a partial last line ({end - position} bytes) from {path}")
+                f.truncate(position)
+    return open(path, 'a')
+
+class BatchRunner:
+    """Runs a prompt × model matrix with bounded concurrency, streaming results to JSONL."""
+
+    def __init__(self, model_configs: List[Any], scheduler: ProviderScheduler = None,
+                 max_in_flight: int = 16, cache=None, system_prompt: Optional[str] = None):
+        """
+        Initialize the batch runner.
+
+        Args:
+            model_configs: ModelConfig entries to run every prompt against
+            scheduler: Per-provider scheduler; a default one is created if None
+            max_in_flight: Maximum number of requests in flight across all providers
+            cache: Optional ResponseCache shared by all models
+            system_prompt: Optional instructions sent ahead of every prompt
+        """
+        self.model_configs = model_configs
+        self.scheduler = scheduler
+        self.max_in_flight = max_in_flight
+        self._models = {
+            config.model_id: ModelFactory.create_model(
+                config.model_id,
+                config.provider,
+                max_tokens=config.max_tokens,
+                temperature=config.temperature,
+                cache=cache if config.cache else None,
+                timeout=config.timeout,
+                input_price=config.input_price,
+                output_price=config.output_price,
+                cached_input_price=config.cached_input_price,
+                system_prompt=system_prompt
+            )
+            for config in model_configs
+        }
+
+    def iter_tasks(self, prompts: Iterable[Tuple[str, str]],
+                   completed: Set[Tuple[str, str]]) -> Iterator[BatchTask]:
+        """Lazily expand prompts into pending prompt × model tasks."""
+        for prompt_id, prompt in prompts:
+            for config in self.model_configs:
+                if (prompt_id, config.model_id) not in completed:
+                    yield BatchTask(prompt_id=prompt_id, prompt=prompt, model_config=config)
+
+    def run(self, input_path: str, output_path: str, retry_errors: bool = False) -> BatchSummary:
+        """
+        Run every pending prompt × model pair, appending each result to output_path.
+
+        Pairs already present in output_path are skipped, so an interrupted run
+        can be restarted with the same arguments.
+
+        Args:
+            input_path: JSONL file of prompts
+            output_path: JSONL file results are appended to
+            retry_errors: Re-run pairs whose previous result was an error
+
+        Returns:
+            BatchSummary with counts for this run
+        """
+        return self.run_prompts(read_prompts(input_path), output_path, retry_errors=retry_errors)
+
+    def run_prompts(self, prompts: Iterable[Tuple[str, str]], output_path: str, retry_errors: bool = False,
+                    completed: Optional[Set[Tuple[str, str]]] = None) -> BatchSummary:
+        """
+        Run every pending pair for (prompt_id, prompt) pairs, appending each result to output_path.
+
+        Args:
+            prompts: (prompt_id, prompt) pairs, consumed lazily
+            output_path: JSONL file results are appended to
+            retry_errors: Re-run pairs whose previous result in output_path was an error
+            completed: Pairs to skip; defaults to those already in output_path
+
+        Returns:
+            BatchSummary with counts for this run
+        """
+        start_time = time.time()
+        if completed is None:
+            completed = load_completed(output_path, retry_errors=retry_errors)
+        summary = BatchSummary()
+
+        def skipped_prompts():
+            for prompt_id, prompt in prompts:
+                summary.skipped += sum(
+                    1 for config in self.model_configs if (prompt_id, config.model_id) in completed
+                )
+                yield prompt_id, prompt
+
+        scheduler = self.scheduler or ProviderScheduler()
+        in_flight = {}
+
+        try:
+            with open_for_append(output_path) as out:
+                for task in self.iter_tasks(skipped_prompts(), completed):
+                    while len(in_flight) >= self.max_in_flight:
+                        self._drain(in_flight, out, summary)
+
+                    model = self._models[task.model_config.model_id]
+                    future = scheduler.submit(task.model_config.provider, model.generate, task.prompt)
+                    in_flight[future] = task
+
+                while in_flight:
+                    self._drain(in_flight, out, summary)
+        finally:
+            if self.scheduler is None:
+                scheduler.shutdown(wait=False)
+
+        summary.elapsed_time = time.time() - start_time
+        return summary
+
+    def _drain(self, in_flight: Dict, out, summary: BatchSummary):
+        """Wait for at least one in-flight request and write its result."""
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            task = in_flight.pop(future)
+            try:
+                response = future.result()
+            except Exception as e:
+                logger.error(f"Error for prompt {task.prompt_id} on {task.model_config.model_id}: {e}")
+                response = create_error_response(task.model_config.model_id, str(e))
+
+            out.write(json.dumps(result_record(task, response)) + "\n")
+            out.flush()
+            metrics_registry.record(task.model_config.provider, task.model_config.model_id, response)
+            summary.record(response)
+
+def result_record(task: BatchTask, response) -> Dict[str, Any]:
+    """Build the output JSONL record for a finished task."""
+    record = {
+        "prompt_id": task.prompt_id,
+        "model_id": task.model_config.model_id,
+        "provider": task.model_config.provider,
+        "display_name": task.model_config.display_name,
+    }
+    record.update(asdict(response))
+    record["completed_at"] = time.time()
+    return record
\ No newline at end of file
@@ -0,0 +1,208 @@
+import glob
+import json
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .batch_runner import BatchRunner, BatchSummary, load_completed, read_prompts
+from .work_queue import DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS, Shard, ShardQueue
+
+logger = logging.getLogger(__name__)
+
+QUEUE_FILE = "queue.sqlite3"
+RESULTS_DIR = "results"
+
+@dataclass
+class MergeSummary:
+    """Counts reported by DistributedRun.merge()."""
+    records: int = 0
+    failed: int = 0
+    # Duplicate results from retried attempts that were dropped
+    duplicates: int = 0
+    # Shards not done yet (pending, leased or failed); their partial results are included
+    unfinished_shards: int = 0
+
+def default_worker_id() -> str:
+    """host:pid, unique among live workers and readable in status output."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class DistributedRun:
+    """
+    A prompt × model matrix split into shards that worker processes run in parallel.
+
+    The run directory holds the shard queue (a ShardQueue) and one JSONL file
+    per shard attempt under results/. Workers on one or more hosts point at
+    the same directory, claim shards with leases and write each attempt's
+    results to their own file, resuming from earlier attempts of the same
+    shard. merge() combines the files into one output, keeping a single
+    result per prompt × model pair.
+    """
+
+    def __init__(self, run_dir: str, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.run_dir = run_dir
+        self.queue = ShardQueue(os.path.join(run_dir, QUEUE_FILE), lease_seconds, max_attempts)
+
+    @classmethod
+    def create(cls, run_dir: str, input_path: str, model_ids: List[str], shard_size: int = 50,
+               system_prompt: Optional[str] = None, **kwargs) -> "DistributedRun":
+        """
+        Split a prompts file into shards in a new run directory.
+
+        Args:
+            run_dir: Directory for the queue and results; its queue must not exist yet
+            input_path: JSONL file of prompts, as for batch_compare.py
+            model_ids: Models every prompt runs against
+            shard_size: Prompts per shard
+            system_prompt: Optional instructions sent ahead of every prompt
+        """
+        os.makedirs(os.path.join(run_dir, RESULTS_DIR), exist_ok=True)
+        ShardQueue.create(
+            os.path.join(run_dir, QUEUE_FILE),
+            read_prompts(input_path),
+            shard_size,
+            meta={"input": os.path.abspath(input_path), "models": model_ids,
+                  "system_prompt": system_prompt, "created_at": time.time()}
+        )
+        return cls(run_dir, **kwargs)
+
+    def attempt_path(self, shard_id: int, attempt: int) -> str:
+        return os.path.join(self.run_dir, RESULTS_DIR, f"shard-{shard_id:06d}.attempt-{attempt}.jsonl")
+
+    def shard_files(self, shard_id: int) -> List[str]:
+        """Result files of every attempt of a shard, oldest first."""
+        files = glob.glob(os.path.join(self.run_dir, RESULTS_DIR, f"shard-{shard_id:06d}.attempt-*.jsonl"))
+        return sorted(files, key=lambda path: int(re.search(r"attempt-(\d+)", path).group(1)))
+
+    def work(self, config_manager, worker_id: Optional[str] = None, max_in_flight: int = 16,
+             cache=None, scheduler=None, poll_interval: float = 5.0, retry_errors: bool = False,
+             stop: Optional[threading.Event] = None) -> BatchSummary:
+        """
+        Claim and run shards until every shard is done or failed.
+
+        While other workers hold live leases this worker keeps polling, so it
+        can take over their shards if they crash.
+
+        Args:
+            config_manager: ConfigManager the run's model IDs are resolved against
+            worker_id: Name recorded on leases (default host:pid)
+            max_in_flight: Requests in flight in this worker
+            cache: Optional ResponseCache
+            scheduler: Optional ProviderScheduler shared with other work
+            poll_interval: Seconds between claims while nothing is claimable
+            retry_errors: Re-run pairs whose earlier attempt was an error
+            stop: Event that ends the loop after the current shard
+
+        Returns:
+            BatchSummary totalled over the shards this worker ran
+        """
+        worker_id = worker_id or default_worker_id()
+        meta = self.queue.meta()
+        configs = []
+        for model_id in meta["models"]:
+            config = config_manager.get_model_by_id(model_id)
+            if config is None:
+                raise ValueError(f"Model '{model_id}' of this run is not in the local configuration")
+            configs.append(config)
+        runner = BatchRunner(
+            configs, scheduler=scheduler, max_in_flight=max_in_flight, cache=cache,
+            system_prompt=meta.get("system_prompt")
+        )
+
+        total = BatchSummary()
+        start_time = time.time()
+        while stop is None or not stop.is_set():
+            shard = self.queue.claim(worker_id)
+            if shard is None:
+                if self.queue.status().finished:
+                    break
+                # Other workers hold the rest; wait in case one of them dies
+                time.sleep(poll_interval)
+                continue
+            summary = self._run_shard(runner, shard, retry_errors)
+            for field in ("completed", "failed", "skipped", "output_tokens", "cost"):
+                setattr(total, field, getattr(total, field) + getattr(summary, field))
+        total.elapsed_time = time.time() - start_time
+        return total
+
+    def _run_shard(self, runner: BatchRunner, shard: Shard, retry_errors: bool) -> BatchSummary:
+        """Run one leased shard, renewing its lease in the background."""
+        logger.info(f"Running shard {shard.shard_id} attempt {shard.attempt} ({len(shard.prompts)} prompts)")
+        # Resume from whatever earlier attempts of this shard wrote
+        completed = set()
+        for path in self.shard_files(shard.shard_id):
+            completed |= load_completed(path, retry_errors=retry_errors)
+
+        done = threading.Event()
+        lost = threading.Event()
+
+        def keep_leased():
+            while not done.wait(self.queue.lease_seconds / 3):
+                try:
+                    if not self.queue.renew(shard):
+                        lost.set()
+                        return
+                except Exception as e:
+                    logger.warning(f"Renewing the lease on shard {shard.shard_id} failed: {e}")
+
+        renewer = threading.Thread(target=keep_leased, name=f"lease-{shard.shard_id}", daemon=True)
+        renewer.start()
+        try:
+            summary = runner.run_prompts(
+                shard.prompts, self.attempt_path(shard.shard_id, shard.attempt), completed=completed
+            )
+        except Exception as e:
+            logger.error(f"Shard {shard.shard_id} failed: {e}")
+            self.queue.release(shard, str(e))
+            return BatchSummary()
+        finally:
+            done.set()
+            renewer.join()
+
+        if lost.is_set() or not self.queue.complete(shard):
+            # Another worker took the shard over; merge() drops whichever duplicates result
+            logger.warning(f"Lost the lease on shard {shard.shard_id}; its results are kept for merging")
+        return summary
+
+    def merge(self, output_path: str) -> MergeSummary:
+        """
+        Write one result per prompt × model pair to output_path, in shard order.
+
+        A successful result from any attempt wins over an error; otherwise the
+        latest attempt's result is kept.
+        """
+        summary = MergeSummary()
+        status = self.queue.status()
+        summary.unfinished_shards = status.total - status.done
+
+        with open(output_path, 'w') as out:
+            for shard_id in self.queue.shard_ids():
+                records: Dict[Tuple[str, str], Dict[str, Any]] = {}
+                for path in self.shard_files(shard_id):
+                    for record in _read_records(path):
+                        key = (record["prompt_id"], record["model_id"])
+                        previous = records.get(key)
+                        if previous is not None:
+                            summary.duplicates += 1
+                            if not previous.get("error"):
+                                continue
+                        records[key] = record
+                for record in records.values():
+                    out.write(json.dumps(record) + "\n")
+                    summary.records += 1
+                    summary.failed += bool(record.get("error"))
+        return summary
+
+def _read_records(path: str):
+    """JSON records of a results file, skipping a partially written last line."""
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
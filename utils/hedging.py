@@ -0,0 +1,310 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+import contextvars
+import logging
+import threading
+import time
+
+from models.cancellation import CancelScope, current_scope
+from .metrics import metrics_registry
+from .parallel_executor import create_error_response
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class HedgeSlots:
+    """Hedge requests in flight for one provider."""
+    provider: str
+    limit: int
+    in_flight: int = 0
+
+class HedgePolicy:
+    """
+    Decides when to send a duplicate (hedge) request and caps how many run at once.
+
+    The hedge delay is the model's observed latency quantile (time to first
+    token when streaming) of successful requests from the metrics registry,
+    so only requests slower than e.g. 95% of their history are duplicated.
+    Failures are left out, as a burst of fast errors would otherwise shorten
+    the delay. Models with too little history are never hedged.
+    """
+
+    def __init__(self, quantile: float = 0.95, min_samples: int = 20, min_delay: float = 0.25,
+                 limits: Dict[str, int] = None, default_limit: int = 2, metrics=metrics_registry):
+        """
+        Initialize the policy.
+
+        Args:
+            quantile: Latency quantile after which a hedge is sent
+            min_samples: Samples needed before a model is hedged
+            min_delay: Lower bound on the hedge delay in seconds
+            limits: Maximum hedges in flight per provider
+            default_limit: Limit for providers missing from limits
+            metrics: MetricsRegistry the latency history is read from
+        """
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.limits = dict(limits or {})
+        self.default_limit = default_limit
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._slots: Dict[str, HedgeSlots] = {}
+
+    @classmethod
+    def from_config(cls, config_manager, **kwargs) -> "HedgePolicy":
+        """Build a policy using per-provider hedge caps from a ConfigManager."""
+        limits = {
+            provider: settings.max_hedges
+            for provider, settings in config_manager.providers.items()
+        }
+        return cls(limits=limits, **kwargs)
+
+    def delay(self, model: Any, stream: bool = False) -> Optional[float]:
+        """Seconds to wait before hedging a request to model, or None if it has too little history."""
+        metric = "ttft_seconds" if stream else "latency_seconds"
+        value = self.metrics.quantile(model.model_name, metric, self.quantile, self.min_samples, successful=True)
+        return max(value, self.min_delay) if value is not None else None
+
+    def try_acquire(self, provider: str) -> bool:
+        """Reserve a hedge slot for provider; False if its cap is reached."""
+        with self._lock:
+            slots = self._slots.setdefault(
+                provider, HedgeSlots(provider, self.limits.get(provider, self.default_limit))
+            )
+            if slots.in_flight >= slots.limit:
+                return False
+            slots.in_flight += 1
+            return True
+
+    def release(self, provider: str):
+        with self._lock:
+            self._slots[provider].in_flight -= 1
+
+    def generate(self, model: Any, prompt: str, on_chunk: Optional[Callable[[str], None]] = None,
+                 scheduler=None):
+        """
+        Generate a response, sending one hedge request if the first is slow.
+
+        If no response (or, when streaming, no first token) has arrived after
+        the policy's delay and the provider has a free hedge slot, a duplicate
+        request is sent and whichever answers first is returned. Each attempt
+        runs under its own child of the current CancelScope, and the loser's
+        scope is cancelled as soon as the race is decided: its HTTP response
+        is shut down and it is neither retried nor kept waiting for rate-limit
+        capacity. Attempts always stream from the provider, so a blocking call
+        has a response to shut down well before its body is complete. The
+        hedge slot is released once the race is decided.
+
+        With a scheduler the hedge runs in the provider's bulkhead like any
+        other request (the first one already holds the caller's worker). A
+        hedge still queued there when the race is decided, or when the first
+        request fails, is cancelled rather than waited for.
+
+        Args:
+            model: Model to call
+            prompt: Prompt to send
+            on_chunk: Optional callback receiving the winning attempt's text chunks
+            scheduler: Optional ProviderScheduler the hedge is submitted to
+
+        Returns:
+            The winning ModelResponse, with hedged/hedge_won set and, if the
+            hedge won, timings measured from the first request's start
+        """
+        delay = self.delay(model, stream=on_chunk is not None)
+        if delay is None:
+            return model.generate(prompt, on_chunk=on_chunk)
+
+        start = time.perf_counter()
+        parent = current_scope() or CancelScope()
+        race = _Race(on_chunk)
+        race.add(_Attempt(race, model, prompt, offset=0.0, scope=parent.child(abort_requests=True)))
+
+        hedged = False
+        if not race.wait(delay) and race.winner is None:
+            provider = model.provider or type(model).__name__
+            if self.try_acquire(provider):
+                hedged = True
+                logger.debug(f"Hedging request to {model.model_name} after {delay:.2f}s")
+                race.add(_Attempt(
+                    race, model, prompt, offset=time.perf_counter() - start,
+                    scope=parent.child(abort_requests=True), on_release=lambda: self.release(provider)
+                ), scheduler=scheduler)
+        race.wait()
+
+        winner = race.winner or race.attempts[0]
+        response = winner.response
+        if response is None:
+            response = create_error_response(model.model_name, "Hedged request produced no response")
+        response.hedged = hedged
+        response.hedge_won = hedged and winner is not race.attempts[0]
+        if response.hedge_won:
+            response.elapsed_time += winner.offset
+            if response.time_to_first_token is not None:
+                response.time_to_first_token += winner.offset
+        return response
+
+    def slots(self) -> List[HedgeSlots]:
+        """Snapshot of hedge slots per provider."""
+        with self._lock:
+            return [HedgeSlots(s.provider, s.limit, s.in_flight) for s in self._slots.values()]
+
+class _Attempt:
+    """One request of a hedged call, running on its own thread."""
+
+    def __init__(self, race: "_Race", model: Any, prompt: str, offset: float, scope: CancelScope,
+                 on_release: Optional[Callable[[], None]] = None):
+        self.race = race
+        self.model = model
+        self.prompt = prompt
+        # Seconds between the primary request's start and this attempt's start
+        self.offset = offset
+        # Cancelled when another attempt wins (or the caller's scope is cancelled)
+        self.scope = scope
+        self.on_release = on_release
+        self.response = None
+        self.done = False
+        # Set while the attempt waits in a scheduler's queue
+        self.future = None
+        self._released = False
+        self._lock = threading.Lock()
+
+    def start(self, scheduler=None) -> "_Attempt":
+        # Copy the context so the caller's context variables reach the worker thread
+        context = contextvars.copy_context()
+        if scheduler is not None:
+            self.future = scheduler.submit(self.model.provider or type(self.model).__name__, context.run, self._run)
+        else:
+            threading.Thread(target=context.run, args=(self._run,), name="hedged-request", daemon=True).start()
+        return self
+
+    def cancel_queued(self) -> bool:
+        """Drop the attempt if it has not started running yet; True if it was dropped."""
+        return self.future is not None and self.future.cancel()
+
+    def release(self):
+        """Give back this attempt's hedge slot, once; called when the race is decided or the attempt ends."""
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        if self.on_release is not None:
+            self.on_release()
+
+    def _run(self):
+        try:
+            with self.scope.activate():
+                response = self._stream()
+            if self.race.on_chunk is None and response is not None:
+                # Same fields as a blocking model.generate() response
+                response.time_to_first_token = None
+        except Exception as e:
+            response = create_error_response(self.model.model_name, str(e))
+        finally:
+            self.release()
+        self.race.finish(self, response)
+
+    def _stream(self):
+        stream = self.model.generate_stream(self.prompt)
+        while True:
+            try:
+                chunk = next(stream)
+            except StopIteration as done:
+                return done.value
+            if self.race.on_chunk is None:
+                # A blocking call only streams so that it can be stopped if it loses
+                continue
+            if not self.race.claim(self):
+                # The other request streamed first; closing the generator closes the HTTP stream
+                stream.close()
+                return None
+            self.race.on_chunk(chunk)
+
+class _Race:
+    """
+    Shared state of the attempts of one hedged call.
+
+    Streaming calls are won by the first attempt to produce a chunk, so only
+    one attempt's text reaches on_chunk. Blocking calls are won by the first
+    successful response. If every attempt fails, the primary's error is used.
+    """
+
+    def __init__(self, on_chunk: Optional[Callable[[str], None]]):
+        self.on_chunk = on_chunk
+        self.attempts: List[_Attempt] = []
+        self.winner: Optional[_Attempt] = None
+        self._cond = threading.Condition()
+
+    def claim(self, attempt: _Attempt) -> bool:
+        with self._cond:
+            decided = self.winner is None
+            if decided:
+                self.winner = attempt
+                self._cond.notify_all()
+        if decided:
+            self._decided()
+        return self.winner is attempt
+
+    def finish(self, attempt: _Attempt, response):
+        with self._cond:
+            decided = (self.winner is None and self.on_chunk is None
+                       and response is not None and not response.error)
+            if decided:
+                self.winner = attempt
+            others = [other for other in self.attempts if other is not attempt]
+        if decided:
+            # Before waking the caller, so its hedge slot is free once generate() returns
+            self._decided()
+        else:
+            # Don't keep the caller waiting for an attempt stuck in a full bulkhead
+            for other in others:
+                if other.cancel_queued():
+                    self._dropped(other)
+        with self._cond:
+            attempt.response = response
+            attempt.done = True
+            self._cond.notify_all()
+
+    def _dropped(self, attempt: _Attempt):
+        """Settle an attempt cancelled before it ran."""
+        attempt.release()
+        with self._cond:
+            attempt.done = True
+            self._cond.notify_all()
+
+    def _decided(self):
+        """Stop the losing attempts and free every hedge slot; only one request is needed now."""
+        with self._cond:
+            attempts = list(self.attempts)
+        for attempt in attempts:
+            if attempt is not self.winner:
+                attempt.scope.cancel("Lost to a hedged request")
+                if attempt.cancel_queued():
+                    self._dropped(attempt)
+            attempt.release()
+
+    def settled(self) -> bool:
+        if self.winner is not None:
+            return self.winner.done
+        return all(attempt.done for attempt in self.attempts)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the outcome is known; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(self.settled, timeout)
+
+    def add(self, attempt: _Attempt, scheduler=None) -> _Attempt:
+        with self._cond:
+            self.attempts.append(attempt)
+            decided = self.winner is not None
+        if decided:
+            # Lost before it started
+            attempt.scope.cancel("Lost to a hedged request")
+            attempt.release()
+        attempt.start(scheduler)
+        with self._cond:
+            others_done = all(other.done for other in self.attempts if other is not attempt)
+        # The others failed while this one was being queued; finish() could not drop it then
+        if others_done and attempt.cancel_queued():
+            self._dropped(attempt)
+        return attempt
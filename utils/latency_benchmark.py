@@ -0,0 +1,273 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from itertools import combinations
+from typing import Any, Callable, Dict, List, Optional
+import logging
+import math
+import statistics
+import time
+
+from .metrics import metrics_registry, percentile
+from .parallel_executor import create_error_response
+
+logger = logging.getLogger(__name__)
+
+# Sampled metrics: name -> (ModelResponse attribute, whether higher is better)
+METRICS = {
+    "latency": ("elapsed_time", False),
+    "ttft": ("time_to_first_token", False),
+    "tokens_per_second": ("tokens_per_second", True),
+}
+
+# Two-sided 97.5% quantiles of Student's t by degrees of freedom, for 95% intervals
+_T_975 = [
+    (1, 12.706), (2, 4.303), (3, 3.182), (4, 2.776), (5, 2.571), (6, 2.447), (7, 2.365),
+    (8, 2.306), (9, 2.262), (10, 2.228), (12, 2.179), (15, 2.131), (20, 2.086),
+    (25, 2.060), (30, 2.042), (40, 2.021), (60, 2.000), (120, 1.980),
+]
+
+def t_critical(df: int) -> float:
+    """95% two-sided t critical value, rounded towards fewer degrees of freedom (wider interval)."""
+    if df > _T_975[-1][0]:
+        return 1.960
+    return next(value for limit, value in reversed(_T_975) if limit <= df)
+
+def mann_whitney_p(a: List[float], b: List[float]) -> Optional[float]:
+    """
+    Two-sided p-value of the Mann-Whitney U test (normal approximation, tie-corrected).
+
+    Latency distributions are skewed and heavy-tailed, so a rank test is
+    used rather than a t-test. Returns None with fewer than 2 samples per side.
+    """
+    n1, n2 = len(a), len(b)
+    if n1 < 2 or n2 < 2:
+        return None
+
+    combined = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    n = n1 + n2
+    rank_sum_a = 0.0
+    tie_term = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        average_rank = (i + j) / 2 + 1
+        rank_sum_a += average_rank * sum(1 for k in range(i, j + 1) if combined[k][1] == 0)
+        ties = j - i + 1
+        tie_term += ties ** 3 - ties
+        i = j + 1
+
+    u = rank_sum_a - n1 * (n1 + 1) / 2
+    mean = n1 * n2 / 2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    # Continuity correction towards the mean
+    z = max(abs(u - mean) - 0.5, 0.0) / math.sqrt(variance)
+    return min(1.0, math.erfc(z / math.sqrt(2)))
+
+@dataclass
+class SampleStats:
+    """Summary of one metric's samples for one model."""
+    n: int
+    mean: float
+    stddev: float
+    p50: float
+    p95: float
+    p99: float
+    # 95% confidence interval for the mean
+    ci_low: float
+    ci_high: float
+
+    @classmethod
+    def from_samples(cls, samples: List[float]) -> Optional["SampleStats"]:
+        if not samples:
+            return None
+        n = len(samples)
+        mean = statistics.fmean(samples)
+        stddev = statistics.stdev(samples) if n > 1 else 0.0
+        half_width = t_critical(n - 1) * stddev / math.sqrt(n) if n > 1 else 0.0
+        return cls(
+            n=n,
+            mean=mean,
+            stddev=stddev,
+            p50=percentile(samples, 0.5),
+            p95=percentile(samples, 0.95),
+            p99=percentile(samples, 0.99),
+            ci_low=mean - half_width,
+            ci_high=mean + half_width
+        )
+
+@dataclass
+class ModelSamples:
+    """Measured samples for one model; warmup runs are not included."""
+    model_name: str
+    samples: Dict[str, List[float]] = field(default_factory=lambda: {metric: [] for metric in METRICS})
+    errors: int = 0
+
+    def add(self, response: Any):
+        if response.error:
+            self.errors += 1
+            return
+        for metric, (attribute, _) in METRICS.items():
+            value = getattr(response, attribute, None)
+            if value is not None:
+                self.samples[metric].append(value)
+
+    def stats(self) -> Dict[str, Optional[SampleStats]]:
+        return {metric: SampleStats.from_samples(values) for metric, values in self.samples.items()}
+
+@dataclass
+class Comparison:
+    """Pairwise test of one metric between two models."""
+    metric: str
+    model_a: str
+    model_b: str
+    mean_a: float
+    mean_b: float
+    p_value: float
+    # Holm-adjusted p-value below alpha
+    significant: bool
+    better: str
+
+@dataclass
+class BenchmarkReport:
+    """Per-model samples and pairwise comparisons from one benchmark run."""
+    results: List[ModelSamples]
+    comparisons: List[Comparison]
+    repetitions: int
+    warmup: int
+    concurrency: int
+    alpha: float
+    elapsed_time: float
+
+def compare(results: List[ModelSamples], alpha: float = 0.05) -> List[Comparison]:
+    """
+    Test every pair of models on every metric.
+
+    p-values are Holm-Bonferroni adjusted within each metric, so with many
+    models selected the chance of any false "significant" flag stays at alpha.
+    """
+    comparisons = []
+    for metric, (_, higher_is_better) in METRICS.items():
+        tests = []
+        for a, b in combinations(results, 2):
+            p_value = mann_whitney_p(a.samples[metric], b.samples[metric])
+            if p_value is None:
+                continue
+            mean_a = statistics.fmean(a.samples[metric])
+            mean_b = statistics.fmean(b.samples[metric])
+            a_better = mean_a > mean_b if higher_is_better else mean_a < mean_b
+            tests.append(Comparison(
+                metric=metric,
+                model_a=a.model_name,
+                model_b=b.model_name,
+                mean_a=mean_a,
+                mean_b=mean_b,
+                p_value=p_value,
+                significant=False,
+                better=a.model_name if a_better else b.model_name
+            ))
+
+        # Holm step-down: stop at the first ordered p-value that fails its threshold
+        for rank, test in enumerate(sorted(tests, key=lambda t: t.p_value)):
+            if test.p_value > alpha / (len(tests) - rank):
+                break
+            test.significant = True
+        comparisons.extend(tests)
+    return comparisons
+
+def _discard_chunk(chunk: str):
+    pass
+
+class LatencyBenchmark:
+    """
+    Repeats one prompt against each model to collect latency distributions.
+
+    Requests are interleaved round-robin across models so slow drifts in
+    network or provider load affect every model alike. Models should be
+    created without a response cache, since cached replies are not samples.
+    """
+
+    def __init__(self, repetitions: int = 20, warmup: int = 2, concurrency: int = 1,
+                 stream: bool = True, alpha: float = 0.05, metrics=metrics_registry):
+        """
+        Initialize the benchmark.
+
+        Args:
+            repetitions: Measured requests per model
+            warmup: Requests per model run first and discarded (connection setup, cold caches)
+            concurrency: Maximum requests in flight across all models
+            stream: Use the streaming path, which is required to measure TTFT
+            alpha: Significance level for pairwise comparisons
+            metrics: MetricsRegistry each measured response is recorded in, or None
+        """
+        self.repetitions = repetitions
+        self.warmup = warmup
+        self.concurrency = concurrency
+        self.stream = stream
+        self.alpha = alpha
+        self.metrics = metrics
+
+    def run(self, models: List[Any], prompt: str, labels: Optional[List[str]] = None,
+            on_sample: Optional[Callable[[int, int], None]] = None) -> BenchmarkReport:
+        """
+        Run warmup and measured repetitions for every model.
+
+        Args:
+            models: Model instances with generate() method
+            prompt: Prompt sent on every repetition
+            labels: Names to report per model (default: model_name)
+            on_sample: Callback invoked with (done, total) as measured requests finish
+
+        Returns:
+            BenchmarkReport with per-model samples and pairwise comparisons
+        """
+        labels = labels or [model.model_name for model in models]
+        results = [ModelSamples(label) for label in labels]
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            # Drain warmup requests before measuring so they never overlap
+            for _ in self._run_round(pool, models, prompt, self.warmup):
+                pass
+
+            total = self.repetitions * len(models)
+            done = 0
+            for index, response in self._run_round(pool, models, prompt, self.repetitions):
+                results[index].add(response)
+                if self.metrics is not None:
+                    self.metrics.record_model(models[index], response)
+                done += 1
+                if on_sample is not None:
+                    on_sample(done, total)
+
+        return BenchmarkReport(
+            results=results,
+            comparisons=compare(results, self.alpha),
+            repetitions=self.repetitions,
+            warmup=self.warmup,
+            concurrency=self.concurrency,
+            alpha=self.alpha,
+            elapsed_time=time.perf_counter() - start
+        )
+
+    def _run_round(self, pool: ThreadPoolExecutor, models: List[Any], prompt: str, repetitions: int):
+        """Submit repetitions × models requests round-robin and yield (index, response) as they finish."""
+        futures = {
+            pool.submit(self._sample, model, prompt): index
+            for _ in range(repetitions)
+            for index, model in enumerate(models)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                response = future.result()
+            except Exception as e:
+                logger.error(f"Error in model at index {index}: {e}")
+                response = create_error_response(models[index].model_name, str(e))
+            yield index, response
+
+    def _sample(self, model: Any, prompt: str):
+        return model.generate(prompt, on_chunk=_discard_chunk if self.stream else None)
@@ -0,0 +1,297 @@
+from collections import deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+import logging
+import math
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Linear-interpolated percentile of a list, or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return ordered[lower]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+@dataclass
+class _Series:
+    """Samples and counters for one (scope, name) pair, e.g. ("model", "gpt-4o")."""
+    requests: int = 0
+    errors: int = 0
+    cache_hits: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    # Lifetime token and cost totals, e.g. "output_tokens" or "cost_usd"
+    totals: Dict[str, float] = field(default_factory=dict)
+    samples: Dict[str, Deque[float]] = field(default_factory=dict)
+    # Latency samples of successful requests only, for quantile(successful=True)
+    successful: Dict[str, Deque[float]] = field(default_factory=dict)
+    sums: Dict[str, float] = field(default_factory=dict)
+    counts: Dict[str, int] = field(default_factory=dict)
+
+    def observe(self, metric: str, value: Optional[float], max_samples: int, success: bool = False):
+        if value is None:
+            return
+        self.samples.setdefault(metric, deque(maxlen=max_samples)).append(value)
+        self.sums[metric] = self.sums.get(metric, 0.0) + value
+        self.counts[metric] = self.counts.get(metric, 0) + 1
+        if success:
+            self.successful.setdefault(metric, deque(maxlen=max_samples)).append(value)
+
+    def add(self, total: str, value: Optional[float]):
+        if value is not None:
+            self.totals[total] = self.totals.get(total, 0) + value
+
+@dataclass
+class MetricsSummary:
+    """Aggregated latency and throughput for one model or provider."""
+    scope: str
+    name: str
+    requests: int
+    errors: int
+    cache_hits: int
+    error_rate: float
+    hedges: int = 0
+    hedge_wins: int = 0
+    latency_p50: Optional[float] = None
+    latency_p95: Optional[float] = None
+    latency_p99: Optional[float] = None
+    ttft_p50: Optional[float] = None
+    ttft_p95: Optional[float] = None
+    tokens_per_second_p50: Optional[float] = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    # Estimated spend in USD for models with configured prices
+    cost: float = 0.0
+    phases_p50: Dict[str, float] = field(default_factory=dict)
+
+class MetricsRegistry:
+    """
+    Thread-safe per-model and per-provider latency histograms.
+
+    Percentiles are computed over the most recent max_samples observations of
+    each series; request, error and sum counters cover the whole process
+    lifetime. Cache hits are counted but kept out of the latency samples.
+    Sinks (e.g. RunHistory.record) receive every recorded response too.
+    """
+
+    def __init__(self, max_samples: int = 10000):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        self._sinks: List[Callable[[str, str, Any], None]] = []
+
+    def add_sink(self, sink: Callable[[str, str, Any], None]):
+        """Also pass every recorded response to sink(provider, model_id, response)."""
+        with self._lock:
+            if sink not in self._sinks:
+                self._sinks.append(sink)
+
+    def record(self, provider: str, model_id: str, response: Any):
+        """
+        Record one ModelResponse for its model and provider.
+
+        Args:
+            provider: Provider name
+            model_id: Model ID (not the display name)
+            response: ModelResponse to record
+        """
+        with self._lock:
+            for key in (("model", model_id), ("provider", provider)):
+                series = self._series.setdefault(key, _Series())
+                series.requests += 1
+                if response.error:
+                    series.errors += 1
+                if response.hedged:
+                    series.hedges += 1
+                if response.hedge_won:
+                    series.hedge_wins += 1
+                if response.cache_hit:
+                    series.cache_hits += 1
+                    continue
+
+                success = not response.error
+                series.observe("latency_seconds", response.elapsed_time, self.max_samples, success)
+                series.observe("ttft_seconds", response.time_to_first_token, self.max_samples, success)
+                series.observe("output_tokens_per_second", response.tokens_per_second, self.max_samples)
+                token_info = response.token_info
+                if token_info is not None and not response.error:
+                    series.add("input_tokens", token_info.input_tokens)
+                    series.add("output_tokens", token_info.output_tokens)
+                    series.add("reasoning_tokens", token_info.reasoning_tokens)
+                series.add("cost_usd", response.cost)
+                for phase, seconds in (response.phase_timings or {}).items():
+                    series.observe(f"phase_{phase}_seconds", seconds, self.max_samples)
+            sinks = list(self._sinks)
+
+        for sink in sinks:
+            try:
+                sink(provider, model_id, response)
+            except Exception as e:
+                logger.warning(f"Metrics sink failed: {e}")
+
+    def record_model(self, model: Any, response: Any):
+        """Record a response for a model instance."""
+        self.record(model.provider or type(model).__name__, model.model_name, response)
+
+    def quantile(self, model_id: str, metric: str, q: float, min_samples: int = 1,
+                 successful: bool = False) -> Optional[float]:
+        """
+        Quantile of a model's recent samples for one metric (e.g. "latency_seconds").
+
+        Args:
+            successful: Only count successful requests (latency_seconds and ttft_seconds)
+
+        Returns:
+            The quantile, or None if fewer than min_samples samples were recorded
+        """
+        with self._lock:
+            series = self._series.get(("model", model_id))
+            samples = (series.successful if successful else series.samples) if series else {}
+            values = list(samples.get(metric, ()))
+        if len(values) < max(min_samples, 1):
+            return None
+        return percentile(values, q)
+
+    def summaries(self, scope: Optional[str] = None) -> List[MetricsSummary]:
+        """Get per-model and per-provider summaries, optionally for one scope."""
+        with self._lock:
+            snapshot = [
+                (key, series.requests, series.errors, series.cache_hits, series.hedges, series.hedge_wins,
+                 dict(series.totals), {metric: list(values) for metric, values in series.samples.items()})
+                for key, series in self._series.items()
+                if scope is None or key[0] == scope
+            ]
+
+        summaries = []
+        for (series_scope, name), requests, errors, cache_hits, hedges, hedge_wins, totals, samples in sorted(snapshot):
+            latency = samples.get("latency_seconds", [])
+            ttft = samples.get("ttft_seconds", [])
+            summaries.append(MetricsSummary(
+                scope=series_scope,
+                name=name,
+                requests=requests,
+                errors=errors,
+                cache_hits=cache_hits,
+                error_rate=errors / requests if requests else 0.0,
+                hedges=hedges,
+                hedge_wins=hedge_wins,
+                latency_p50=percentile(latency, 0.5),
+                latency_p95=percentile(latency, 0.95),
+                latency_p99=percentile(latency, 0.99),
+                ttft_p50=percentile(ttft, 0.5),
+                ttft_p95=percentile(ttft, 0.95),
+                tokens_per_second_p50=percentile(samples.get("output_tokens_per_second", []), 0.5),
+                input_tokens=int(totals.get("input_tokens", 0)),
+                output_tokens=int(totals.get("output_tokens", 0)),
+                cost=totals.get("cost_usd", 0.0),
+                phases_p50={
+                    metric[len("phase_"):-len("_seconds")]: percentile(values, 0.5)
+                    for metric, values in samples.items()
+                    if metric.startswith("phase_")
+                }
+            ))
+        return summaries
+
+    def to_prometheus(self) -> str:
+        """Render all series in the Prometheus text exposition format."""
+        with self._lock:
+            snapshot = [
+                (key, series.requests, series.errors, series.cache_hits, series.hedges, series.hedge_wins,
+                 dict(series.totals), {metric: sorted(values) for metric, values in series.samples.items()},
+                 dict(series.sums), dict(series.counts))
+                for key, series in sorted(self._series.items())
+            ]
+
+        counters = {
+            "requests_total": {}, "errors_total": {}, "cache_hits_total": {},
+            "hedges_total": {}, "hedge_wins_total": {},
+            "input_tokens_total": {}, "output_tokens_total": {}, "reasoning_tokens_total": {},
+            "cost_usd_total": {},
+        }
+        summaries: Dict[str, List[str]] = {}
+        for (scope, name), requests, errors, cache_hits, hedges, hedge_wins, totals, samples, sums, counts in snapshot:
+            labels = f'{scope}="{_escape(name)}"'
+            counters["requests_total"][labels] = requests
+            counters["errors_total"][labels] = errors
+            counters["cache_hits_total"][labels] = cache_hits
+            counters["hedges_total"][labels] = hedges
+            counters["hedge_wins_total"][labels] = hedge_wins
+            for total, value in totals.items():
+                counters[f"{total}_total"][labels] = value
+            for metric, values in samples.items():
+                lines = summaries.setdefault(metric, [])
+                for q in QUANTILES:
+                    lines.append(f'llm_{metric}{{{labels},quantile="{q}"}} {percentile(values, q)}')
+                lines.append(f"llm_{metric}_sum{{{labels}}} {sums[metric]}")
+                lines.append(f"llm_{metric}_count{{{labels}}} {counts[metric]}")
+
+        output = []
+        for metric, values in counters.items():
+            output.append(f"# TYPE llm_{metric} counter")
+            output.extend(f"llm_{metric}{{{labels}}} {value}" for labels, value in values.items())
+        for metric, lines in sorted(summaries.items()):
+            output.append(f"# TYPE llm_{metric} summary")
+            output.extend(lines)
+        return "\n".join(output) + "\n"
+
+    def export(self, path: str):
+        """Write the Prometheus text format to a file atomically (e.g. for node_exporter's textfile collector)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        """Drop all recorded series."""
+        with self._lock:
+            self._series.clear()
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def start_metrics_server(registry: "MetricsRegistry", port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serve the registry at http://host:port/metrics on a background thread.
+
+    Args:
+        registry: Registry to expose
+        port: Port to listen on
+        host: Interface to bind
+
+    Returns:
+        The running server; call shutdown() to stop it
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
+
+# Shared registry fed by the executors
+metrics_registry = MetricsRegistry()
\ No newline at end of file
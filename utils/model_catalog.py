@@ -0,0 +1,266 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = os.path.join(".cache", "model_catalog.json")
+DEFAULT_CATALOG_TTL = 24 * 3600
+
+# API key variable of each provider; providers without a key are not fetched
+PROVIDER_ENV_VARS = {
+    "openai": "OPENAI_API_KEY",
+    "claude": "ANTHROPIC_API_KEY",
+    "gemini": "GOOGLE_API_KEY",
+    "grok": "XAI_API_KEY",
+}
+
+@dataclass
+class CatalogEntry:
+    """Model IDs one provider listed, when they were fetched and the listing's ETag."""
+    provider: str
+    model_ids: List[str] = field(default_factory=list)
+    fetched_at: float = 0.0
+    etag: Optional[str] = None
+
+    def age(self, now: Optional[float] = None) -> float:
+        """Seconds since the listing was fetched or last confirmed unchanged."""
+        return (now if now is not None else time.time()) - self.fetched_at
+
+@dataclass
+class FetchResult:
+    """Outcome of refreshing one provider's listing."""
+    provider: str
+    entry: Optional[CatalogEntry] = None
+    # "cached" (still within the TTL), "fetched", "not_modified" or "error"
+    source: str = "error"
+    error: Optional[str] = None
+    elapsed_time: float = 0.0
+
+def format_age(seconds: float) -> str:
+    """Compact age such as 45s, 12m, 3h or 2d."""
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size:
+            return f"{int(seconds // size)}{unit}"
+    return f"{int(max(seconds, 0))}s"
+
+class NotModified(Exception):
+    """The provider answered a conditional request with 304 Not Modified."""
+
+def _get(client, url: str, headers: Dict[str, str], etag: Optional[str] = None,
+         params: Optional[Dict[str, str]] = None):
+    """GET a listing page, sending If-None-Match when an ETag is known."""
+    if etag:
+        headers = {**headers, "If-None-Match": etag}
+    response = client.get(url, headers=headers, params=params)
+    if response.status_code == 304:
+        raise NotModified()
+    response.raise_for_status()
+    return response
+
+def fetch_openai_models(client, etag: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+    """List OpenAI models; returns their IDs and the listing's ETag."""
+    base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+    headers = {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"}
+    response = _get(client, f"{base_url}/models", headers, etag)
+    return [m["id"] for m in response.json()["data"]], response.headers.get("ETag")
+
+def fetch_claude_models(client, etag: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+    """List Anthropic models page by page; the ETag is kept only for single-page listings."""
+    base_url = os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com").rstrip("/")
+    headers = {"x-api-key": os.getenv("ANTHROPIC_API_KEY"), "anthropic-version": "2023-06-01"}
+    params = {"limit": "1000"}
+    model_ids = []
+    while True:
+        response = _get(client, f"{base_url}/v1/models", headers, etag, params)
+        body = response.json()
+        model_ids.extend(m["id"] for m in body["data"])
+        if not body.get("has_more"):
+            single_page = "after_id" not in params
+            return model_ids, response.headers.get("ETag") if single_page else None
+        params["after_id"] = body["last_id"]
+        etag = None
+
+def fetch_gemini_models(client, etag: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+    """List Gemini models page by page; the ETag is kept only for single-page listings."""
+    base_url = os.getenv("GOOGLE_GEMINI_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/")
+    headers = {"x-goog-api-key": os.getenv("GOOGLE_API_KEY")}
+    params = {"pageSize": "1000"}
+    model_ids = []
+    while True:
+        response = _get(client, f"{base_url}/v1beta/models", headers, etag, params)
+        body = response.json()
+        model_ids.extend(m["name"].removeprefix("models/") for m in body.get("models", []))
+        if not body.get("nextPageToken"):
+            single_page = "pageToken" not in params
+            return model_ids, response.headers.get("ETag") if single_page else None
+        params["pageToken"] = body["nextPageToken"]
+        etag = None
+
+def fetch_grok_models(client, etag: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+    """List xAI models (OpenAI-compatible endpoint)."""
+    base_url = os.getenv("XAI_BASE_URL", "https://api.x.ai/v1").rstrip("/")
+    headers = {"Authorization": f"Bearer {os.getenv('XAI_API_KEY')}"}
+    response = _get(client, f"{base_url}/models", headers, etag)
+    return [m["id"] for m in response.json()["data"]], response.headers.get("ETag")
+
+FETCHERS: Dict[str, Callable] = {
+    "openai": fetch_openai_models,
+    "claude": fetch_claude_models,
+    "gemini": fetch_gemini_models,
+    "grok": fetch_grok_models,
+}
+
+class ModelCatalog:
+    """
+    On-disk cache of the model IDs each provider's list endpoint returns.
+
+    refresh() fetches stale providers concurrently over one shared HTTP
+    client, revalidating with If-None-Match where a listing had an ETag, and
+    keeps the last good listing when a fetch fails or times out. Readers such
+    as the Streamlit app only load the JSON file, so validating the model
+    configuration against it needs no network access.
+    """
+
+    def __init__(self, path: str = DEFAULT_CATALOG_PATH, ttl_seconds: float = DEFAULT_CATALOG_TTL):
+        """
+        Initialize the catalog, loading the file if it exists.
+
+        Args:
+            path: JSON file the catalog is kept in
+            ttl_seconds: Age after which refresh() fetches a provider's listing again
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[str, CatalogEntry] = {}
+        self._mtime_ns: Optional[int] = None
+        self.reload()
+
+    def reload(self) -> bool:
+        """Re-read the file if it changed since it was last read; returns whether it did."""
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+        with self._lock:
+            if mtime_ns == self._mtime_ns:
+                return False
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                self._entries = {
+                    provider: CatalogEntry(**entry) for provider, entry in data.get("providers", {}).items()
+                }
+            except (OSError, ValueError, TypeError) as e:
+                logger.warning(f"Ignoring unreadable model catalog {self.path}: {e}")
+                self._entries = {}
+            self._mtime_ns = mtime_ns
+            return True
+
+    def get(self, provider: str) -> Optional[CatalogEntry]:
+        """The cached listing for a provider, or None if it was never fetched."""
+        with self._lock:
+            return self._entries.get(provider)
+
+    def is_fresh(self, provider: str, now: Optional[float] = None) -> bool:
+        """Whether the provider's listing is younger than the TTL."""
+        entry = self.get(provider)
+        return entry is not None and entry.age(now) < self.ttl_seconds
+
+    def put(self, entry: CatalogEntry):
+        """Store a provider's listing and write the catalog file."""
+        with self._lock:
+            self._entries[entry.provider] = entry
+            self._save()
+
+    def _save(self):
+        """Write all entries atomically, so concurrent readers never see a partial file."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"providers": {p: asdict(e) for p, e in self._entries.items()}}, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._mtime_ns = os.stat(self.path).st_mtime_ns
+
+    def refresh(self, providers: Optional[Iterable[str]] = None, force: bool = False,
+                timeout: float = 15.0) -> Dict[str, FetchResult]:
+        """
+        Fetch the listings of stale providers concurrently.
+
+        Args:
+            providers: Providers to refresh (default: all with a fetcher)
+            force: Fetch even listings still within the TTL
+            timeout: Seconds allowed per HTTP request, and for all fetches together
+
+        Returns:
+            A FetchResult per provider, in the order given
+        """
+        import httpx
+
+        providers = list(providers if providers is not None else FETCHERS)
+        results = {}
+        stale = []
+        for provider in providers:
+            if not force and self.is_fresh(provider):
+                results[provider] = FetchResult(provider, entry=self.get(provider), source="cached")
+            else:
+                stale.append(provider)
+
+        if stale:
+            pool = ThreadPoolExecutor(max_workers=len(stale), thread_name_prefix="catalog")
+            with httpx.Client(timeout=timeout) as client:
+                try:
+                    futures = {pool.submit(self._refresh_one, client, provider): provider for provider in stale}
+                    done, pending = wait(futures, timeout=timeout)
+                    for future in done:
+                        results[futures[future]] = future.result()
+                    for future in pending:
+                        provider = futures[future]
+                        results[provider] = FetchResult(
+                            provider, entry=self.get(provider), error=f"Timed out after {timeout:g}s"
+                        )
+                finally:
+                    # Don't wait for stragglers (e.g. a slow multi-page listing); closing the client ends them
+                    pool.shutdown(wait=False)
+        return {provider: results[provider] for provider in providers}
+
+    def _refresh_one(self, client, provider: str) -> FetchResult:
+        """Fetch or revalidate one provider's listing; errors keep the previous listing."""
+        start = time.perf_counter()
+        previous = self.get(provider)
+        try:
+            model_ids, etag = FETCHERS[provider](client, previous.etag if previous else None)
+            entry = CatalogEntry(provider, model_ids=model_ids, fetched_at=time.time(), etag=etag)
+            source = "fetched"
+        except NotModified:
+            entry = CatalogEntry(provider, previous.model_ids, fetched_at=time.time(), etag=previous.etag)
+            source = "not_modified"
+        except Exception as e:
+            logger.info(f"Fetching the {provider} model list failed: {e}")
+            return FetchResult(provider, entry=previous, error=str(e), elapsed_time=time.perf_counter() - start)
+        self.put(entry)
+        return FetchResult(provider, entry=entry, source=source, elapsed_time=time.perf_counter() - start)
+
+    def validate(self, models: Iterable) -> List[str]:
+        """
+        Issues for configured models missing from their provider's cached listing.
+
+        Providers never fetched are skipped, so a missing catalog means no issues.
+        """
+        issues = []
+        for model in models:
+            entry = self.get(model.provider)
+            if entry is not None and model.model_id not in entry.model_ids:
+                issues.append(
+                    f"Model '{model.model_id}' is not in the {model.provider} model list "
+                    f"fetched {format_age(entry.age())} ago (run check_models.py to refresh)"
+                )
+        return issues
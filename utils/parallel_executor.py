@@ -1,74 +1,299 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Callable, Any
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import List, Callable, Any, Iterable, Iterator, Optional, Tuple
 import logging
+import queue
+import time
+
+from models.cancellation import CancelScope
+from .metrics import metrics_registry
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class StreamEvent:
+    """A streamed text chunk or a final response for the model at ``index``."""
+    index: int
+    chunk: Optional[str] = None
+    response: Optional[Any] = None
+
 class ParallelExecutor:
     """Executes multiple tasks in parallel using ThreadPoolExecutor."""
     
-    def __init__(self, max_workers: int = None):
+    def __init__(self, max_workers: int = None, scheduler=None, metrics=metrics_registry,
+                 hedge_policy=None):
         """
         Initialize the parallel executor.
         
         Args:
             max_workers: Maximum number of worker threads. If None, uses default.
+            scheduler: Optional long-lived ProviderScheduler. When given, requests
+                run in its per-provider pools instead of a per-call thread pool.
+            metrics: MetricsRegistry each response is recorded in, or None
+            hedge_policy: Optional HedgePolicy. When given, requests slower than
+                their model's usual latency get a duplicate (hedge) request.
         """
         self.max_workers = max_workers
+        self.scheduler = scheduler
+        self.metrics = metrics
+        self.hedge_policy = hedge_policy
+    
+    @contextmanager
+    def _submitter(self):
+        """Yield a submit(model, fn, *args) function backed by the scheduler or a temporary pool."""
+        if self.scheduler is not None:
+            yield lambda model, fn, *args: self.scheduler.submit(model.provider, fn, *args)
+            return
+        
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            yield lambda model, fn, *args: executor.submit(fn, *args)
+        finally:
+            # Don't wait for stragglers cut off by a deadline or cancellation
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _generate(self, scope: CancelScope, model, prompt: str,
+                  on_chunk: Optional[Callable[[str], None]] = None):
+        """Run one request under the comparison's scope, hedged when a policy is set."""
+        with scope.activate():
+            if self.hedge_policy is not None:
+                return self.hedge_policy.generate(model, prompt, on_chunk=on_chunk, scheduler=self.scheduler)
+            return model.generate(prompt, on_chunk=on_chunk)
     
-    def execute_parallel(self, models: List[Any], prompt: str) -> List[Any]:
+    def execute_parallel(self, models: List[Any], prompt: str,
+                         on_complete: Optional[Callable[[int, Any], None]] = None,
+                         scope: Optional[CancelScope] = None) -> List[Any]:
         """
         Execute model generation requests in parallel.
         
         Args:
             models: List of model instances with generate() method
             prompt: The prompt to send to all models
+            on_complete: Optional callback invoked with (index, response) on the
+                calling thread as each model finishes
+            scope: Optional CancelScope carrying the comparison's deadline
             
         Returns:
-            List of ModelResponse objects in the same order as input models
+            List of ModelResponse objects in the same order as input models.
+            For very large fan-outs use iter_results(), which doesn't hold
+            every response at once.
+        """
+        results = [None] * len(models)
+        
+        for index, result in self.iter_completed(models, prompt, scope=scope):
+            results[index] = result
+            if on_complete is not None:
+                on_complete(index, result)
+        
+        return results
+    
+    def iter_completed(self, models: List[Any], prompt: str,
+                       scope: Optional[CancelScope] = None) -> Iterator[Tuple[int, Any]]:
+        """
+        Execute model generation requests in parallel, yielding results as they finish.
+        
+        Once the scope's deadline passes or it is cancelled, requests still
+        running are cancelled and yielded as error responses, so every index
+        is still yielded exactly once. Closing the generator early cancels
+        the scope.
+        
+        Args:
+            models: List of model instances with generate() method
+            prompt: The prompt to send to all models
+            scope: Optional CancelScope carrying the comparison's deadline
+            
+        Yields:
+            (index, ModelResponse) pairs in completion order, where index is the
+            model's position in models
         """
         if not models:
-            return []
+            return
         
-        results = [None] * len(models)
+        yield from self.iter_results(((model, prompt) for model in models), scope=scope)
+    
+    def iter_results(self, tasks: Iterable[Tuple[Any, str]], max_in_flight: Optional[int] = None,
+                     scope: Optional[CancelScope] = None) -> Iterator[Tuple[int, Any]]:
+        """
+        Run (model, prompt) tasks with at most max_in_flight requests outstanding.
+        
+        Tasks are taken from the iterable only when a slot is free, and a
+        freed slot is refilled only when the consumer asks for the next
+        result, so a slow consumer holds back new requests instead of letting
+        finished responses pile up. Only in-flight tasks are tracked, which
+        keeps memory flat for fan-outs of any size as long as the consumer
+        doesn't collect the results itself.
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Submit all tasks
-            future_to_index = {
-                executor.submit(model.generate, prompt): i
-                for i, model in enumerate(models)
-            }
+        Deadlines and cancellation work as in iter_completed(): every task,
+        including those never submitted, is yielded exactly once.
+        
+        Args:
+            tasks: Iterable of (model, prompt) pairs, consumed lazily
+            max_in_flight: Maximum requests outstanding (None submits every task at once)
+            scope: Optional CancelScope carrying the run's deadline
             
-            # Collect results as they complete
-            for future in as_completed(future_to_index):
-                index = future_to_index[future]
-                try:
-                    result = future.result()
-                    results[index] = result
-                    logger.debug(f"Completed request for model at index {index}")
-                except Exception as e:
-                    logger.error(f"Error in model at index {index}: {e}")
-                    # The model's generate method should already handle errors
-                    # and return a ModelResponse with error information
-                    results[index] = self._create_error_response(
-                        models[index].model_name, str(e)
-                    )
+        Yields:
+            (index, ModelResponse) pairs in completion order, where index is the
+            task's position in tasks
+        """
+        if max_in_flight is not None and max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
         
-        return results
+        scope = scope or CancelScope()
+        start = time.perf_counter()
+        done = queue.Queue()
+        # Wakes the wait below if the scope is cancelled from another thread
+        scope.add_callback(lambda: done.put(None))
+        tasks = enumerate(tasks)
+        in_flight = {}
+        
+        with self._submitter() as submit:
+            try:
+                while True:
+                    # Top up the free slots
+                    while not scope.cancelled and (max_in_flight is None or len(in_flight) < max_in_flight):
+                        task = next(tasks, None)
+                        if task is None:
+                            break
+                        index, (model, prompt) = task
+                        future = submit(model, self._generate, scope, model, prompt)
+                        in_flight[future] = (index, model)
+                        future.add_done_callback(done.put)
+                    if not in_flight:
+                        break
+                    
+                    try:
+                        future = done.get(timeout=scope.remaining())
+                    except queue.Empty:
+                        future = None
+                    if future is None:
+                        scope.cancel(scope.reason or scope.deadline_message())
+                        break
+                    index, model = in_flight.pop(future)
+                    yield index, self._future_result(future, model)
+                
+                # Deadline passed or cancelled: report the stragglers
+                while in_flight:
+                    future, (index, model) = in_flight.popitem()
+                    if future.done() and not future.cancelled():
+                        yield index, self._future_result(future, model)
+                    else:
+                        future.cancel()
+                        yield index, self._unfinished_response(model, scope, start)
+                
+                # ...and the tasks that were never submitted
+                for index, (model, _) in tasks:
+                    yield index, self._unfinished_response(model, scope, start)
+            finally:
+                if in_flight:
+                    # The consumer stopped early, e.g. on a Streamlit rerun
+                    scope.cancel("Cancelled")
+                    for future in in_flight:
+                        future.cancel()
+    
+    def execute_streaming(self, models: List[Any], prompt: str,
+                          scope: Optional[CancelScope] = None) -> Iterator[StreamEvent]:
+        """
+        Execute streaming generation requests in parallel.
+        
+        Events are yielded on the calling thread, so UI code can consume them
+        directly; worker threads only push onto an internal queue. Once the
+        scope's deadline passes or it is cancelled, unfinished streams stop at
+        their next chunk and get an error response. Closing the generator
+        early cancels the scope.
+        
+        Args:
+            models: List of model instances with generate(prompt, on_chunk) method
+            prompt: The prompt to send to all models
+            scope: Optional CancelScope carrying the comparison's deadline
+            
+        Yields:
+            StreamEvent objects: one per text chunk, and exactly one carrying the
+            final ModelResponse for each model index
+        """
+        if not models:
+            return
+        
+        scope = scope or CancelScope()
+        start = time.perf_counter()
+        events = queue.Queue()
+        scope.add_callback(lambda: events.put(None))
+        
+        def run(index: int, model):
+            try:
+                response = self._generate(
+                    scope, model, prompt, on_chunk=lambda chunk: events.put(StreamEvent(index, chunk=chunk))
+                )
+            except Exception as e:
+                logger.error(f"Error in model at index {index}: {e}")
+                response = self._create_error_response(model.model_name, str(e))
+            events.put(StreamEvent(index, response=response))
+        
+        with self._submitter() as submit:
+            futures = [submit(model, run, i, model) for i, model in enumerate(models)]
+            
+            pending = set(range(len(models)))
+            try:
+                while pending:
+                    try:
+                        event = events.get(timeout=scope.remaining())
+                    except queue.Empty:
+                        event = None
+                    if event is None:
+                        scope.cancel(scope.reason or scope.deadline_message())
+                        break
+                    if event.response is not None:
+                        pending.discard(event.index)
+                        if self.metrics is not None:
+                            self.metrics.record_model(models[event.index], event.response)
+                        logger.debug(f"Completed streaming request for model at index {event.index}")
+                    yield event
+                
+                # Deadline passed or cancelled: close out the unfinished models
+                for index in sorted(pending):
+                    futures[index].cancel()
+                    pending.discard(index)
+                    yield StreamEvent(index, response=self._unfinished_response(models[index], scope, start))
+            finally:
+                if pending:
+                    # The consumer stopped early, e.g. on a Streamlit rerun
+                    scope.cancel("Cancelled")
+                    for index in pending:
+                        futures[index].cancel()
+    
+    def _future_result(self, future, model):
+        """Get a finished request's response and record it in the metrics."""
+        try:
+            result = future.result()
+            logger.debug(f"Completed request for {model.model_name}")
+        except Exception as e:
+            logger.error(f"Error in {model.model_name}: {e}")
+            # The model's generate method should already handle errors
+            # and return a ModelResponse with error information
+            result = self._create_error_response(model.model_name, str(e))
+        if self.metrics is not None:
+            self.metrics.record_model(model, result)
+        return result
+    
+    def _unfinished_response(self, model, scope: CancelScope, start: float):
+        """Error response for a request cut off by the deadline or a cancellation."""
+        response = self._create_error_response(model.model_name, scope.reason or "Cancelled")
+        response.elapsed_time = time.perf_counter() - start
+        if self.metrics is not None:
+            self.metrics.record_model(model, response)
+        return response
     
     def _create_error_response(self, model_name: str, error_msg: str):
         """Create a standardized error response."""
-        from models.base import ModelResponse, TokenInfo
-        
-        error_token_info = TokenInfo(
-            input_tokens='Error',
-            output_tokens='Error',
-            total_tokens='Error'
-        )
-        
-        return ModelResponse(
-            model_name=model_name,
-            token_info=error_token_info,
-            elapsed_time=0.0,
-            error=error_msg
-        ) 
\ No newline at end of file
+        return create_error_response(model_name, error_msg)
+
+def create_error_response(model_name: str, error_msg: str):
+    """Create a standardized error response for a request that never returned one."""
+    from models.base import ModelResponse, TokenInfo
+    
+    return ModelResponse(
+        model_name=model_name,
+        token_info=TokenInfo(),
+        elapsed_time=0.0,
+        error=error_msg
+    ) 
\ No newline at end of file
@@ -0,0 +1,124 @@
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass
+from typing import Dict, List, Callable
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class BulkheadMetrics:
+    """Live counters for one provider's worker pool."""
+    provider: str
+    max_workers: int
+    queued: int = 0
+    in_flight: int = 0
+    completed: int = 0
+    failed: int = 0
+
+class ProviderScheduler:
+    """
+    Long-lived scheduler with a separate bounded worker pool (bulkhead) per provider.
+
+    Each provider's requests queue only behind requests to the same provider,
+    so a slow or saturated provider cannot hold up the others. Pools are
+    created on first use and kept until shutdown() so their threads and
+    connections are reused across comparisons.
+    """
+
+    def __init__(self, limits: Dict[str, int] = None, default_limit: int = 4):
+        """
+        Initialize the scheduler.
+
+        Args:
+            limits: Maximum concurrent requests per provider
+            default_limit: Limit for providers missing from limits
+        """
+        self.limits = dict(limits or {})
+        self.default_limit = default_limit
+        self._lock = threading.Lock()
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+        self._metrics: Dict[str, BulkheadMetrics] = {}
+
+    @classmethod
+    def from_config(cls, config_manager) -> "ProviderScheduler":
+        """Build a scheduler using provider limits from a ConfigManager."""
+        limits = {
+            provider: settings.max_concurrency
+            for provider, settings in config_manager.providers.items()
+        }
+        return cls(limits=limits)
+
+    def submit(self, provider: str, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Queue a call on the given provider's pool.
+
+        Args:
+            provider: Provider whose bulkhead runs the call
+            fn: Callable to run
+            *args, **kwargs: Arguments for fn
+
+        Returns:
+            Future for the call's result
+        """
+        pool, metrics = self._get_pool(provider)
+
+        def run():
+            with self._lock:
+                metrics.queued -= 1
+                metrics.in_flight += 1
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                with self._lock:
+                    metrics.failed += 1
+                raise
+            finally:
+                with self._lock:
+                    metrics.in_flight -= 1
+                    metrics.completed += 1
+            return result
+
+        with self._lock:
+            metrics.queued += 1
+        try:
+            future = pool.submit(run)
+        except Exception:
+            with self._lock:
+                metrics.queued -= 1
+            raise
+
+        def dequeue_if_cancelled(f: Future):
+            # A call cancelled while queued (e.g. past its deadline) never runs
+            if f.cancelled():
+                with self._lock:
+                    metrics.queued -= 1
+
+        future.add_done_callback(dequeue_if_cancelled)
+        return future
+
+    def metrics(self) -> List[BulkheadMetrics]:
+        """Get a snapshot of queue depth and in-flight counts per provider."""
+        with self._lock:
+            return [BulkheadMetrics(**vars(m)) for m in self._metrics.values()]
+
+    def shutdown(self, wait: bool = True):
+        """Shut down all provider pools."""
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+            self._metrics.clear()
+        for pool in pools:
+            pool.shutdown(wait=wait)
+
+    def _get_pool(self, provider: str):
+        """Get or create the worker pool and metrics for a provider."""
+        with self._lock:
+            pool = self._pools.get(provider)
+            if pool is None:
+                limit = self.limits.get(provider, self.default_limit)
+                pool = ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"bulkhead-{provider}")
+                self._pools[provider] = pool
+                self._metrics[provider] = BulkheadMetrics(provider=provider, max_workers=limit)
+                logger.debug(f"Created {provider} bulkhead with {limit} workers")
+            return pool, self._metrics[provider]
\ No newline at end of file
@@ -0,0 +1,239 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from .similar_prompts import MinHashLSH, jaccard, shingles
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "responses.sqlite3")
+
+@dataclass
+class SimilarMatch:
+    """A cached entry whose prompt is a near-duplicate of the one looked up."""
+    key: str
+    prompt: str
+    similarity: float
+
+class ResponseCache:
+    """
+    On-disk cache of successful model responses, backed by SQLite.
+
+    Entries expire after ttl_seconds and the least recently used entries are
+    evicted once the cache exceeds max_entries or max_bytes. The cache stores
+    JSON payloads under opaque keys; building keys and (de)serializing
+    responses is left to the caller.
+
+    Entries stored with their prompt are also indexed for near-duplicate
+    lookup: MinHash signatures of the normalized prompt's word shingles are
+    split into LSH bands, so find_similar() only compares against entries
+    sharing a band bucket, then confirms with the exact Jaccard similarity.
+    Indexing a long prompt is costly, so callers pass the prompt only when
+    they look up similar prompts.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl_seconds: float = 7 * 24 * 3600,
+                 max_entries: int = 10000, max_bytes: Optional[int] = 256 * 1024 * 1024):
+        """
+        Initialize the cache, creating the database if needed.
+
+        Args:
+            path: SQLite database file
+            ttl_seconds: Age after which entries are treated as missing. None disables expiry.
+            max_entries: Maximum number of entries kept
+            max_bytes: Maximum total payload size kept. None disables the limit.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._write_lock:
+            conn = self._connection()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    model_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS prompts (
+                    key TEXT PRIMARY KEY,
+                    prompt TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS prompt_buckets (
+                    bucket INTEGER NOT NULL,
+                    key TEXT NOT NULL,
+                    PRIMARY KEY (bucket, key)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_prompt_buckets_key ON prompt_buckets (key);
+                CREATE TRIGGER IF NOT EXISTS responses_drop_prompt AFTER DELETE ON responses BEGIN
+                    DELETE FROM prompts WHERE key = old.key;
+                    DELETE FROM prompt_buckets WHERE key = old.key;
+                END;
+            """)
+            conn.commit()
+        self._lsh = MinHashLSH()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection; sqlite3 connections are not shared across threads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached payload.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The stored payload, or None if missing or expired
+        """
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT payload, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        payload, created_at = row
+        now = time.time()
+        with self._write_lock:
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+
+        return json.loads(payload)
+
+    def put(self, key: str, payload: Dict[str, Any], provider: str = "", model_id: str = "",
+            prompt: Optional[str] = None, scope: str = ""):
+        """
+        Store a payload and evict least recently used entries over the limits.
+
+        Args:
+            key: Cache key
+            payload: JSON-serializable response data
+            provider: Provider name, kept for inspection and clearing
+            model_id: Model ID, kept for inspection and clearing
+            prompt: Prompt to index for find_similar(); None skips indexing
+            scope: Namespace find_similar() must match, e.g. model and sampling parameters
+        """
+        data = json.dumps(payload)
+        now = time.time()
+        buckets = self._lsh.buckets(self._lsh.signature(shingles(prompt)), scope) if prompt is not None else []
+        conn = self._connection()
+        with self._write_lock:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, provider, model_id, payload, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model_id, data, len(data), now, now)
+            )
+            if prompt is not None:
+                conn.execute("INSERT OR REPLACE INTO prompts (key, prompt) VALUES (?, ?)", (key, prompt))
+                conn.execute("DELETE FROM prompt_buckets WHERE key = ?", (key,))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO prompt_buckets (bucket, key) VALUES (?, ?)",
+                    [(bucket, key) for bucket in buckets]
+                )
+            self._evict(conn)
+            conn.commit()
+
+    def find_similar(self, prompt: str, scope: str = "", threshold: float = 0.8) -> Optional[SimilarMatch]:
+        """
+        Find the cached entry with the most similar prompt in a scope.
+
+        Args:
+            prompt: Prompt to match
+            scope: Namespace the entry was stored under
+            threshold: Minimum Jaccard similarity of the prompts' normalized word shingles
+
+        Returns:
+            The best unexpired match at or above the threshold, or None
+        """
+        query = shingles(prompt)
+        buckets = self._lsh.buckets(self._lsh.signature(query), scope)
+        # Expired entries would be returned as the best match only for get() to miss on them
+        oldest = time.time() - self.ttl_seconds if self.ttl_seconds is not None else float("-inf")
+        conn = self._connection()
+        candidates = conn.execute(
+            f"SELECT DISTINCT p.key, p.prompt FROM prompt_buckets b "
+            f"JOIN prompts p ON p.key = b.key JOIN responses r ON r.key = b.key "
+            f"WHERE b.bucket IN ({', '.join('?' * len(buckets))}) AND r.created_at >= ?",
+            (*buckets, oldest)
+        ).fetchall()
+
+        best = None
+        for key, candidate in candidates:
+            similarity = jaccard(query, shingles(candidate))
+            if similarity >= threshold and (best is None or similarity > best.similarity):
+                best = SimilarMatch(key, candidate, similarity)
+        return best
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop least recently used entries until the cache is within its limits."""
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+        excess = max(0, count - self.max_entries) if self.max_entries else 0
+        if excess:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access LIMIT ?)", (excess,)
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+        if self.max_bytes is None or total <= self.max_bytes:
+            return
+
+        to_free = total - self.max_bytes
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            victims.append((key,))
+            to_free -= size
+            if to_free <= 0:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        logger.debug(f"Evicted {len(victims)} cache entries over the size limit")
+
+    def clear(self, model_id: Optional[str] = None):
+        """Remove all entries, or only those for one model."""
+        conn = self._connection()
+        with self._write_lock:
+            if model_id is None:
+                conn.execute("DELETE FROM responses")
+            else:
+                conn.execute("DELETE FROM responses WHERE model_id = ?", (model_id,))
+            conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Get entry count and total payload size."""
+        count, total = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        return {"entries": count, "bytes": total}
\ No newline at end of file
@@ -0,0 +1,420 @@
+import atexit
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_PATH = os.path.join(".cache", "history.sqlite3")
+
+# Granularity of the pre-aggregated rollups; trend buckets are multiples of it
+ROLLUP_SECONDS = 3600
+
+# Latency histograms use log-spaced bins this factor wide (about ±2.5% error)
+BIN_GROWTH = 1.05
+MIN_BIN_VALUE = 0.001
+
+# Per-request values kept in the rollup histograms
+HISTOGRAM_METRICS = ("latency", "ttft")
+
+# Stored in PRAGMA user_version; 2 keys the rollups by provider as well as model
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER PRIMARY KEY,
+        created_at REAL NOT NULL,
+        provider TEXT NOT NULL,
+        model_id TEXT NOT NULL,
+        latency REAL,
+        ttft REAL,
+        tokens_per_second REAL,
+        input_tokens INTEGER,
+        output_tokens INTEGER,
+        cost REAL,
+        cache_hit INTEGER NOT NULL,
+        hedged INTEGER NOT NULL,
+        error TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_runs_created_at ON runs (created_at);
+    CREATE INDEX IF NOT EXISTS idx_runs_model ON runs (model_id, created_at);
+    CREATE INDEX IF NOT EXISTS idx_runs_provider ON runs (provider, created_at);
+
+    CREATE TABLE IF NOT EXISTS runs_hourly (
+        bucket INTEGER NOT NULL,
+        model_id TEXT NOT NULL,
+        provider TEXT NOT NULL,
+        requests INTEGER NOT NULL,
+        errors INTEGER NOT NULL,
+        cache_hits INTEGER NOT NULL,
+        latency_sum REAL NOT NULL,
+        latency_count INTEGER NOT NULL,
+        ttft_sum REAL NOT NULL,
+        ttft_count INTEGER NOT NULL,
+        tps_sum REAL NOT NULL,
+        tps_count INTEGER NOT NULL,
+        output_tokens INTEGER NOT NULL,
+        cost REAL NOT NULL,
+        PRIMARY KEY (bucket, model_id, provider)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_runs_hourly_model ON runs_hourly (model_id, bucket);
+
+    CREATE TABLE IF NOT EXISTS runs_hourly_bins (
+        bucket INTEGER NOT NULL,
+        model_id TEXT NOT NULL,
+        provider TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        bin INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (bucket, model_id, provider, metric, bin)
+    ) WITHOUT ROWID;
+"""
+
+# Moves version 1 rollups, keyed by (bucket, model_id) only, aside; SCHEMA then creates the new tables
+MIGRATE_V1_START = """
+    DROP INDEX IF EXISTS idx_runs_hourly_model;
+    ALTER TABLE runs_hourly RENAME TO runs_hourly_v1;
+    ALTER TABLE runs_hourly_bins RENAME TO runs_hourly_bins_v1
+"""
+
+MIGRATE_V1_FINISH = """
+    INSERT INTO runs_hourly SELECT * FROM runs_hourly_v1;
+    INSERT INTO runs_hourly_bins (bucket, model_id, provider, metric, bin, count)
+        SELECT b.bucket, b.model_id, h.provider, b.metric, b.bin, b.count
+        FROM runs_hourly_bins_v1 b JOIN runs_hourly_v1 h ON h.bucket = b.bucket AND h.model_id = b.model_id;
+    DROP TABLE runs_hourly_v1;
+    DROP TABLE runs_hourly_bins_v1
+"""
+
+def _execute_all(conn: sqlite3.Connection, script: str):
+    """Run ;-separated statements inside the current transaction (executescript would commit it)."""
+    for statement in script.split(";"):
+        if statement.strip():
+            conn.execute(statement)
+
+@dataclass
+class TrendPoint:
+    """Aggregated requests of one model over one time bucket."""
+    bucket_start: float
+    model_id: str
+    provider: str
+    requests: int
+    errors: int
+    cache_hits: int
+    error_rate: float
+    latency_mean: Optional[float] = None
+    latency_p50: Optional[float] = None
+    latency_p95: Optional[float] = None
+    ttft_mean: Optional[float] = None
+    ttft_p50: Optional[float] = None
+    ttft_p95: Optional[float] = None
+    tokens_per_second: Optional[float] = None
+    output_tokens: int = 0
+    cost: float = 0.0
+
+def _bin(value: float) -> int:
+    """Log-spaced histogram bin of a positive value."""
+    return math.floor(math.log(max(value, MIN_BIN_VALUE)) / math.log(BIN_GROWTH))
+
+def _bin_value(bin_index: int) -> float:
+    """Geometric midpoint of a histogram bin."""
+    return BIN_GROWTH ** (bin_index + 0.5)
+
+def _histogram_quantile(bins: Dict[int, int], q: float) -> Optional[float]:
+    """Approximate quantile from bin counts, or None if empty."""
+    total = sum(bins.values())
+    if not total:
+        return None
+    target = q * total
+    seen = 0
+    for bin_index in sorted(bins):
+        seen += bins[bin_index]
+        if seen >= target:
+            return _bin_value(bin_index)
+    return _bin_value(max(bins))
+
+class RunHistory:
+    """
+    Append-only store of every ModelResponse, backed by SQLite.
+
+    Each response becomes one row of the runs table, indexed by time, model
+    and provider, for drill-down into individual requests. Writes are
+    buffered and flushed in one transaction per batch_size rows or
+    flush_interval seconds. The same transaction folds the rows into hourly
+    rollups per model and provider with log-binned latency and TTFT
+    histograms, so trend queries read a few rows per model and hour no
+    matter how many requests are stored. Cache hits and errors are counted
+    but kept out of latency statistics, so fast failures such as 429s don't
+    pull the percentiles down.
+    """
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH, batch_size: int = 200, flush_interval: float = 2.0):
+        """
+        Initialize the store, creating the database if needed.
+
+        Args:
+            path: SQLite database file
+            batch_size: Buffered rows that trigger a flush
+            flush_interval: Seconds after which a record() call flushes the buffer
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._buffer: List[Tuple] = []
+        self._last_flush = time.monotonic()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._write_lock:
+            conn = self._connection()
+            # Several processes may open a new or old database at once; the first one migrates it
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                migrate = version < 2 and conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'runs_hourly'"
+                ).fetchone() is not None
+                if migrate:
+                    logger.info(f"Migrating run history rollups in {path} to schema version {SCHEMA_VERSION}")
+                    _execute_all(conn, MIGRATE_V1_START)
+                _execute_all(conn, SCHEMA)
+                if migrate:
+                    _execute_all(conn, MIGRATE_V1_FINISH)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+
+        atexit.register(self.flush)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection; sqlite3 connections are not shared across threads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, provider: str, model_id: str, response: Any):
+        """
+        Buffer one ModelResponse; usable as a MetricsRegistry sink.
+
+        Args:
+            provider: Provider name
+            model_id: Model ID (not the display name)
+            response: ModelResponse to store
+        """
+        token_info = response.token_info
+        row = (
+            time.time(),
+            provider,
+            model_id,
+            response.elapsed_time,
+            response.time_to_first_token,
+            response.tokens_per_second,
+            token_info.input_tokens if token_info is not None else None,
+            token_info.output_tokens if token_info is not None else None,
+            response.cost,
+            int(response.cache_hit),
+            int(response.hedged),
+            response.error[:500] if response.error else None,
+        )
+        with self._write_lock:
+            self._buffer.append(row)
+            due = len(self._buffer) >= self.batch_size or \
+                time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows and update the rollups in one transaction."""
+        with self._write_lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            if not rows:
+                return
+            conn = self._connection()
+            try:
+                conn.executemany(
+                    "INSERT INTO runs (created_at, provider, model_id, latency, ttft, tokens_per_second, "
+                    "input_tokens, output_tokens, cost, cache_hit, hedged, error) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._roll_up(conn, rows)
+                conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                logger.warning(f"Could not write {len(rows)} run history rows: {e}")
+
+    @staticmethod
+    def _roll_up(conn: sqlite3.Connection, rows: Sequence[Tuple]):
+        """Add rows to the hourly rollups and histograms."""
+        totals: Dict[Tuple[int, str, str], List] = {}
+        bins: Dict[Tuple[int, str, str, str, int], int] = defaultdict(int)
+        for (created_at, provider, model_id, latency, ttft, tps, _, output_tokens, cost,
+             cache_hit, _, error) in rows:
+            bucket = int(created_at // ROLLUP_SECONDS) * ROLLUP_SECONDS
+            t = totals.setdefault((bucket, model_id, provider), [0] * 11)
+            t[0] += 1
+            t[1] += 1 if error else 0
+            t[2] += cache_hit
+            if cache_hit:
+                continue
+            t[10] += cost or 0.0
+            if error:
+                continue
+            for offset, value in ((3, latency), (5, ttft), (7, tps)):
+                if value is not None:
+                    t[offset] += value
+                    t[offset + 1] += 1
+            t[9] += output_tokens or 0
+            for metric, value in zip(HISTOGRAM_METRICS, (latency, ttft)):
+                if value is not None:
+                    bins[(bucket, model_id, provider, metric, _bin(value))] += 1
+
+        conn.executemany(
+            "INSERT INTO runs_hourly (bucket, model_id, provider, requests, errors, cache_hits, "
+            "latency_sum, latency_count, ttft_sum, ttft_count, tps_sum, tps_count, output_tokens, cost) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (bucket, model_id, provider) DO UPDATE SET "
+            "requests = requests + excluded.requests, errors = errors + excluded.errors, "
+            "cache_hits = cache_hits + excluded.cache_hits, "
+            "latency_sum = latency_sum + excluded.latency_sum, "
+            "latency_count = latency_count + excluded.latency_count, "
+            "ttft_sum = ttft_sum + excluded.ttft_sum, ttft_count = ttft_count + excluded.ttft_count, "
+            "tps_sum = tps_sum + excluded.tps_sum, tps_count = tps_count + excluded.tps_count, "
+            "output_tokens = output_tokens + excluded.output_tokens, cost = cost + excluded.cost",
+            [(*key, *t) for key, t in totals.items()]
+        )
+        conn.executemany(
+            "INSERT INTO runs_hourly_bins (bucket, model_id, provider, metric, bin, count) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (bucket, model_id, provider, metric, bin) DO UPDATE SET count = count + excluded.count",
+            [(*key, count) for key, count in bins.items()]
+        )
+
+    def models(self) -> List[Tuple[str, str]]:
+        """(provider, model_id) of every model with recorded requests."""
+        self.flush()
+        return self._connection().execute(
+            "SELECT DISTINCT provider, model_id FROM runs_hourly ORDER BY provider, model_id"
+        ).fetchall()
+
+    def trends(self, model_ids: Optional[Iterable[str]] = None, since: Optional[float] = None,
+               bucket_seconds: int = ROLLUP_SECONDS) -> List[TrendPoint]:
+        """
+        Per-model statistics over time, computed from the hourly rollups.
+
+        A model served by several providers gets one point per provider.
+
+        Args:
+            model_ids: Models to include (default: all)
+            since: Unix time of the earliest bucket to include
+            bucket_seconds: Bucket width, rounded up to a multiple of an hour
+
+        Returns:
+            TrendPoints ordered by bucket, model, then provider
+        """
+        self.flush()
+        width = max(1, math.ceil(bucket_seconds / ROLLUP_SECONDS)) * ROLLUP_SECONDS
+        where, params = self._filters(model_ids, since)
+        conn = self._connection()
+
+        points: Dict[Tuple[int, str, str], TrendPoint] = {}
+        for row in conn.execute(
+            f"SELECT (bucket / {width}) * {width} AS b, model_id, provider, SUM(requests), SUM(errors), "
+            f"SUM(cache_hits), SUM(latency_sum), SUM(latency_count), SUM(ttft_sum), SUM(ttft_count), "
+            f"SUM(tps_sum), SUM(tps_count), SUM(output_tokens), SUM(cost) "
+            f"FROM runs_hourly {where} GROUP BY b, model_id, provider ORDER BY b, model_id, provider",
+            params
+        ):
+            bucket, model_id, provider, requests, errors, cache_hits = row[:6]
+            latency_sum, latency_count, ttft_sum, ttft_count, tps_sum, tps_count, output_tokens, cost = row[6:]
+            points[(bucket, model_id, provider)] = TrendPoint(
+                bucket_start=float(bucket),
+                model_id=model_id,
+                provider=provider,
+                requests=requests,
+                errors=errors,
+                cache_hits=cache_hits,
+                error_rate=errors / requests if requests else 0.0,
+                latency_mean=latency_sum / latency_count if latency_count else None,
+                ttft_mean=ttft_sum / ttft_count if ttft_count else None,
+                tokens_per_second=tps_sum / tps_count if tps_count else None,
+                output_tokens=output_tokens,
+                cost=cost
+            )
+
+        histograms: Dict[Tuple[int, str, str, str], Dict[int, int]] = defaultdict(dict)
+        for bucket, model_id, provider, metric, bin_index, count in conn.execute(
+            f"SELECT (bucket / {width}) * {width} AS b, model_id, provider, metric, bin, SUM(count) "
+            f"FROM runs_hourly_bins {where} GROUP BY b, model_id, provider, metric, bin",
+            params
+        ):
+            histograms[(bucket, model_id, provider, metric)][bin_index] = count
+        for (bucket, model_id, provider, metric), bins in histograms.items():
+            point = points.get((bucket, model_id, provider))
+            if point is not None:
+                setattr(point, f"{metric}_p50", _histogram_quantile(bins, 0.5))
+                setattr(point, f"{metric}_p95", _histogram_quantile(bins, 0.95))
+
+        return list(points.values())
+
+    @staticmethod
+    def _filters(model_ids: Optional[Iterable[str]], since: Optional[float]) -> Tuple[str, List[Any]]:
+        """WHERE clause on the rollup tables' (model_id, bucket) columns."""
+        clauses, params = [], []
+        if model_ids is not None:
+            model_ids = list(model_ids)
+            clauses.append(f"model_id IN ({', '.join('?' * len(model_ids))})" if model_ids else "0")
+            params.extend(model_ids)
+        if since is not None:
+            clauses.append("bucket >= ?")
+            params.append(int(since // ROLLUP_SECONDS) * ROLLUP_SECONDS)
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def recent(self, model_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recent stored requests, newest first, optionally for one model."""
+        self.flush()
+        conn = self._connection()
+        query = "SELECT * FROM runs"
+        params: List[Any] = []
+        if model_id is not None:
+            query += " WHERE model_id = ?"
+            params.append(model_id)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        cursor = conn.execute(query, params)
+        columns = [c[0] for c in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def prune(self, older_than_days: float):
+        """Delete per-request rows older than a cutoff; hourly rollups are kept for trends."""
+        self.flush()
+        cutoff = time.time() - older_than_days * 86400
+        conn = self._connection()
+        with self._write_lock:
+            deleted = conn.execute("DELETE FROM runs WHERE created_at < ?", (cutoff,)).rowcount
+            conn.commit()
+        logger.info(f"Pruned {deleted} run history rows")
+
+    def stats(self) -> Dict[str, int]:
+        """Get recorded request count (including pruned rows) and database file size."""
+        self.flush()
+        count = self._connection().execute("SELECT COALESCE(SUM(requests), 0) FROM runs_hourly").fetchone()[0]
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {"requests": count, "bytes": size}
@@ -0,0 +1,77 @@
+import hashlib
+import random
+import re
+import struct
+import unicodedata
+from typing import Iterable, List, Set
+
+# Similarity above which a cached response to another prompt is offered, unless a model sets its own
+DEFAULT_SIMILARITY_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_prompt(prompt: str) -> str:
+    """Case-fold and drop punctuation and repeated whitespace, so trivially different prompts compare equal."""
+    text = unicodedata.normalize("NFKC", prompt).casefold()
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+def shingles(prompt: str, size: int = 3) -> Set[str]:
+    """Word n-grams of a normalized prompt; prompts shorter than size words are one shingle."""
+    words = normalize_prompt(prompt).split(" ")
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """Exact Jaccard similarity of two shingle sets."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+def _hash(value: str) -> int:
+    """Process-independent 32-bit hash (Python's hash() is salted per process)."""
+    return struct.unpack("<I", hashlib.blake2b(value.encode("utf-8"), digest_size=4).digest())[0]
+
+class MinHashLSH:
+    """
+    MinHash signatures and locality-sensitive band hashes for shingle sets.
+
+    Signatures use num_perm universal hash permutations; they are split into
+    bands of num_perm / bands rows, and two sets land in the same bucket for
+    some band with high probability once their Jaccard similarity exceeds
+    about (1 / bands) ** (bands / num_perm), 0.42 with the defaults.
+    Permutations come from a fixed seed, so bucket hashes are stable across
+    processes and can be stored.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(seed)
+        self._permutations = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)
+        ]
+
+    def signature(self, items: Iterable[str]) -> List[int]:
+        """MinHash signature of a set of shingles."""
+        hashes = [_hash(item) for item in set(items)] or [0]
+        return [
+            min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH
+            for a, b in self._permutations
+        ]
+
+    def buckets(self, signature: List[int], scope: str = "") -> List[int]:
+        """One signed 64-bit bucket per band, namespaced by scope (e.g. model and sampling parameters)."""
+        buckets = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows]
+            data = f"{scope}:{band}:{','.join(map(str, rows))}".encode("utf-8")
+            buckets.append(struct.unpack("<q", hashlib.blake2b(data, digest_size=8).digest())[0])
+        return buckets
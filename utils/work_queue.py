@@ -0,0 +1,259 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds a claimed shard stays leased without a renewal
+DEFAULT_LEASE_SECONDS = 300.0
+# Claims per shard before it is marked failed (e.g. it keeps crashing its worker)
+DEFAULT_MAX_ATTEMPTS = 3
+
+@dataclass
+class Shard:
+    """A leased slice of the prompt list; lease_token fences out earlier holders."""
+    shard_id: int
+    prompts: List[Tuple[str, str]]
+    attempt: int
+    lease_token: str
+
+@dataclass
+class QueueStatus:
+    """Shard counts by state, and the workers holding live leases."""
+    total: int = 0
+    pending: int = 0
+    leased: int = 0
+    done: int = 0
+    failed: int = 0
+    # Leased shards whose lease ran out; the next claim retries them
+    expired: int = 0
+    workers: Tuple[str, ...] = ()
+
+    @property
+    def finished(self) -> bool:
+        return self.pending == 0 and self.leased == 0
+
+class ShardQueue:
+    """
+    Durable queue of prompt shards in a SQLite file, shared by worker processes.
+
+    Workers claim() a shard, which leases it for lease_seconds; they renew()
+    the lease while working and complete() it when its results are written.
+    A shard whose lease runs out, because its worker crashed or lost the
+    network, is handed to the next claimant with a new lease token, so
+    complete() from the old holder is ignored. After max_attempts claims a
+    shard is marked failed instead.
+
+    Transactions are short and the database uses a rollback journal, so
+    workers on other hosts can share it over a network filesystem with
+    working file locks.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        """
+        Open an existing queue.
+
+        Args:
+            path: SQLite database file created by create()
+            lease_seconds: Lease length for shards claimed through this instance
+            max_attempts: Claims per shard before it is marked failed
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No work queue at {path}")
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    @classmethod
+    def create(cls, path: str, prompts: Iterable[Tuple[str, str]], shard_size: int,
+               meta: Optional[Dict[str, Any]] = None, **kwargs) -> "ShardQueue":
+        """
+        Create a queue, splitting prompts into shards of shard_size prompts.
+
+        Args:
+            path: SQLite database file; must not exist yet
+            prompts: (prompt_id, prompt) pairs
+            shard_size: Prompts per shard
+            meta: JSON-serializable run settings workers read back with meta()
+        """
+        if os.path.exists(path):
+            raise FileExistsError(f"Work queue {path} already exists")
+        if shard_size < 1:
+            raise ValueError("shard_size must be at least 1")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with closing(sqlite3.connect(path, isolation_level=None)) as conn:
+            conn.executescript("""
+                CREATE TABLE meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                CREATE TABLE shards (
+                    shard_id INTEGER PRIMARY KEY,
+                    prompts TEXT NOT NULL,
+                    prompt_count INTEGER NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    lease_token TEXT,
+                    lease_expires REAL,
+                    last_error TEXT,
+                    completed_at REAL
+                );
+                CREATE INDEX idx_shards_state ON shards (state, shard_id);
+            """)
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT INTO meta (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in (meta or {}).items()]
+            )
+            conn.executemany(
+                "INSERT INTO shards (shard_id, prompts, prompt_count) VALUES (?, ?, ?)",
+                ((i, json.dumps(chunk), len(chunk)) for i, chunk in enumerate(_chunks(prompts, shard_size)))
+            )
+            conn.execute("COMMIT")
+        return cls(path, **kwargs)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """A short write transaction on a fresh connection, taking the write lock up front."""
+        with closing(sqlite3.connect(self.path, timeout=60, isolation_level=None)) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def meta(self) -> Dict[str, Any]:
+        """Run settings stored by create()."""
+        with closing(sqlite3.connect(self.path, timeout=60)) as conn:
+            return {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM meta")}
+
+    def claim(self, worker: str) -> Optional[Shard]:
+        """Lease the next pending or expired shard; None if nothing is claimable right now."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                UPDATE shards SET state = 'failed', worker = NULL, lease_token = NULL,
+                    last_error = COALESCE(last_error, 'Lease expired on every attempt')
+                WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?
+                """,
+                (now, self.max_attempts)
+            )
+            row = conn.execute(
+                """
+                SELECT shard_id, prompts, attempts FROM shards
+                WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?)
+                ORDER BY shard_id LIMIT 1
+                """,
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            shard_id, prompts, attempts = row
+            token = uuid.uuid4().hex
+            conn.execute(
+                """
+                UPDATE shards SET state = 'leased', attempts = attempts + 1, worker = ?,
+                    lease_token = ?, lease_expires = ?
+                WHERE shard_id = ?
+                """,
+                (worker, token, now + self.lease_seconds, shard_id)
+            )
+        if attempts:
+            logger.info(f"Retrying shard {shard_id} (attempt {attempts + 1})")
+        return Shard(shard_id, [tuple(p) for p in json.loads(prompts)], attempts + 1, token)
+
+    def renew(self, shard: Shard) -> bool:
+        """Extend the shard's lease; False if another worker has taken it over."""
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE shards SET lease_expires = ? WHERE shard_id = ? AND lease_token = ? AND state = 'leased'",
+                (time.time() + self.lease_seconds, shard.shard_id, shard.lease_token)
+            ).rowcount
+        return updated == 1
+
+    def complete(self, shard: Shard) -> bool:
+        """Mark the shard done; False (and no change) if its lease was lost."""
+        with self._transaction() as conn:
+            updated = conn.execute(
+                """
+                UPDATE shards SET state = 'done', lease_token = NULL, lease_expires = NULL, completed_at = ?
+                WHERE shard_id = ? AND lease_token = ? AND state = 'leased'
+                """,
+                (time.time(), shard.shard_id, shard.lease_token)
+            ).rowcount
+        return updated == 1
+
+    def release(self, shard: Shard, error: str):
+        """Give up a shard after an error, returning it to the queue or failing it on its last attempt."""
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                UPDATE shards SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    worker = NULL, lease_token = NULL, lease_expires = NULL, last_error = ?
+                WHERE shard_id = ? AND lease_token = ? AND state = 'leased'
+                """,
+                (self.max_attempts, error, shard.shard_id, shard.lease_token)
+            )
+
+    def retry_failed(self) -> int:
+        """Queue failed shards again with fresh attempts; returns how many."""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE shards SET state = 'pending', attempts = 0, last_error = NULL WHERE state = 'failed'"
+            ).rowcount
+
+    def status(self) -> QueueStatus:
+        """Shard counts by state."""
+        now = time.time()
+        status = QueueStatus()
+        with closing(sqlite3.connect(self.path, timeout=60)) as conn:
+            for state, expired, count in conn.execute(
+                "SELECT state, state = 'leased' AND lease_expires < ?, COUNT(*) FROM shards GROUP BY 1, 2",
+                (now,)
+            ):
+                setattr(status, state, getattr(status, state) + count)
+                status.total += count
+                if expired:
+                    status.expired += count
+            status.workers = tuple(row[0] for row in conn.execute(
+                "SELECT DISTINCT worker FROM shards WHERE state = 'leased' AND lease_expires >= ? ORDER BY 1",
+                (now,)
+            ))
+        return status
+
+    def errors(self) -> List[Tuple[int, str, str]]:
+        """(shard_id, state, last_error) for shards that hit an error."""
+        with closing(sqlite3.connect(self.path, timeout=60)) as conn:
+            return conn.execute(
+                "SELECT shard_id, state, last_error FROM shards WHERE last_error IS NOT NULL ORDER BY shard_id"
+            ).fetchall()
+
+    def shard_ids(self) -> List[int]:
+        """All shard IDs in input order."""
+        with closing(sqlite3.connect(self.path, timeout=60)) as conn:
+            return [row[0] for row in conn.execute("SELECT shard_id FROM shards ORDER BY shard_id")]
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    """Consecutive lists of up to size items."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk